@@ -22,12 +22,8 @@ FUND_MAPPING = {
     "001001": "华夏债券"
 }
 
-def create_db(csv_directory, output_db_path):
-    """将CSV文件转换为SQLite数据库"""
-    # 创建SQLite连接
-    conn = sqlite3.connect(output_db_path)
-    cursor = conn.cursor()
-    
+def create_tables(cursor):
+    """创建场景数据库的基金、净值、指数和指数历史数据表（已存在时跳过）"""
     # 创建基金表
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS funds (
@@ -76,6 +72,14 @@ def create_db(csv_directory, output_db_path):
         FOREIGN KEY (index_code) REFERENCES indices(index_code)
     )
     ''')
+
+def create_db(csv_directory, output_db_path):
+    """将CSV文件转换为SQLite数据库"""
+    # 创建SQLite连接
+    conn = sqlite3.connect(output_db_path)
+    cursor = conn.cursor()
+    
+    create_tables(cursor)
     
     # 插入基金信息
     for fund_code, fund_name in FUND_MAPPING.items():
@@ -0,0 +1,313 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from performance import build_summary, market_return, max_drawdown
+from shared_market import SharedMarketData, attach_scene_data
+
+
+class BacktestContext:
+    """
+    回测过程中传给策略的账户上下文
+
+    行情通过行情矩阵的当前行读取，持仓以按基金列对齐的份额数组保存；
+    买入/卖出的份额计算与 InvestmentSimulator.buy_fund / sell_fund 一致，
+    当天没有披露净值（market.fund_valid 为 False）的基金同样不能交易。
+    """
+
+    def __init__(self, market, initial_capital, fees=None):
+        """
+        Args:
+            fees: 交易费率 {'buy': 申购费率, 'sell': 赎回费率}，默认不收费（与模拟器一致）；
+                  申购费从买入金额中扣除后再折算份额，赎回费从卖出金额中扣除
+        """
+        self.market = market
+        self.initial_capital = initial_capital
+        self.buy_fee_rate = (fees or {}).get('buy', 0.0)
+        self.sell_fee_rate = (fees or {}).get('sell', 0.0)
+        self.fees_paid = 0.0
+        self.row = 0
+        self.cash = float(initial_capital)
+        self.shares = np.zeros(len(market.fund_codes))
+        self.cost = np.zeros(len(market.fund_codes))  # 每只基金的持仓成本
+        self.trades = []  # (行, 'buy'/'sell', 基金列, 份额, 净值, 金额)
+        self.state = {}  # 供策略保存自身状态
+
+    @property
+    def date(self):
+        return self.market.dates[self.row]
+
+    @property
+    def nav(self):
+        """当前交易日所有基金的净值（按基金列排列）"""
+        return self.market.nav[self.row]
+
+    @property
+    def holdings_value(self):
+        held = self.shares > 0
+        return float(self.shares[held] @ self.nav[held]) if held.any() else 0.0
+
+    @property
+    def total_assets(self):
+        return self.cash + self.holdings_value
+
+    def buy(self, fund_code, amount):
+        """按金额买入基金，成功返回买入份额，失败返回 0"""
+        col = self.market.fund_index.get(fund_code)
+        if col is None or amount <= 0 or amount > self.cash or not self.market.fund_valid[self.row, col]:
+            return 0.0
+        nav = float(self.market.nav[self.row, col])
+        if not nav > 0:
+            return 0.0
+
+        fee = amount * self.buy_fee_rate
+        shares = (amount - fee) / nav
+        self.fees_paid += fee
+        self.shares[col] += shares
+        self.cost[col] += amount
+        self.cash -= amount
+        self.trades.append((self.row, 'buy', col, shares, nav, amount))
+        return shares
+
+    def sell(self, fund_code, shares=None, percentage=None):
+        """按份额或比例卖出基金，成功返回卖出金额，失败返回 0"""
+        col = self.market.fund_index.get(fund_code)
+        if col is None or self.shares[col] <= 0 or not self.market.fund_valid[self.row, col]:
+            return 0.0
+        current_shares = self.shares[col]
+
+        if shares is not None:
+            if shares <= 0 or shares > current_shares:
+                return 0.0
+            shares_to_sell = shares
+        elif percentage is not None:
+            if percentage <= 0 or percentage > 1:
+                return 0.0
+            shares_to_sell = current_shares * percentage
+        else:
+            return 0.0
+
+        nav = float(self.market.nav[self.row, col])
+        if not nav > 0:
+            return 0.0
+
+        amount = shares_to_sell * nav
+        fee = amount * self.sell_fee_rate
+        self.fees_paid += fee
+        self.cost[col] *= 1 - shares_to_sell / current_shares
+        self.shares[col] -= shares_to_sell
+        if self.shares[col] <= 0:
+            self.shares[col] = 0.0
+            self.cost[col] = 0.0
+        self.cash += amount - fee
+        self.trades.append((self.row, 'sell', col, shares_to_sell, nav, amount))
+        return amount
+
+    def rebalance_to(self, weights, invest_ratio=1.0):
+        """
+        调仓到目标权重：先卖出超配部分，再用现金买入低配部分
+
+        Args:
+            weights: {基金代码: 目标权重}，权重之和不超过1，其余为现金
+            invest_ratio: 参与调仓的总资产比例
+        """
+        target_value = self.total_assets * invest_ratio
+        orders = []
+        for fund_code, weight in weights.items():
+            col = self.market.fund_index.get(fund_code)
+            if col is None:
+                continue
+            nav = float(self.market.nav[self.row, col])
+            if not nav > 0:
+                continue
+            orders.append((fund_code, target_value * weight - self.shares[col] * nav, nav))
+
+        for fund_code, diff, nav in orders:
+            if diff < 0:
+                col = self.market.fund_index[fund_code]
+                self.sell(fund_code, shares=min(-diff / nav, self.shares[col]))
+        for fund_code, diff, nav in orders:
+            if diff > 0:
+                self.buy(fund_code, min(diff, self.cash))
+
+
+def _normalize_weights(weights):
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError('策略权重之和必须大于0')
+    return {code: w / total for code, w in weights.items()}
+
+
+def make_strategy(spec):
+    """
+    根据声明式策略描述构建策略函数
+
+    支持的策略:
+        {'type': 'dca', 'weights': {...}, 'amount': 1000, 'interval': 20}
+            定投：每 interval 个交易日按权重买入 amount 元
+        {'type': 'rebalance', 'weights': {...}, 'threshold': 0.05, 'invest_ratio': 1.0}
+            阈值再平衡：首日按权重建仓，任一基金偏离目标权重超过 threshold 时调仓
+        {'type': 'stop_loss', 'weights': {...}, 'stop_loss': 0.1, 'invest_ratio': 1.0}
+            止损：首日按权重建仓，基金净值低于持仓成本 stop_loss 比例时全部卖出
+    """
+    strategy_type = spec.get('type')
+    weights = _normalize_weights(spec['weights'])
+
+    if strategy_type == 'dca':
+        amount = spec['amount']
+        interval = max(int(spec.get('interval', 20)), 1)
+
+        def dca(ctx):
+            if ctx.state.setdefault('days', 0) % interval == 0:
+                budget = min(amount, ctx.cash)
+                for fund_code, weight in weights.items():
+                    ctx.buy(fund_code, budget * weight)
+            ctx.state['days'] += 1
+        return dca
+
+    if strategy_type == 'rebalance':
+        threshold = spec.get('threshold', 0.05)
+        invest_ratio = spec.get('invest_ratio', 1.0)
+
+        def rebalance(ctx):
+            if not ctx.state.get('invested'):
+                ctx.rebalance_to(weights, invest_ratio)
+                ctx.state['invested'] = True
+                return
+            total = ctx.total_assets
+            if total <= 0:
+                return
+            for fund_code, weight in weights.items():
+                col = ctx.market.fund_index.get(fund_code)
+                if col is None:
+                    continue
+                current_weight = ctx.shares[col] * ctx.nav[col] / total
+                if abs(current_weight - weight * invest_ratio) > threshold:
+                    ctx.rebalance_to(weights, invest_ratio)
+                    return
+        return rebalance
+
+    if strategy_type == 'stop_loss':
+        stop_loss = spec.get('stop_loss', 0.1)
+        invest_ratio = spec.get('invest_ratio', 1.0)
+
+        def stop_loss_strategy(ctx):
+            if not ctx.state.get('invested'):
+                ctx.rebalance_to(weights, invest_ratio)
+                ctx.state['invested'] = True
+                return
+            held = np.nonzero(ctx.shares > 0)[0]
+            for col in held:
+                value = ctx.shares[col] * ctx.nav[col]
+                if value < ctx.cost[col] * (1 - stop_loss):
+                    ctx.sell(ctx.market.fund_codes[col], percentage=1)
+        return stop_loss_strategy
+
+    raise ValueError(f'未知的策略类型: {strategy_type}')
+
+
+def run_backtest(scene_data, strategy, initial_capital=100000, keep_series=True):
+    """
+    在整个场景时间线上无界面地运行一个策略
+
+    Args:
+        scene_data: DataLoader.load_all_data() 或 attach_scene_data() 的返回值
+        strategy: 策略函数 strategy(ctx)，每个交易日调用一次；或 make_strategy 支持的策略描述字典
+        initial_capital: 初始资金
+        keep_series: 是否在结果中保留每日净值序列和交易明细
+
+    Returns:
+        回测结果字典
+    """
+    market = scene_data['market_data']
+    if callable(strategy):
+        strategy_fn, spec = strategy, None
+    else:
+        strategy_fn, spec = make_strategy(strategy), strategy
+
+    start_row = 0
+    if scene_data.get('simulation_start_date'):
+        start_row = market.row_on_or_after(scene_data['simulation_start_date']) or 0
+
+    ctx = BacktestContext(market, initial_capital)
+    n_days = len(market) - start_row
+    cash = np.empty(n_days)
+    net_worth = np.empty(n_days)
+
+    for i, row in enumerate(range(start_row, len(market))):
+        ctx.row = row
+        strategy_fn(ctx)
+        cash[i] = ctx.cash
+        net_worth[i] = ctx.total_assets
+
+    final_assets = float(net_worth[-1]) if n_days else float(initial_capital)
+    buy_count = sum(1 for trade in ctx.trades if trade[1] == 'buy')
+
+    result = {
+        'success': True,
+        'strategy': spec,
+        'summary': build_summary(
+            initial_capital, final_assets, max_drawdown(net_worth), buy_count, len(ctx.trades) - buy_count,
+            n_days, market_return(market, 'sh_index')
+        ),
+    }
+
+    if keep_series:
+        result['dates'] = market.dates[start_row:]
+        result['cash'] = cash
+        result['net_worth'] = net_worth
+        result['trades'] = [
+            {
+                'date': market.dates[row],
+                'action_type': action,
+                'fund_code': market.fund_codes[col],
+                'shares': shares,
+                'nav': nav,
+                'amount': amount,
+            }
+            for row, action, col, shares, nav, amount in ctx.trades
+        ]
+
+    return result
+
+
+# 工作进程中挂载的共享场景数据
+_worker_scene = None
+
+
+def _init_worker(handle):
+    global _worker_scene
+    _worker_scene = attach_scene_data(handle)
+
+
+def _run_in_worker(args):
+    strategy, initial_capital, keep_series = args
+    return run_backtest(_worker_scene, strategy, initial_capital, keep_series)
+
+
+def run_many(scene_data, strategies, initial_capital=100000, processes=None, keep_series=False, chunksize=16):
+    """
+    将多个策略/参数组合分发到进程池中并行回测
+
+    场景行情只通过共享内存发布一次，各工作进程零拷贝挂载。
+
+    Args:
+        scene_data: DataLoader.load_all_data() 的返回值
+        strategies: 策略描述字典（或可被pickle的顶层策略函数）列表
+        initial_capital: 初始资金
+        processes: 进程数，默认CPU核数；为1时在当前进程内顺序执行
+        keep_series: 是否保留每次回测的净值序列和交易明细
+        chunksize: 每次分发给工作进程的任务数
+
+    Returns:
+        与 strategies 顺序一致的回测结果列表
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(strategies) <= 1:
+        return [run_backtest(scene_data, strategy, initial_capital, keep_series) for strategy in strategies]
+
+    with SharedMarketData(scene_data) as shared:
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(shared.handle,)) as pool:
+            tasks = [(strategy, initial_capital, keep_series) for strategy in strategies]
+            return list(pool.map(_run_in_worker, tasks, chunksize=chunksize))
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+import io
+import sys
+import json
+import time
+import itertools
+import argparse
+import platform
+import datetime
+import tempfile
+import contextlib
+import statistics
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from data_loader import DataLoader
+from investment_simulator import InvestmentSimulator
+from market_data import MarketData
+from scene_generator import TRADING_DAYS_PER_YEAR, generate_scene
+from scenes import DEFAULT_SCENE, list_scenes
+
+# 默认基准结果文件
+BASELINE_PATH = Path(__file__).parent / 'benchmark_baseline.json'
+# 峰值内存低于该值（KB）时不判断内存回退，避免小额分配的抖动
+MIN_MEMORY_KB = 64
+# 日期查找基准的默认交易日数量
+LOOKUP_DAYS = 10000
+
+
+def measure(fn, number=1, repeat=5, setup=None):
+    """
+    测量一个操作的耗时和峰值内存
+
+    每轮先调用 setup() 准备参数（不计时），再连续调用 number 次 fn(参数)；
+    耗时取各轮平均单次耗时的中位数。峰值内存在额外的一轮中用 tracemalloc 统计，
+    tracemalloc 会拖慢执行，因此不与计时轮混在一起。
+
+    Returns:
+        {'time_ms', 'min_ms', 'peak_kb'}
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(arg)
+        times.append((time.perf_counter() - start) / number)
+
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        for _ in range(number):
+            fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'time_ms': statistics.median(times) * 1000,
+        'min_ms': min(times) * 1000,
+        'peak_kb': peak / 1024,
+    }
+
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽加载过程中的进度输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_loader(scene_id, repeat):
+    """场景加载：无缓存的完整加载、从缓存加载、以及单独的 build_timeline"""
+    results = {}
+    with _quiet():
+        results['load_all_data'] = measure(
+            lambda _: DataLoader(Path(__file__).parent, scene_id).load_all_data(use_cache=False), repeat=repeat)
+        DataLoader(Path(__file__).parent, scene_id).load_all_data()  # 确保缓存存在
+        results['load_all_data_cached'] = measure(
+            lambda _: DataLoader(Path(__file__).parent, scene_id).load_all_data(), repeat=repeat)
+
+        loader = DataLoader(Path(__file__).parent, scene_id)
+        loader.simulation_start_date = loader.get_earliest_valid_date()
+        loader.load_fund_data()
+        loader.load_index_data()
+        loader.load_news_data()
+        results['build_timeline'] = measure(lambda _: loader.build_timeline(), repeat=repeat)
+    return results
+
+
+def bench_simulator(data, scene_path, repeat, steps=200):
+    """
+    模拟器的会话启动和单步操作
+
+    Args:
+        data: load_all_data() 结构的场景数据
+        steps: 每轮连续执行单步操作的次数
+    """
+    with _quiet():
+        base = InvestmentSimulator(scene_path, 100000, data=data)
+    codes = base.market.fund_codes
+    held = codes[:10]
+    steps = max(1, min(steps, len(base.market) - base.current_date_index - 2))
+
+    def invested():
+        sim = base.fork()
+        sim.execute_orders([{'action': 'buy', 'fund_code': code, 'amount': 5000} for code in held])
+        return sim
+
+    def after_days():
+        sim = invested()
+        sim.advance(steps)
+        return sim
+
+    def buy(sim):
+        sim.buy_fund(codes[len(sim.user_actions) % len(codes)], 100)
+
+    with _quiet():
+        return {
+            'create_session': measure(lambda _: InvestmentSimulator(scene_path, 100000, data=data), number=20,
+                                      repeat=repeat),
+            'next_day': measure(lambda sim: sim.next_day(), number=steps, repeat=repeat, setup=invested),
+            'get_current_state': measure(lambda sim: sim.get_current_state(), number=steps, repeat=repeat,
+                                         setup=invested),
+            'buy_fund': measure(buy, number=steps, repeat=repeat, setup=base.fork),
+            'get_performance_summary': measure(lambda sim: sim.get_performance_summary(), number=steps,
+                                               repeat=repeat, setup=after_days),
+        }
+
+
+def _lookup_scene(days, n_funds=10, seed=0):
+    """只有工作日的合成场景数据（直接构建 MarketData，不经过数据库），用于日期查找基准"""
+    rng = np.random.default_rng(seed)
+    dates = []
+    day = datetime.date(1980, 1, 1)
+    while len(dates) < days:
+        if day.weekday() < 5:
+            dates.append(day)
+        day += datetime.timedelta(days=1)
+    nav = np.cumprod(1 + rng.normal(0, 0.01, (days, n_funds)), axis=0)
+    change = np.vstack([np.zeros((1, n_funds)), (nav[1:] / nav[:-1] - 1) * 100])
+    market = MarketData(dates, [f'{i:06d}' for i in range(n_funds)], nav, change,
+                        ['sh_index', 'dj_index'], np.full((days, 2), 1000.0), np.zeros((days, 2)))
+    return {'market_data': market, 'news_data': [], 'timeline': market.timeline, 'description': '',
+            'simulation_start_date': dates[0]}
+
+
+def bench_date_lookup(scene_path, days=LOOKUP_DAYS, repeat=5, number=200):
+    """
+    日期查找：按交易日精确查找基金信息、查找不晚于某日（周末）的最近交易日
+
+    同时测量按时间线逐行扫描的旧实现（_linear 后缀）作为对照，扫描较慢，每轮只调用索引查找的 1/10 次。
+    """
+    data = _lookup_scene(days)
+    with _quiet():
+        sim = InvestmentSimulator(scene_path, 100000, data=data)
+    market = sim.market
+    code = market.fund_codes[0]
+    rng = np.random.default_rng(1)
+    trading_days = [market.dates[i] for i in rng.integers(0, days, number)]
+    # 周六，最近的交易日是前一天
+    saturdays = (date + datetime.timedelta(days=5 - date.weekday()) for date in trading_days)
+    weekends = [date for date in saturdays if date <= market.dates[-1]]
+
+    def linear_exact(date):
+        for i, day in enumerate(market.dates):
+            if day == date:
+                return market.fund_info(code, i)
+        return None
+
+    def linear_closest(target_date):
+        row, closest_diff = None, datetime.timedelta.max
+        for i, day_date in enumerate(market.dates):
+            if day_date == target_date:
+                return i
+            if day_date < target_date and target_date - day_date < closest_diff:
+                closest_diff, row = target_date - day_date, i
+        return row
+
+    def cycling(fn, dates):
+        dates = itertools.cycle(dates)
+        return lambda _: fn(next(dates))
+
+    # measure 的耗时为单次查找的耗时
+    short = max(1, number // 10)
+    return {
+        'exact_fund_lookup': measure(cycling(lambda date: sim._get_fund_info_by_date(code, date), trading_days),
+                                     number=number, repeat=repeat),
+        'exact_fund_lookup_linear': measure(cycling(linear_exact, trading_days), number=short, repeat=repeat),
+        'closest_prior_day': measure(cycling(market.row_on_or_before, weekends), number=number, repeat=repeat),
+        'closest_prior_day_linear': measure(cycling(linear_closest, weekends), number=short, repeat=repeat),
+    }
+
+
+def run_benchmarks(sizes=(10, 100, 1000), days=1000, repeat=5, lookup_days=LOOKUP_DAYS):
+    """
+    运行全部基准测试
+
+    Args:
+        sizes: 合成场景的基金数量，每个规模用 scene_generator 生成一个场景数据库
+        days: 合成场景的交易日数量
+        lookup_days: 日期查找基准的交易日数量，0 表示跳过
+
+    Returns:
+        {'machine': {...}, 'results': {'场景/操作': {'time_ms', 'min_ms', 'peak_kb'}}}
+    """
+    results = {}
+    scene = next(s for s in list_scenes() if s['scene_id'] == DEFAULT_SCENE)
+    if scene['available']:
+        for op, row in bench_loader(DEFAULT_SCENE, repeat).items():
+            results[f'{DEFAULT_SCENE}/{op}'] = row
+        with _quiet():
+            data = DataLoader(Path(__file__).parent, DEFAULT_SCENE).load_all_data()
+        for op, row in bench_simulator(data, Path(__file__).parent, repeat).items():
+            results[f'{DEFAULT_SCENE}/{op}'] = row
+    else:
+        print(f"场景 {scene['name']} 不可用，跳过: {scene['message']}")
+
+    with tempfile.TemporaryDirectory() as scene_path:
+        if lookup_days:
+            for op, row in bench_date_lookup(scene_path, lookup_days, repeat).items():
+                results[f'lookup-{lookup_days}d/{op}'] = row
+        for n_funds in sizes:
+            scene_id = f'synthetic-{n_funds}x{days}'
+            generate_scene(Path(scene_path) / scene_id, n_funds, days / TRADING_DAYS_PER_YEAR, scene_id=scene_id)
+            for op, row in bench_loader(scene_id, repeat).items():
+                results[f'{scene_id}/{op}'] = row
+            with _quiet():
+                data = DataLoader(Path(__file__).parent, scene_id).load_all_data()
+            for op, row in bench_simulator(data, scene_path, repeat).items():
+                results[f'{scene_id}/{op}'] = row
+
+    return {
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'numpy': np.__version__,
+        },
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.5):
+    """
+    与基准结果比较
+
+    Args:
+        tolerance: 允许的相对增幅，耗时或峰值内存超过 基准 × (1 + tolerance) 视为回退
+
+    Returns:
+        回退列表 [(名称, 指标, 基准值, 当前值)]
+    """
+    regressions = []
+    for name, row in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if row['time_ms'] > base['time_ms'] * (1 + tolerance):
+            regressions.append((name, 'time_ms', base['time_ms'], row['time_ms']))
+        if row['peak_kb'] > MIN_MEMORY_KB and row['peak_kb'] > base['peak_kb'] * (1 + tolerance):
+            regressions.append((name, 'peak_kb', base['peak_kb'], row['peak_kb']))
+    return regressions
+
+
+def print_report(current, baseline=None):
+    print("\n" + "="*90)
+    print("基准测试结果".center(80))
+    print("="*90)
+    print("{:<48} {:>12} {:>12} {:>14}".format("场景/操作", "耗时(ms)", "基准(ms)", "峰值内存(KB)"))
+    print("-"*90)
+    for name, row in current['results'].items():
+        base = (baseline or {}).get('results', {}).get(name)
+        base_str = f"{base['time_ms']:.4f}" if base else '-'
+        print("{:<48} {:>12.4f} {:>12} {:>14.1f}".format(name, row['time_ms'], base_str, row['peak_kb']))
+    print("="*90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="投资模拟基准测试：场景加载与模拟器单步操作的耗时和峰值内存")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10, 100, 1000], help="合成场景的基金数量")
+    parser.add_argument('--days', type=int, default=1000, help="合成场景的交易日数量")
+    parser.add_argument('--lookup-days', type=int, default=LOOKUP_DAYS, help="日期查找基准的交易日数量，0 表示跳过")
+    parser.add_argument('--repeat', type=int, default=5, help="每个操作的计时轮数")
+    parser.add_argument('--baseline', type=str, default=str(BASELINE_PATH), help="基准结果文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为新的基准")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="允许的相对增幅，超过即视为性能回退")
+    parser.add_argument('--output', type=str, help="把本次结果另存为JSON文件")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.sizes, args.days, args.repeat, args.lookup_days)
+
+    baseline = None
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(current, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"已保存基准结果: {baseline_path}")
+        return
+
+    if baseline is None:
+        print("没有基准结果，使用 --save-baseline 保存本次结果作为基准")
+        return
+    if baseline.get('machine') != current['machine']:
+        print("注意：基准结果来自不同的运行环境，比较结果仅供参考")
+
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能回退（超过基准 {args.tolerance:.0%}）:")
+        for name, metric, base, value in regressions:
+            print(f"  {name} {metric}: {base:.4f} -> {value:.4f}")
+        sys.exit(1)
+    print("\n没有发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
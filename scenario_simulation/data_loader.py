@@ -1,52 +1,66 @@
-import os
+import numpy as np
 import pandas as pd
 import datetime
 import re
 import json
 import sqlite3
 from pathlib import Path
+from market_data import MarketData
+from scene_cache import compute_cache_key, load_scene_cache, save_scene_cache
+from scenes import DEFAULT_SCENE, scene_files
+
+# 交易日历对齐方式：
+#   strict  - 只保留上证指数、道琼斯指数和所有基金当天都有数据的日期
+#   union   - 任一基金或指数有数据的日期，缺失的净值/点位向前填充
+#   primary - 主市场（上证指数）的交易日，缺失的净值/点位向前填充
+ALIGNMENT_MODES = ('strict', 'union', 'primary')
+DEFAULT_ALIGNMENT = 'strict'
+PRIMARY_INDEX = 'sh_index'
 
 class DataLoader:
-    def __init__(self, scene_path):
+    def __init__(self, scene_path, scene_id=DEFAULT_SCENE, alignment=DEFAULT_ALIGNMENT):
         """
         初始化数据加载器
         
         Args:
             scene_path: 场景数据目录路径
+            scene_id: 场景ID（见 scenes.SCENES），默认2008金融危机
+            alignment: 交易日历对齐方式，见 ALIGNMENT_MODES
         """
+        if alignment not in ALIGNMENT_MODES:
+            raise ValueError(f"未知的对齐方式: {alignment}，可选: {', '.join(ALIGNMENT_MODES)}")
         self.scene_path = Path(scene_path)
         self.funds_data = {}
         self.news_data = []
         self.timeline = []
+        self.market_data = None
         self.simulation_start_date = None  # 初始化模拟开始日期
+        self.scene_id = scene_id
+        self.alignment = alignment
         # 使用相对路径指向原始目录
-        self.original_data_dir = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) /"database"/ "scene" /"2008金融危机"
-        self.db_path = self.original_data_dir / "fund_2007-2008_crisis.db"
+        self.original_data_dir, self.db_path, self.news_path, self.intro_path = scene_files(scene_id)
         
-    def _convert_percentage(self, value):
+    def _convert_percentage(self, values):
         """
-        将百分比字符串转换为浮点数
-        例如："-2.65%" -> -2.65
+        将百分比字符串列向量化地转换为浮点数
+        例如："-2.65%" -> -2.65，空值和无法解析的值记为0.0
         """
-        if pd.isna(value) or value is None:
-            return 0.0
-            
-        if isinstance(value, (int, float)):
-            return float(value)
-            
-        if isinstance(value, str):
-            # 去除百分号并转换为浮点数
-            value = value.replace('%', '')
-            try:
-                return float(value)
-            except ValueError:
-                print(f"警告：无法转换百分比值 '{value}'，使用0.0替代")
-                return 0.0
-                
-        return 0.0
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype('float64').fillna(0.0)
+        
+        # 去除百分号后统一按数值解析
+        text = values.astype('string').str.replace('%', '', regex=False).str.strip()
+        converted = pd.to_numeric(text, errors='coerce').astype('float64')
+        
+        invalid = converted.isna() & values.notna()
+        if invalid.any():
+            samples = ', '.join(f"'{v}'" for v in values[invalid].unique()[:5])
+            print(f"警告：{int(invalid.sum())} 个百分比值无法转换（如 {samples}），使用0.0替代")
+        
+        return converted.fillna(0.0)
     
     def load_fund_data(self):
-        """从SQLite数据库加载所有基金历史数据"""
+        """从SQLite数据库一次性加载所有基金历史数据"""
         print("从数据库加载基金数据...")
         
         if not self.db_path.exists():
@@ -61,39 +75,39 @@ class DataLoader:
             funds_query = "SELECT fund_code FROM funds"
             fund_codes = pd.read_sql_query(funds_query, conn)['fund_code'].tolist()
             
-            for fund_code in fund_codes:
-                # 查询基金净值数据
-                query = f"""
-                SELECT 
-                    fund_code, 
-                    date as FSRQ, 
-                    unit_nav as DWJZ, 
-                    acc_nav as LJJZ, 
-                    daily_growth as JZZZL, 
-                    status_purchase, 
-                    status_redeem 
-                FROM fund_nav 
-                WHERE fund_code = '{fund_code}'
-                ORDER BY date
-                """
-                
-                df = pd.read_sql_query(query, conn)
-                
-                # 格式化日期
-                df['date'] = pd.to_datetime(df['FSRQ'])
-                
-                # 将涨跌幅转为数值类型 - 处理可能的百分比字符串
-                df['JZZZL'] = df['JZZZL'].apply(self._convert_percentage)
-                
-                # 确保净值列为浮点数
-                for col in ['DWJZ', 'LJJZ']:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-                self.funds_data[fund_code] = df
-                print(f"成功加载基金 {fund_code} 数据，包含 {len(df)} 条记录")
-                
+            # 一次查询读取所有基金的净值数据，再按基金代码拆分
+            query = """
+            SELECT 
+                fund_code, 
+                date as FSRQ, 
+                unit_nav as DWJZ, 
+                acc_nav as LJJZ, 
+                daily_growth as JZZZL, 
+                status_purchase, 
+                status_redeem 
+            FROM fund_nav 
+            WHERE fund_code IN (SELECT fund_code FROM funds)
+            ORDER BY fund_code, date
+            """
+            
+            df = pd.read_sql_query(query, conn)
             conn.close()
+            
+            # 格式化日期
+            df['date'] = pd.to_datetime(df['FSRQ'])
+            
+            # 将涨跌幅转为数值类型 - 处理可能的百分比字符串
+            df['JZZZL'] = self._convert_percentage(df['JZZZL'])
+            
+            # 确保净值列为浮点数
+            for col in ['DWJZ', 'LJJZ']:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            
+            groups = {code: group.reset_index(drop=True) for code, group in df.groupby('fund_code', sort=False)}
+            
+            for fund_code in fund_codes:
+                self.funds_data[fund_code] = groups.get(fund_code, df.iloc[0:0].reset_index(drop=True))
+                print(f"成功加载基金 {fund_code} 数据，包含 {len(self.funds_data[fund_code])} 条记录")
                 
         except Exception as e:
             print(f"从数据库加载基金数据时出错: {e}")
@@ -101,7 +115,7 @@ class DataLoader:
         return self.funds_data
     
     def load_index_data(self):
-        """从SQLite数据库加载指数数据"""
+        """从SQLite数据库一次性加载所有指数数据"""
         print("从数据库加载指数数据...")
         
         if not self.db_path.exists():
@@ -116,39 +130,42 @@ class DataLoader:
             indices_query = "SELECT index_code, index_name FROM indices"
             indices = pd.read_sql_query(indices_query, conn)
             
-            for _, row in indices.iterrows():
-                index_code = row['index_code']
-                index_name = row['index_name']
-                
-                # 查询指数数据
-                query = f"""
-                SELECT 
-                    date,
-                    close as '收盘',
-                    open as '开盘',
-                    high as '最高',
-                    low as '最低',
-                    volume as '成交量',
-                    change_pct as '涨跌幅'
-                FROM index_data 
-                WHERE index_code = '{index_code}'
-                ORDER BY date
-                """
-                
-                df = pd.read_sql_query(query, conn)
-                
-                # 格式化日期
-                df['date'] = pd.to_datetime(df['date'])
-                
-                # 转换涨跌幅百分比字符串为浮点数
-                if '涨跌幅' in df.columns:
-                    df['涨跌幅'] = df['涨跌幅'].apply(self._convert_percentage)
-                
-                # 确保数值列为浮点数
-                for col in ['收盘', '开盘', '最高', '最低']:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                
+            # 一次查询读取所有指数数据，再按指数代码拆分
+            query = """
+            SELECT 
+                index_code,
+                date,
+                close as '收盘',
+                open as '开盘',
+                high as '最高',
+                low as '最低',
+                volume as '成交量',
+                change_pct as '涨跌幅'
+            FROM index_data 
+            WHERE index_code IN (SELECT index_code FROM indices)
+            ORDER BY index_code, date
+            """
+            
+            df = pd.read_sql_query(query, conn)
+            conn.close()
+            
+            # 格式化日期
+            df['date'] = pd.to_datetime(df['date'])
+            
+            # 转换涨跌幅百分比字符串为浮点数
+            df['涨跌幅'] = self._convert_percentage(df['涨跌幅'])
+            
+            # 确保数值列为浮点数
+            for col in ['收盘', '开盘', '最高', '最低']:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            
+            groups = {
+                code: group.drop(columns='index_code').reset_index(drop=True)
+                for code, group in df.groupby('index_code', sort=False)
+            }
+            empty = df.iloc[0:0].drop(columns='index_code').reset_index(drop=True)
+            
+            for index_code, index_name in zip(indices['index_code'], indices['index_name']):
                 # 确定存储的键名
                 key_name = index_code
                 if '上证' in index_name:
@@ -156,10 +173,8 @@ class DataLoader:
                 elif '道琼斯' in index_name:
                     key_name = 'dj_index'
                 
-                self.funds_data[key_name] = df
-                print(f"成功加载指数 {index_name}({index_code}) 数据，包含 {len(df)} 条记录")
-                
-            conn.close()
+                self.funds_data[key_name] = groups.get(index_code, empty)
+                print(f"成功加载指数 {index_name}({index_code}) 数据，包含 {len(self.funds_data[key_name])} 条记录")
                 
         except Exception as e:
             print(f"从数据库加载指数数据时出错: {e}")
@@ -170,7 +185,7 @@ class DataLoader:
         """加载新闻数据"""
         try:
             # 使用相对路径指向原始目录下的新闻文件
-            news_path = self.original_data_dir / "新闻.json"
+            news_path = self.news_path
             if news_path.exists():
                 with open(news_path, 'r', encoding='utf-8') as f:
                     news_data = json.load(f)
@@ -206,7 +221,7 @@ class DataLoader:
         """加载场景介绍"""
         try:
             # 使用相对路径指向原始目录下的场景介绍文件
-            intro_path = self.original_data_dir / "2008金融危机介绍.json"
+            intro_path = self.intro_path
             if intro_path.exists():
                 with open(intro_path, 'r', encoding='utf-8') as f:
                     description_data = json.load(f)
@@ -272,24 +287,124 @@ class DataLoader:
             print(f"获取最早有效日期时出错: {e}")
             return None
     
-    def build_timeline(self):
-        """构建结合新闻和基金数据的时间线，确保每个交易日都有上证指数、道琼斯指数和所有基金的数据"""
-        self.timeline = []
+    def _pivot_market_data(self):
+        """
+        将所有基金净值和指数收盘价按日期对齐为宽表
+        
+        Returns:
+            (values, changes, present): 以日期为索引、代码为列的三个DataFrame，
+            分别为净值/收盘价、涨跌幅和当天是否有数据
+        """
+        values, changes, present = {}, {}, {}
         
-        # 获取所有日期
-        all_dates = set()
+        for code, df in self.funds_data.items():
+            if 'date' not in df.columns:
+                continue
+            
+            if code in ['sh_index', 'dj_index']:
+                value_col, change_col = '收盘', '涨跌幅'
+            else:
+                value_col, change_col = 'DWJZ', 'JZZZL'
+            
+            # 同一日期有多条记录时取第一条，与逐日筛选的结果保持一致
+            day_df = df.assign(_day=df['date'].dt.date).drop_duplicates('_day').set_index('_day')
+            
+            present[code] = pd.Series(True, index=day_df.index)
+            if value_col in day_df.columns:
+                values[code] = day_df[value_col].astype('float64')
+            if change_col in day_df.columns:
+                changes[code] = day_df[change_col].astype('float64')
+        
+        if not present:
+            empty = pd.DataFrame()
+            return empty, empty, empty
         
-        # 添加基金数据日期
-        for fund_code, fund_data in self.funds_data.items():
-            if 'date' in fund_data.columns:
-                all_dates.update(fund_data['date'].dt.date)
+        present = pd.concat(present, axis=1).fillna(False).astype(bool)
+        values = pd.concat(values, axis=1).reindex(present.index) if values else pd.DataFrame(index=present.index)
+        changes = pd.concat(changes, axis=1).reindex(present.index) if changes else pd.DataFrame(index=present.index)
         
-        # 添加新闻日期
+        return values, changes, present
+    
+    def _group_news_by_date(self):
+        """一次遍历将新闻按日期分组"""
+        news_by_date = {}
         for news in self.news_data:
-            all_dates.add(news['date'])
+            news_by_date.setdefault(news['date'], []).append(news['content'])
+        return news_by_date
+    
+    def _strict_calendar(self, present):
+        """
+        严格对齐：按日期对齐后一次性计算有效交易日掩码，
+        当天必须同时有上证指数、道琼斯指数和所有基金的数据
+        """
+        valid_mask = pd.Series(True, index=present.index)
+        for index_code in ['sh_index', 'dj_index']:
+            valid_mask &= present[index_code] if index_code in present.columns else False
+        fund_columns = [code for code in present.columns if code not in ['sh_index', 'dj_index']]
+        if fund_columns:
+            valid_mask &= present[fund_columns].all(axis=1)
+        
+        return [date for date, valid in zip(present.index, valid_mask.tolist()) if valid]
+    
+    def _forward_fill(self, values, changes, present):
+        """
+        按 union/primary 日历对齐并向前填充缺失的净值和点位
+        
+        Args:
+            values, changes: _pivot_market_data 返回的宽表
+            present: 已按全部日期重建索引的数据存在性宽表
+        
+        Returns:
+            (values, changes, valid): 以日历日期为索引的宽表；valid 标记当天是否真实披露了数据。
+            上市前的日期用首个净值回填以保证矩阵没有空值，这些日期同样标记为无效
+        """
+        values = values.reindex(index=present.index)
+        observed = values.notna() & present.reindex(columns=values.columns, fill_value=False)
+        # 每列截至每个日期的真实数据条数，用于判断两个日历日之间是否有被跳过的数据
+        observed_count = observed.cumsum()
+        
+        if self.alignment == 'union':
+            calendar = observed.any(axis=1)
+        elif PRIMARY_INDEX in observed.columns:
+            calendar = observed[PRIMARY_INDEX]
+        else:
+            calendar = pd.Series(False, index=observed.index)
+        # 日历只覆盖至少一只基金有数据的时间段，首尾只有指数数据的日期没有可交易的基金
+        fund_columns = [code for code in observed.columns if code not in ['sh_index', 'dj_index']]
+        if fund_columns:
+            any_fund = observed[fund_columns].any(axis=1).to_numpy()
+            span = np.zeros(len(any_fund), dtype=bool)
+            if any_fund.any():
+                observed_rows = np.flatnonzero(any_fund)
+                span[observed_rows[0]:observed_rows[-1] + 1] = True
+            calendar &= span
+        
+        filled = values.ffill().bfill()[calendar]
+        observed = observed[calendar]
+        new_observations = observed_count[calendar].diff().fillna(observed_count[calendar])
+        
+        # 两个日历日之间恰好有当天这一条新数据时沿用原始涨跌幅；
+        # 没有新数据（停牌）或跳过了非日历日的数据时按填充后的净值重新计算
+        source = changes.reindex(index=filled.index, columns=filled.columns)
+        recomputed = (filled / filled.shift(1) - 1) * 100
+        changes = source.where(observed & (new_observations == 1), recomputed).fillna(0.0)
+        
+        # 某列完全没有数据时无法填充，这样的日期不能作为交易日
+        complete = filled.notna().all(axis=1)
+        return filled[complete], changes[complete], observed[complete]
+    
+    def build_timeline(self):
+        """
+        构建结合新闻和基金数据的时间线
         
-        # 排序日期
-        sorted_dates = sorted(all_dates)
+        strict 对齐时确保每个交易日都有上证指数、道琼斯指数和所有基金的数据；
+        union/primary 对齐时缺失的数据向前填充，并在 MarketData.fund_valid 中标记为无效
+        """
+        values, changes, present = self._pivot_market_data()
+        news_by_date = self._group_news_by_date()
+        
+        # 所有日期：基金/指数日期与新闻日期的并集
+        sorted_dates = sorted(set(present.index) | set(news_by_date))
         
         # 获取最早有效日期
         earliest_valid_date = self.simulation_start_date or self.get_earliest_valid_date()
@@ -297,76 +412,19 @@ class DataLoader:
             # 过滤掉早于最早有效日期的日期
             sorted_dates = [date for date in sorted_dates if date >= earliest_valid_date]
         
-        # 获取所有可交易基金代码（不包括指数）
-        fund_codes = [code for code in self.funds_data.keys() if code not in ['sh_index', 'dj_index']]
-        
-        # 构建时间线
-        valid_trading_days = []
-        for date in sorted_dates:
-            # 检查当天是否有上证指数数据
-            has_sh_index = False
-            if 'sh_index' in self.funds_data:
-                sh_index_data = self.funds_data['sh_index']
-                if 'date' in sh_index_data.columns:
-                    if not sh_index_data[sh_index_data['date'].dt.date == date].empty:
-                        has_sh_index = True
-            
-            # 检查当天是否有道琼斯指数数据
-            has_dj_index = False
-            if 'dj_index' in self.funds_data:
-                dj_index_data = self.funds_data['dj_index']
-                if 'date' in dj_index_data.columns:
-                    if not dj_index_data[dj_index_data['date'].dt.date == date].empty:
-                        has_dj_index = True
-            
-            # 检查当天是否所有基金都有数据
-            all_funds_have_data = True
-            for fund_code in fund_codes:
-                if fund_code in self.funds_data:
-                    fund_data = self.funds_data[fund_code]
-                    if 'date' in fund_data.columns:
-                        if fund_data[fund_data['date'].dt.date == date].empty:
-                            all_funds_have_data = False
-                            break
-            
-            # 只有当同时满足三个条件时，该日期才被视为有效交易日
-            if has_sh_index and has_dj_index and all_funds_have_data:
-                valid_trading_days.append(date)
+        present = present.reindex(sorted_dates, fill_value=False)
+        if self.alignment == 'strict':
+            valid_trading_days = self._strict_calendar(present)
+            fund_valid = None
+        else:
+            values, changes, fund_valid = self._forward_fill(values, changes, present)
+            valid_trading_days = list(values.index)
         
         print(f"筛选后的有效交易日数量: {len(valid_trading_days)}")
         
-        # 对有效交易日构建详细数据
-        for date in valid_trading_days:
-            date_events = {'date': date, 'news': [], 'funds': {}}
-            
-            # 添加当天新闻
-            for news in self.news_data:
-                if news['date'] == date:
-                    date_events['news'].append(news['content'])
-            
-            # 添加当天基金数据
-            for fund_code, fund_data in self.funds_data.items():
-                if 'date' in fund_data.columns:
-                    day_data = fund_data[fund_data['date'].dt.date == date]
-                    if not day_data.empty:
-                        day_info = {}
-                        
-                        if fund_code in ['sh_index', 'dj_index']:
-                            # 指数数据
-                            if '收盘' in day_data.columns:
-                                day_info['close'] = float(day_data['收盘'].values[0])
-                            if '涨跌幅' in day_data.columns:
-                                day_info['change_pct'] = float(day_data['涨跌幅'].values[0])
-                        else:
-                            # 基金数据
-                            if 'DWJZ' in day_data.columns:
-                                day_info['nav'] = float(day_data['DWJZ'].values[0])
-                            if 'JZZZL' in day_data.columns:
-                                day_info['change_pct'] = float(day_data['JZZZL'].values[0])
-                        
-                        date_events['funds'][fund_code] = day_info
-            
-            self.timeline.append(date_events)
+        # 按有效交易日切片为列式行情数据，时间线作为其按需构建的兼容视图
+        self.market_data = MarketData.from_frames(valid_trading_days, values, changes, news_by_date, fund_valid)
+        self.timeline = self.market_data.timeline
         
         print(f"成功构建时间线，包含 {len(self.timeline)} 个有效交易日")
         if self.timeline:
@@ -377,8 +435,34 @@ class DataLoader:
         
         return self.timeline
     
-    def load_all_data(self):
-        """加载所有数据"""
+    def load_all_data(self, use_cache=True):
+        """
+        加载所有数据
+        
+        Args:
+            use_cache: 是否使用编译后的场景缓存。缓存以数据库、新闻和场景介绍文件的
+                大小与修改时间为键，任一文件变化时自动重建。从缓存加载时不会读取
+                原始的基金DataFrame，返回的funds_data为空字典。每种对齐方式使用单独的缓存。
+        """
+        cache_key = compute_cache_key([self.db_path, self.news_path, self.intro_path])
+        if use_cache:
+            cached = load_scene_cache(self.db_path, cache_key, self.alignment)
+            if cached:
+                self.market_data = cached['market_data']
+                self.timeline = self.market_data.timeline
+                self.news_data = cached['news_data']
+                self.simulation_start_date = cached['simulation_start_date']
+                print(f"从场景缓存加载数据，包含 {len(self.timeline)} 个有效交易日")
+                
+                return {
+                    'funds_data': self.funds_data,
+                    'news_data': self.news_data,
+                    'timeline': self.timeline,
+                    'market_data': self.market_data,
+                    'description': cached['description'],
+                    'simulation_start_date': self.simulation_start_date
+                }
+        
         # 首先获取最早有效日期
         self.simulation_start_date = self.get_earliest_valid_date()
         
@@ -388,10 +472,18 @@ class DataLoader:
         description = self.load_scene_description()
         self.build_timeline()
         
+        if use_cache and self.db_path.exists():
+            try:
+                save_scene_cache(self.db_path, cache_key, self.market_data, self.news_data,
+                                 description, self.simulation_start_date, self.alignment)
+            except Exception as e:
+                print(f"写入场景缓存时出错: {e}")
+        
         return {
             'funds_data': self.funds_data,
             'news_data': self.news_data,
             'timeline': self.timeline,
+            'market_data': self.market_data,
             'description': description,
             'simulation_start_date': self.simulation_start_date
-        }
\ No newline at end of file
+        }
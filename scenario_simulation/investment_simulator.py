@@ -1,22 +1,69 @@
 import os
 import json
+import numpy as np
 import pandas as pd
 import datetime
 from pathlib import Path
-from data_loader import DataLoader
+from data_loader import DEFAULT_ALIGNMENT, DataLoader
+from news_index import NewsIndex
+from performance import PerformanceTracker, build_summary, market_return
+from range_query import FREQUENCIES
+from session_log import LoggedRecords, SessionLog
+from scenes import DEFAULT_SCENE
+from session_state import ActionsView, CowList, HistoryView, SessionState
+
+# 调仓时忽略低于该金额（元）的差额，避免浮点误差产生无意义的零头订单
+MIN_ORDER_AMOUNT = 0.01
+# 批量订单现金检查允许的浮点误差（元）
+CASH_TOLERANCE = 1e-6
+# 状态中显示的指数（指数键名, 显示名称），紧凑编码中 idx 按此顺序排列
+STATE_INDICES = (('sh_index', '上证指数'), ('dj_index', '道琼斯指数'))
+
+def trade_fills(actions):
+    """
+    把用户行为记录展开为逐笔成交
+
+    Args:
+        actions: 序列化的用户行为列表（导出文件或日志中的格式）
+
+    Returns:
+        (action_type, details) 迭代器，action_type 为 'buy' 或 'sell'；
+        批量订单 'batch' 按成交顺序展开为其中的每一笔
+    """
+    for action in actions:
+        if action['action_type'] in ('buy', 'sell'):
+            yield action['action_type'], action['details']
+        elif action['action_type'] == 'batch':
+            for order in action['details']['orders']:
+                yield order['action_type'], order
+
+
+def _compact(value, digits):
+    """紧凑编码中的数值：按位数四舍五入，NaN 编码为 None"""
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
 
 class InvestmentSimulator:
-    def __init__(self, scene_path, initial_capital=100000):
+    def __init__(self, scene_path, initial_capital=100000, data=None, scene_id=DEFAULT_SCENE,
+                 alignment=DEFAULT_ALIGNMENT):
         """
         初始化投资模拟器
         
         Args:
             scene_path: 场景数据目录路径
             initial_capital: 初始资金，默认10万元
+            data: 已加载的场景数据（DataLoader.load_all_data() 或 attach_scene_data() 的返回值），
+                多个会话共享同一份只读行情数据时传入，不传则自行加载
+            scene_id: 场景ID（见 scenes.SCENES），默认2008金融危机
+            alignment: 自行加载数据时的交易日历对齐方式（见 data_loader.ALIGNMENT_MODES）
         """
         self.scene_path = Path(scene_path)
-        self.data_loader = DataLoader(scene_path)
-        self.data = self.data_loader.load_all_data()
+        self.scene_id = scene_id
+        self.alignment = alignment
+        self.data = data if data is not None else self.data_loader.load_all_data()
+        # 列式行情数据，所有价格查询都通过它按下标读取
+        self.market = self.data['market_data']
         
         # 创建保存目录
         self.save_dir = self.scene_path / "save"
@@ -25,74 +72,177 @@ class InvestmentSimulator:
         # 初始化用户资产信息
         self.initial_capital = initial_capital
         
+        # 会话事件日志，调用 start_session_log 或 resume_session 后启用
+        self.session_log = None
+        self._replaying = False
+        # 恢复会话时快照之前的操作只保存在日志中，导出时按此偏移量从日志读取
+        self._logged_actions_end = None
+        # 当前净值历史中已写入会话历史文件的记录数，及这些记录在文件中的区间 [(起始, 结束, 记录数), ...]
+        self._history_synced = 0
+        self._history_segments = []
+        
         # 获取模拟开始日期索引
         self.start_date_index = 0
         if 'simulation_start_date' in self.data and self.data['simulation_start_date']:
-            for i, day in enumerate(self.data['timeline']):
-                if day['date'] >= self.data['simulation_start_date']:
-                    self.start_date_index = i
-                    break
-        
-        # 重置模拟器状态
-        self.reset_simulation()
-        
-        # 模拟器状态
-        self.current_date_index = 0
-        self.current_date = None
-        self.is_simulation_over = False
+            start_row = self.market.row_on_or_after(self.data['simulation_start_date'])
+            if start_row is not None:
+                self.start_date_index = start_row
         
-        # 用户行为记录
-        self.user_actions = []
+        # get_state_delta 发放的状态版本：第 v 个版本对应 _versions[v - 1] = (纪元, 操作数, 行, 是否结束)；
+        # 会话状态被整体替换（重置、导入、恢复、分叉）时进入新的纪元，旧纪元的版本只能返回完整状态
+        self._versions = []
+        self._version_state = None
+        self._version_epoch = 0
         
-        # 获取所有可交易的基金列表
-        self.available_funds = list(self.data['funds_data'].keys())
-        # 从基金列表中移除指数，因为指数不可直接交易
-        if 'sh_index' in self.available_funds:
-            self.available_funds.remove('sh_index')
-        if 'dj_index' in self.available_funds:
-            self.available_funds.remove('dj_index')
+        # 重置模拟器状态（现金、持仓、当前日期和用户行为记录）
+        self.state = None
+        self.reset_simulation()
+    
+    @property
+    def data_loader(self):
+        """场景数据加载器，只在需要自行加载数据时创建"""
+        return DataLoader(self.scene_path, self.scene_id, self.alignment)
+    
+    @property
+    def available_funds(self):
+        """所有可交易的基金列表（行情数据中的基金列不包含指数，指数不可直接交易）"""
+        return self.market.fund_codes
+    
+    @property
+    def news_index(self):
+        """场景新闻的倒排索引，首次访问时构建并保存在场景数据中，与共享该数据的会话共用"""
+        if 'news_index' not in self.data:
+            self.data['news_index'] = NewsIndex(self.data.get('news_data', []))
+        return self.data['news_index']
+    
+    # 会话状态保存在紧凑的 SessionState 中，以下属性为其只读或读写视图
+    @property
+    def cash(self):
+        return self.state.cash
+    
+    @cash.setter
+    def cash(self, value):
+        self.state.cash = value
+    
+    @property
+    def current_date_index(self):
+        return self.state.current_date_index
+    
+    @current_date_index.setter
+    def current_date_index(self, value):
+        self.state.current_date_index = value
+    
+    @property
+    def is_simulation_over(self):
+        return self.state.is_simulation_over
+    
+    @is_simulation_over.setter
+    def is_simulation_over(self, value):
+        self.state.is_simulation_over = value
+    
+    @property
+    def tracker(self):
+        return self.state.tracker
+    
+    @tracker.setter
+    def tracker(self, value):
+        self.state.tracker = value
+    
+    @property
+    def current_date(self):
+        """当前交易日；模拟结束后保持为最后一个交易日"""
+        if not self.market.dates:
+            return None
+        return self.market.dates[min(self.state.current_date_index, len(self.market) - 1)]
+    
+    @property
+    def holdings(self):
+        """持仓 {fund_code: shares}"""
+        return self.state.holdings
+    
+    @property
+    def cost_basis(self):
+        """持仓成本 {fund_code: 买入金额}，卖出时按份额比例结转，用于计算已实现盈亏"""
+        return self.state.cost_basis
+    
+    @property
+    def net_worth_history(self):
+        """净值历史，每个交易日一条 {'date', 'cash', 'holdings_value', 'total_assets'} 记录"""
+        return HistoryView(self.state)
+    
+    @property
+    def user_actions(self):
+        """用户行为记录"""
+        return ActionsView(self.state)
     
     def reset_simulation(self):
         """重置模拟器，恢复初始状态"""
-        # 用户资产
-        self.cash = self.initial_capital  # 现金
-        self.holdings = {}  # 持仓 {fund_code: shares}
-        self.net_worth_history = []  # 净值历史
-        
-        # 设置初始日期为获取的最早有效日期
-        self.current_date_index = self.start_date_index
-        self.is_simulation_over = False
-        self.user_actions = []
-        
-        if self.data['timeline']:
-            self.current_date = self.data['timeline'][self.current_date_index]['date']
-        else:
-            self.current_date = None
+        # 用户资产、当前日期（最早有效日期）、净值历史、用户行为记录和投资表现指标的流式累加器
+        self.state = SessionState(
+            self.market, self.initial_capital, self.start_date_index, PerformanceTracker(self.market.index_codes)
+        )
+        self._history_synced = 0
+        self._history_segments = []
             
         # 记录初始资产状态
         self._update_net_worth()
+        
+        if self.session_log is not None and not self._replaying:
+            self._logged_actions_end = None
+            self._log_event({'event': 'reset'})
+            self._write_snapshot()
+    
+    def fork(self):
+        """
+        在当前交易日分叉出一个独立的模拟器
+        
+        分叉与原模拟器共享行情数据和已有的净值历史、用户行为记录（写时复制），
+        之后两者的操作互不影响，可用于比较“如果在这里卖出”等不同决策分支。
+        分叉不继承会话日志。
+        
+        Returns:
+            新的 InvestmentSimulator
+        """
+        child = InvestmentSimulator.__new__(InvestmentSimulator)
+        child.__dict__.update(self.__dict__)
+        child.session_log = None
+        child._replaying = False
+        child._logged_actions_end = None
+        child._versions = list(self._versions)
+        child.state = self.state.fork()
+        
+        # 恢复会话前的操作只保存在日志中，分叉时补入其用户行为记录
+        if self.session_log is not None and self._logged_actions_end is not None:
+            logged = [self._action_record(action) for action in self._logged_actions()]
+            child.state.actions = CowList(logged + list(child.state.actions))
+        return child
     
     def _update_net_worth(self):
-        """更新当前净值"""
-        total_holdings_value = 0
+        """
+        重新估值持仓并记录当天净值
+        
+        只在持仓变化或日期推进时调用；同一交易日多次调用时覆盖当天的记录，
+        保证净值历史中每个交易日恰好一条记录。
+        """
+        if not self.market.dates:
+            return self.cash
         
         # 计算持仓价值
-        for fund_code, shares in self.holdings.items():
-            # 获取当前日期的基金净值
-            fund_info = self._get_fund_info_by_date(fund_code, self.current_date)
-            if fund_info and 'nav' in fund_info:
-                total_holdings_value += shares * fund_info['nav']
+        row = min(self.current_date_index, len(self.market) - 1)
+        held = self.state.shares > 0
+        total_holdings_value = float(self.state.shares[held] @ self.market.nav[row, held]) if held.any() else 0
         
         # 计算总资产
         total_assets = self.cash + total_holdings_value
         
         # 记录净值历史
-        self.net_worth_history.append({
-            'date': self.current_date,
-            'cash': self.cash,
-            'holdings_value': total_holdings_value,
-            'total_assets': total_assets
-        })
+        record = (row, self.cash, total_holdings_value, total_assets)
+        history = self.state.history
+        if len(history) and history[-1][0] == row:
+            history.set_last(record)
+        else:
+            history.append(record)
+        self.tracker.update_day(self.market.dates[row], total_assets, self.market.index_close[row])
         
         return total_assets
     
@@ -101,73 +251,322 @@ class InvestmentSimulator:
         if date is None:
             return None
             
-        # 在时间线中查找对应日期的基金信息
-        for day in self.data['timeline']:
-            if day['date'] == date and fund_code in day['funds']:
-                return day['funds'][fund_code]
-        
-        return None
+        # 按日期定位行情矩阵的行，再按基金代码定位列
+        return self.market.fund_info(fund_code, self.market.row_of(date))
     
     def _record_action(self, action_type, details):
         """记录用户行为"""
-        action = {
-            'date': self.current_date,
-            'action_type': action_type,
-            'details': details,
-            'timestamp': datetime.datetime.now().isoformat(),
-            'cash_after': self.cash,
+        row = min(self.current_date_index, len(self.market) - 1)
+        timestamp = datetime.datetime.now().timestamp()
+        self.state.actions.append((row, action_type, details, timestamp, self.cash))
+        self._log_event({'event': 'action', 'action': self._serialize_action(self.user_actions[-1])})
+    
+    def _action_record(self, action):
+        """将序列化的用户行为（导出文件或日志中的格式）转换为紧凑记录"""
+        date = action.get('date')
+        if isinstance(date, str):
+            date = datetime.datetime.strptime(date, '%Y-%m-%d').date()
+        row = self.market.row_of(date) if date else None
+        try:
+            timestamp = datetime.datetime.fromisoformat(action['timestamp']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            timestamp = 0.0
+        return (row, action['action_type'], action['details'], timestamp, action.get('cash_after'))
+    
+    def _serialize_action(self, action):
+        """将用户行为记录转换为可JSON序列化的字典，日期对象转换为字符串"""
+        serialized_action = {
+            'date': action['date'].strftime('%Y-%m-%d') if isinstance(action['date'], (datetime.date, datetime.datetime)) else action['date'],
+            'action_type': action['action_type'],
+            'timestamp': action['timestamp'],
+            'cash_after': action['cash_after']
         }
-        self.user_actions.append(action)
+        
+        # 处理详情字段，检查其中是否包含日期对象
+        details = action['details'].copy() if isinstance(action['details'], dict) else action['details']
+        if isinstance(details, dict):
+            for key, value in details.items():
+                if isinstance(value, (datetime.date, datetime.datetime)):
+                    details[key] = value.strftime('%Y-%m-%d')
+        
+        serialized_action['details'] = details
+        return serialized_action
     
-    def get_current_state(self):
-        """获取当前状态信息"""
-        if self.is_simulation_over:
+    def _log_event(self, event):
+        """向会话日志追加一条事件，达到快照间隔时写入快照"""
+        if self.session_log is None or self._replaying:
+            return
+        if self.session_log.append(event):
+            self._write_snapshot()
+    
+    def _write_snapshot(self):
+        """
+        写入当前会话状态快照
+        
+        净值历史不写入快照：已经结束的交易日的记录先追加到历史文件，快照中只保存它们的区间和当天的记录。
+        """
+        if self.session_log is None or self._replaying:
+            return
+        self._sync_history()
+        self.session_log.write_snapshot({
+            'initial_capital': self.initial_capital,
+            'cash': self.cash,
+            'holdings': self.holdings,
+            'cost_basis': self.cost_basis,
+            'current_date_index': self.current_date_index,
+            'is_simulation_over': self.is_simulation_over,
+            'history': self._history_segments,
+            'last_history': self._unsynced_history(),
+            'tracker': self.tracker.to_dict(),
+        })
+    
+    def _history_entry(self, record):
+        """净值记录在历史文件和快照中的格式: [日期, 现金, 持仓价值, 总资产]"""
+        row, cash, holdings_value, total_assets = record
+        return [self.market.dates[row].isoformat(), cash, holdings_value, total_assets]
+    
+    def _history_record(self, entry):
+        """把历史文件中的记录转换回紧凑记录"""
+        date, cash, holdings_value, total_assets = entry
+        return (self.market.row_of(datetime.date.fromisoformat(date)), cash, holdings_value, total_assets)
+    
+    def _sync_history(self):
+        """把净值历史中尚未写入历史文件的记录追加到历史文件；最后一条（当天的）记录还可能被覆盖，不写入"""
+        history = self.state.history
+        end = len(history) - 1
+        if end <= self._history_synced:
+            return
+        start, stop, count = self.session_log.append_history(
+            [self._history_entry(record) for record in history[self._history_synced:end]]
+        )
+        segments = self._history_segments
+        if segments and segments[-1][1] == start:
+            segments[-1] = (segments[-1][0], stop, segments[-1][2] + count)
+        else:
+            segments.append((start, stop, count))
+        self._history_synced = end
+    
+    def _unsynced_history(self):
+        """净值历史中没有写入历史文件的最后一条记录，没有时返回 None"""
+        history = self.state.history
+        return self._history_entry(history[-1]) if len(history) > self._history_synced else None
+    
+    def _restore_history(self, history_path, segments, last_entry):
+        """用历史文件中的区间和最后一条记录恢复净值历史，文件中的记录在首次访问时才读取"""
+        segments = [tuple(segment) for segment in segments]
+        logged = LoggedRecords(history_path, segments, self._history_record)
+        last = [self._history_record(last_entry)] if last_entry else []
+        self.state.history = CowList.over(logged, last)
+        self._history_segments = segments
+        self._history_synced = len(logged)
+    
+    def start_session_log(self, log_path=None, snapshot_every=100):
+        """
+        开始记录会话事件日志
+        
+        之后的每个操作都会追加到日志中，并定期写入状态快照，可通过 resume_session 快速恢复。
+        
+        Args:
+            log_path: 日志文件路径，默认在save目录下按时间生成
+            snapshot_every: 每多少条事件写一次快照
+            
+        Returns:
+            操作结果字典
+        """
+        if not log_path:
+            log_path = self.save_dir / f"session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        
+        self.close_session_log()
+        log = SessionLog(log_path, snapshot_every)
+        if log.snapshot_path.exists():
+            os.remove(log.snapshot_path)
+        if log.history_path.exists():
+            # 当前净值历史可能还在按需引用这个文件，删除前先读入内存
+            self.state.history = CowList(self.state.history)
+            os.remove(log.history_path)
+        self.session_log = log.open(truncate_at=0)
+        self._logged_actions_end = None
+        self._history_synced = 0
+        self._history_segments = []
+        
+        # 日志开头记录初始条件，之前已发生的操作由紧随其后的快照保存
+        self.session_log.append({
+            'event': 'start',
+            'initial_capital': self.initial_capital,
+            'start_date': self.market.dates[self.start_date_index].isoformat() if self.market.dates else None,
+        })
+        for action in self.user_actions:
+            self.session_log.append({'event': 'action', 'action': self._serialize_action(action)})
+        self._write_snapshot()
+        
+        return {
+            'success': True,
+            'message': f'会话日志: {log_path}',
+            'file_path': str(log_path)
+        }
+    
+    def close_session_log(self):
+        """写入最终快照并关闭会话日志"""
+        if self.session_log is not None:
+            self._write_snapshot()
+            self.session_log.close()
+            self.session_log = None
+    
+    def resume_session(self, log_path, snapshot_every=100):
+        """
+        从会话日志恢复模拟状态
+        
+        读取最新快照恢复现金、持仓、日期和指标累加器，然后只重放快照之后的日志尾部，
+        恢复后继续向同一日志追加。快照之前的净值历史留在历史文件中，首次访问时才读取。
+        
+        Args:
+            log_path: start_session_log 创建的日志文件路径
+            snapshot_every: 每多少条事件写一次快照
+            
+        Returns:
+            操作结果字典
+        """
+        log_path = Path(log_path)
+        if not log_path.exists():
             return {
-                'status': 'ended',
-                'message': '模拟已结束'
+                'success': False,
+                'message': f'会话日志不存在: {log_path}'
             }
+        
+        self.close_session_log()
+        log = SessionLog(log_path, snapshot_every)
+        state, events, end = log.load()
+        
+        self._replaying = True
+        try:
+            if state is not None:
+                self._restore_state(state, log.history_path)
+                self._logged_actions_end = log.snapshot_offset
+            else:
+                start = events[0] if events and events[0].get('event') == 'start' else {}
+                self.initial_capital = start.get('initial_capital', self.initial_capital)
+                self.reset_simulation()
+                self._logged_actions_end = None
             
-        if self.current_date_index >= len(self.data['timeline']):
-            self.is_simulation_over = True
+            for event in events:
+                self._replay_event(event, log.history_path)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return {
+                'success': False,
+                'message': f'恢复会话时出错: {str(e)}'
+            }
+        finally:
+            self._replaying = False
+        
+        self.session_log = log.open(truncate_at=end)
+        self._write_snapshot()
+        
+        return {
+            'success': True,
+            'message': f'已从会话日志恢复，当前日期 {self.current_date}',
+            'replayed_events': len(events),
+            'file_path': str(log_path)
+        }
+    
+    def _restore_state(self, state, history_path):
+        """从快照状态恢复模拟器"""
+        self.initial_capital = state['initial_capital']
+        self.state = SessionState(
+            self.market, state['cash'], state['current_date_index'], PerformanceTracker.from_dict(state['tracker'])
+        )
+        self.state.set_holdings(state['holdings'], state['cost_basis'])
+        self.is_simulation_over = state['is_simulation_over']
+        self._restore_history(history_path, state['history'], state['last_history'])
+    
+    def _replay_event(self, event, history_path):
+        """重放一条日志事件"""
+        kind = event.get('event')
+        if kind == 'reset':
+            self.reset_simulation()
+            self._logged_actions_end = None
+        elif kind == 'import':
+            if 'history' in event:
+                row = self.market.row_of(datetime.date.fromisoformat(event['end_date']))
+                if row is None:
+                    raise ValueError(f"无法在当前时间线中找到导入记录的结束日期: {event['end_date']}")
+                self.state = SessionState(self.market, event['cash'], row, PerformanceTracker.from_dict(event['tracker']))
+                self.state.set_holdings(event['holdings'], event['cost_basis'])
+                self.state.actions.extend(self._action_record(action) for action in event['actions'])
+                self._restore_history(history_path, event['history'], event['last_history'])
+            else:
+                # 早期的日志只记录了导入文件路径
+                result = self.import_history(event['file_path'])
+                if not result['success']:
+                    raise ValueError(f"无法重放导入: {result['message']}")
+            self._logged_actions_end = None
+        elif kind == 'action':
+            action = event['action']
+            details = action['details']
+            action_type = action['action_type']
+            if action_type == 'buy':
+                result = self.buy_fund(details['fund_code'], details['amount'])
+            elif action_type == 'sell':
+                result = self.sell_fund(details['fund_code'], shares=details['shares'])
+            elif action_type == 'next_day':
+                result = self.next_day()
+            elif action_type == 'advance':
+                result = self.advance(details['days'])
+            elif action_type == 'batch':
+                result = self.execute_orders([
+                    {'action': 'sell', 'fund_code': order['fund_code'], 'shares': order['shares']}
+                    if order['action_type'] == 'sell' else
+                    {'action': 'buy', 'fund_code': order['fund_code'], 'amount': order['amount']}
+                    for order in details['orders']
+                ])
+            else:
+                return
+            if not result['success']:
+                raise ValueError(f"无法重放操作 {action_type}: {result['message']}")
+            # 保留原始操作时间
+            row, action_type, details, _, cash_after = self.state.actions[-1]
+            timestamp = datetime.datetime.fromisoformat(action['timestamp']).timestamp()
+            self.state.actions.set_last((row, action_type, details, timestamp, cash_after))
+    
+    def _logged_actions(self):
+        """恢复会话前只保存在日志中的用户行为记录（序列化形式）"""
+        actions = []
+        if self.session_log is not None and self._logged_actions_end is not None:
+            for event in self.session_log.read_events(self._logged_actions_end):
+                kind = event.get('event')
+                if kind == 'reset':
+                    actions = []
+                elif kind == 'import':
+                    actions = list(event['actions'])
+                elif kind == 'action':
+                    actions.append(event['action'])
+        return actions
+    
+    def _all_actions(self):
+        """完整的用户行为记录（序列化形式），包括恢复会话前只保存在日志中的部分"""
+        return self._logged_actions() + [self._serialize_action(action) for action in self.user_actions]
+    
+    def get_current_state(self):
+        """获取当前状态信息（只读，不修改模拟器状态，可频繁调用）"""
+        if self.is_simulation_over or self.current_date_index >= len(self.market):
             return {
                 'status': 'ended',
                 'message': '模拟已结束'
             }
         
-        current_day = self.data['timeline'][self.current_date_index]
-        self.current_date = current_day['date']
+        row = self.current_date_index
         
         # 准备市场数据信息
-        market_info = {}
-        indices_info = {}
-        
-        # 添加上证指数信息
-        if 'sh_index' in current_day['funds']:
-            indices_info['上证指数'] = {
-                '收盘价': current_day['funds']['sh_index'].get('close', '暂无'),
-                '涨跌幅': current_day['funds']['sh_index'].get('change_pct', '暂无')
-            }
-            
-        # 添加道琼斯指数信息
-        if 'dj_index' in current_day['funds']:
-            indices_info['道琼斯指数'] = {
-                '收盘价': current_day['funds']['dj_index'].get('close', '暂无'),
-                '涨跌幅': current_day['funds']['dj_index'].get('change_pct', '暂无')
-            }
+        indices_info = self._build_indices_info(row)
         
         # 可交易基金信息
-        funds_info = {}
-        for fund_code in self.available_funds:
-            if fund_code in current_day['funds']:
-                funds_info[fund_code] = {
-                    '净值': current_day['funds'][fund_code].get('nav', '暂无'),
-                    '涨跌幅': current_day['funds'][fund_code].get('change_pct', '暂无')
-                }
+        funds_info = self._build_funds_info(row)
         
         # 用户当前持仓状态
         holdings_info = []
         for fund_code, shares in self.holdings.items():
-            fund_info = self._get_fund_info_by_date(fund_code, self.current_date)
+            fund_info = self.market.fund_info(fund_code, row)
             if fund_info and 'nav' in fund_info:
                 value = shares * fund_info['nav']
                 holding = {
@@ -179,8 +578,8 @@ class InvestmentSimulator:
                 }
                 holdings_info.append(holding)
         
-        # 计算总资产
-        total_assets = self._update_net_worth()
+        # 总资产取自持仓变化或日期推进时已更新的当天净值记录
+        total_assets = self.net_worth_history[-1]['total_assets'] if self.net_worth_history else self.cash
         
         return {
             'status': 'active',
@@ -190,7 +589,195 @@ class InvestmentSimulator:
             'indices': indices_info,
             'funds': funds_info,
             'holdings': holdings_info,
-            'news': current_day['news']
+            'news': list(self.market.news[row])
+        }
+    
+    def _state_version(self):
+        """返回当前状态的版本号，状态自上次发放版本后有变化时发放新版本"""
+        if self.state is not self._version_state:
+            self._version_state = self.state
+            self._version_epoch += 1
+        # 同一纪元内操作记录只追加、交易日只前进，三者相同即状态相同
+        key = (self._version_epoch, len(self.state.actions), self.current_date_index, self.is_simulation_over)
+        if not self._versions or self._versions[-1] != key:
+            self._versions.append(key)
+        return len(self._versions)
+    
+    def get_state_delta(self, since=None, compact=False):
+        """
+        获取版本化的增量状态，供频繁轮询的界面或智能体使用
+        
+        每次调用返回当前状态的版本号 version；下次传入 since=version 时只返回此后的变化：
+        行情有变化的基金、交易过或市值有变化的持仓、已清仓的基金，以及新增的新闻。
+        since 为空、未知或早于重置/导入等整体替换状态的操作时返回完整状态（full 为 True）。
+        
+        Args:
+            since: 客户端已有状态的版本号
+            compact: 为 True 时使用按场景基金列位置编码的紧凑格式（见 _compact_state）
+        
+        Returns:
+            模拟结束时为 {'status': 'ended', 'version'}；否则 full 为 True 时为
+            get_current_state() 的全部字段，增量时为 {'status', 'version', 'since', 'full', 'date',
+            'cash', 'total_assets', 'indices'(交易日变化时), 'funds', 'holdings', 'closed', 'news'}，
+            其中 news 为 [{'date', 'content'}]
+        """
+        version = self._state_version()
+        if self.is_simulation_over or self.current_date_index >= len(self.market):
+            return {'status': 'ended', 'version': version}
+        
+        base = None
+        if since is not None and 0 < since <= len(self._versions):
+            base = self._versions[since - 1]
+            if base[0] != self._version_epoch or base[3]:
+                base = None
+        
+        row = self.current_date_index
+        if base is None:
+            if compact:
+                return self._compact_state(version, row)
+            state = self.get_current_state()
+            state.update({'version': version, 'full': True})
+            return state
+        
+        _, since_actions, since_row, _ = base
+        
+        # 行情变化：净值或涨跌幅与基准行不同的基金（两边都为 NaN 视为相同）
+        changed = np.zeros(len(self.market.fund_codes), dtype=bool)
+        if since_row != row:
+            for matrix in (self.market.nav, self.market.fund_change):
+                old, new = matrix[since_row], matrix[row]
+                changed |= ~((old == new) | (np.isnan(old) & np.isnan(new)))
+        
+        # 持仓变化：基准之后交易过的基金
+        traded = np.zeros(len(self.market.fund_codes), dtype=bool)
+        fills = trade_fills({'action_type': action_type, 'details': details}
+                            for _, action_type, details, _, _ in self.state.actions[since_actions:])
+        for _, details in fills:
+            col = self.market.fund_index.get(details['fund_code'])
+            if col is not None:
+                traded[col] = True
+        shares = self.state.shares
+        
+        news = [(self.market.dates[r], content)
+                for r in range(since_row + 1, row + 1) for content in self.market.news[r]]
+        total_assets = self.net_worth_history[-1]['total_assets'] if self.net_worth_history else self.cash
+        
+        if compact:
+            delta = {
+                'v': version,
+                'since': since,
+                'full': 0,
+                'd': self.current_date.strftime('%Y-%m-%d'),
+                'cash': round(self.cash, 2),
+                'ta': round(total_assets, 2),
+                'px': [[int(col), _compact(self.market.nav[row, col], 4), _compact(self.market.fund_change[row, col], 2)]
+                       for col in np.flatnonzero(changed)],
+                # 只列出份额有变化的基金（0 表示已清仓），市值由客户端按 px 计算
+                'hold': [[int(col), _compact(shares[col], 4)] for col in np.flatnonzero(traded)],
+                'news': [[date.strftime('%Y-%m-%d'), content] for date, content in news],
+            }
+            if since_row != row:
+                delta['idx'] = self._compact_indices(row)
+            return delta
+        
+        fund_codes = self.market.fund_codes
+        delta = {
+            'status': 'active',
+            'version': version,
+            'since': since,
+            'full': False,
+            'date': self.current_date.strftime('%Y-%m-%d'),
+            'cash': self.cash,
+            'total_assets': total_assets,
+            'funds': {fund_codes[col]: {'净值': float(self.market.nav[row, col]),
+                                        '涨跌幅': float(self.market.fund_change[row, col])}
+                      for col in np.flatnonzero(changed)},
+            'holdings': [
+                {
+                    'fund_code': fund_codes[col],
+                    'shares': float(shares[col]),
+                    'nav': float(self.market.nav[row, col]),
+                    'value': float(shares[col] * self.market.nav[row, col]),
+                    'change_pct': float(self.market.fund_change[row, col])
+                }
+                for col in np.flatnonzero((traded | changed) & (shares > 0))
+            ],
+            'closed': [fund_codes[col] for col in np.flatnonzero(traded & (shares <= 0))],
+            'news': [{'date': date, 'content': content} for date, content in news],
+        }
+        if since_row != row:
+            delta['indices'] = self._build_indices_info(row)
+        return delta
+    
+    def _compact_indices(self, row):
+        """按 STATE_INDICES 顺序的 [[收盘价, 涨跌幅], ...]，场景中没有的指数为 None"""
+        indices = []
+        for index_code, _ in STATE_INDICES:
+            info = self.market.index_info(index_code, row)
+            indices.append([_compact(info['close'], 2), _compact(info['change_pct'], 2)] if info else None)
+        return indices
+    
+    def _compact_state(self, version, row):
+        """
+        紧凑编码的完整状态
+        
+        基金按场景基金列（market.fund_index）的位置编码：codes 为基金代码表，nav/chg 为与之对齐的
+        净值（4位小数）和涨跌幅（%，2位小数）列表；hold 为 [[列, 份额], ...]；idx 按 indices 顺序排列；
+        news 为 [[日期, 内容], ...]。NaN 编码为 None。增量状态中的列号与此处的 codes 对应。
+        """
+        shares = self.state.shares
+        total_assets = self.net_worth_history[-1]['total_assets'] if self.net_worth_history else self.cash
+        date = self.current_date.strftime('%Y-%m-%d')
+        return {
+            'v': version,
+            'full': 1,
+            'd': date,
+            'cash': round(self.cash, 2),
+            'ta': round(total_assets, 2),
+            'codes': list(self.market.fund_codes),
+            'nav': [_compact(value, 4) for value in self.market.nav[row].tolist()],
+            'chg': [_compact(value, 2) for value in self.market.fund_change[row].tolist()],
+            'hold': [[int(col), _compact(shares[col], 4)] for col in np.flatnonzero(shares > 0)],
+            'indices': [name for _, name in STATE_INDICES],
+            'idx': self._compact_indices(row),
+            'news': [[date, content] for content in self.market.news[row]],
+        }
+    
+    def _build_indices_info(self, row):
+        """构建指定行的指数信息字典"""
+        indices_info = {}
+        for index_code, name in STATE_INDICES:
+            index_info = self.market.index_info(index_code, row)
+            if index_info:
+                indices_info[name] = {
+                    '收盘价': index_info['close'],
+                    '涨跌幅': index_info['change_pct']
+                }
+        return indices_info
+    
+    def _build_funds_info(self, row, fund_code=None):
+        """构建指定行的基金信息字典，指定fund_code时只返回该基金"""
+        codes = self.market.fund_codes
+        navs = self.market.nav[row].tolist()
+        changes = self.market.fund_change[row].tolist()
+        
+        funds_info = {}
+        for col, code in enumerate(codes):
+            if fund_code and code != fund_code:
+                continue
+            funds_info[code] = {
+                '净值': navs[col],
+                '涨跌幅': changes[col]
+            }
+        return funds_info
+    
+    def _check_stale_price(self, fund_code):
+        """当天基金没有披露净值（停牌或未上市，矩阵中为向前填充的旧净值）时返回失败结果，否则返回 None"""
+        if self.market.is_fund_valid(fund_code, self.market.row_of(self.current_date)):
+            return None
+        return {
+            'success': False,
+            'message': f'基金{fund_code}在{self.current_date}没有最新净值（停牌或未披露），暂不能交易'
         }
     
     def buy_fund(self, fund_code, amount):
@@ -205,12 +792,17 @@ class InvestmentSimulator:
             操作结果字典
         """
         # 检查基金是否可交易
-        if fund_code not in self.available_funds:
+        col = self.market.fund_index.get(fund_code)
+        if col is None:
             return {
                 'success': False,
                 'message': f'基金{fund_code}不可交易或不存在'
             }
         
+        stale = self._check_stale_price(fund_code)
+        if stale:
+            return stale
+        
         # 检查资金是否充足
         if amount <= 0:
             return {
@@ -237,8 +829,11 @@ class InvestmentSimulator:
         shares = amount / nav
         
         # 更新持仓和现金
-        self.holdings[fund_code] = self.holdings.get(fund_code, 0) + shares
+        self.state.shares[col] += shares
+        self.state.cost[col] += amount
         self.cash -= amount
+        self._update_net_worth()
+        self.tracker.record_trade('buy')
         
         # 记录操作
         self._record_action('buy', {
@@ -268,13 +863,18 @@ class InvestmentSimulator:
             操作结果字典
         """
         # 检查基金是否持有
-        if fund_code not in self.holdings or self.holdings[fund_code] <= 0:
+        col = self.market.fund_index.get(fund_code)
+        if col is None or self.state.shares[col] <= 0:
             return {
                 'success': False,
                 'message': f'未持有基金{fund_code}'
             }
         
-        current_shares = self.holdings[fund_code]
+        stale = self._check_stale_price(fund_code)
+        if stale:
+            return stale
+        
+        current_shares = float(self.state.shares[col])
         
         # 计算要卖出的份额
         if shares is not None:
@@ -309,11 +909,20 @@ class InvestmentSimulator:
         nav = fund_info['nav']
         amount = shares_to_sell * nav
         
+        # 按卖出份额比例结转持仓成本，计算已实现盈亏
+        sold_cost = float(self.state.cost[col]) * shares_to_sell / current_shares
+        realized_pnl = amount - sold_cost
+        
         # 更新持仓和现金
-        self.holdings[fund_code] -= shares_to_sell
-        if self.holdings[fund_code] <= 0:
-            del self.holdings[fund_code]  # 如果份额为0，删除该基金持仓记录
+        self.state.shares[col] -= shares_to_sell
+        self.state.cost[col] -= sold_cost
+        if self.state.shares[col] <= 0:
+            # 如果份额为0，清空该基金持仓记录
+            self.state.shares[col] = 0.0
+            self.state.cost[col] = 0.0
         self.cash += amount
+        self._update_net_worth()
+        self.tracker.record_trade('sell', realized_pnl)
         
         # 记录操作
         self._record_action('sell', {
@@ -330,6 +939,177 @@ class InvestmentSimulator:
             'amount': amount
         }
     
+    def execute_orders(self, orders):
+        """
+        原子地执行一篮子交易订单
+        
+        所有订单先整体校验，任一订单无效时不执行任何订单；校验通过后先执行全部卖出，
+        再用卖出后的现金执行买入，现金是否充足按整篮订单的净额检查。
+        所有订单按当前交易日同一行净值成交，只记录一条 'batch' 用户行为。
+        
+        Args:
+            orders: 订单列表，每个订单为字典：
+                {'action': 'buy', 'fund_code': 基金代码, 'amount': 买入金额}
+                {'action': 'sell', 'fund_code': 基金代码, 'shares': 卖出份额}
+                {'action': 'sell', 'fund_code': 基金代码, 'percentage': 卖出比例(0-1)}
+                同一基金有多笔卖出时，比例均相对于执行前的持仓计算
+        
+        Returns:
+            操作结果字典，成功时包含每笔订单的成交明细 fills
+        """
+        if self.is_simulation_over:
+            return {'success': False, 'message': '模拟已经结束'}
+        if not orders:
+            return {'success': False, 'message': '订单列表为空'}
+        
+        row = self.market.row_of(self.current_date)
+        navs = self.market.nav[row]
+        valid = self.market.fund_valid[row]
+        
+        # 1. 整体校验，得到 (action, col, 份额或金额) 列表
+        errors = []
+        sells, buys = [], []
+        sold_shares = np.zeros(len(self.market.fund_codes))
+        for i, order in enumerate(orders):
+            action = order.get('action')
+            fund_code = order.get('fund_code')
+            col = self.market.fund_index.get(fund_code)
+            if action not in ('buy', 'sell'):
+                errors.append(f"订单{i + 1}: 未知的操作类型 {action}")
+                continue
+            if col is None:
+                errors.append(f"订单{i + 1}: 基金{fund_code}不可交易或不存在")
+                continue
+            if not valid[col] or not navs[col] > 0:
+                errors.append(f"订单{i + 1}: 基金{fund_code}在{self.current_date}没有最新净值（停牌或未披露），暂不能交易")
+                continue
+            
+            if action == 'buy':
+                amount = order.get('amount')
+                if amount is None or amount <= 0:
+                    errors.append(f"订单{i + 1}: 购买金额必须大于0")
+                    continue
+                buys.append((col, float(amount)))
+                continue
+            
+            held = float(self.state.shares[col])
+            if held <= 0:
+                errors.append(f"订单{i + 1}: 未持有基金{fund_code}")
+                continue
+            if order.get('shares') is not None:
+                shares = order['shares']
+                if shares <= 0:
+                    errors.append(f"订单{i + 1}: 卖出份额必须大于0")
+                    continue
+            elif order.get('percentage') is not None:
+                percentage = order['percentage']
+                if percentage <= 0 or percentage > 1:
+                    errors.append(f"订单{i + 1}: 卖出比例必须在0-1之间")
+                    continue
+                shares = held * percentage
+            else:
+                errors.append(f"订单{i + 1}: 必须指定卖出份额或比例")
+                continue
+            sold_shares[col] += shares
+            if sold_shares[col] > held:
+                errors.append(f"订单{i + 1}: 基金{fund_code}卖出份额合计超过持有的{held:.2f}份")
+                continue
+            sells.append((col, float(shares)))
+        
+        if not errors:
+            proceeds = sum(shares * navs[col] for col, shares in sells)
+            buy_total = sum(amount for _, amount in buys)
+            if buy_total > self.cash + proceeds + CASH_TOLERANCE:
+                errors.append(f"现金不足：买入合计{buy_total:.2f}元，卖出后可用现金{self.cash + proceeds:.2f}元")
+        if errors:
+            return {'success': False, 'message': '；'.join(errors), 'errors': errors}
+        
+        # 2. 先卖后买，按同一行净值成交
+        fund_codes = self.market.fund_codes
+        fills = []
+        for col, shares in sells:
+            nav = float(navs[col])
+            current_shares = float(self.state.shares[col])
+            amount = shares * nav
+            sold_cost = float(self.state.cost[col]) * shares / current_shares
+            self.state.shares[col] -= shares
+            self.state.cost[col] -= sold_cost
+            if self.state.shares[col] <= 0:
+                self.state.shares[col] = 0.0
+                self.state.cost[col] = 0.0
+            self.cash += amount
+            self.tracker.record_trade('sell', amount - sold_cost)
+            fills.append({'action_type': 'sell', 'fund_code': fund_codes[col], 'shares': shares, 'nav': nav, 'amount': amount})
+        for col, amount in buys:
+            # 容差范围内的超额按剩余现金截断，现金不会为负
+            amount = min(amount, self.cash)
+            nav = float(navs[col])
+            shares = amount / nav
+            self.state.shares[col] += shares
+            self.state.cost[col] += amount
+            self.cash -= amount
+            self.tracker.record_trade('buy')
+            fills.append({'action_type': 'buy', 'fund_code': fund_codes[col], 'amount': amount, 'nav': nav, 'shares': shares})
+        
+        self._update_net_worth()
+        self._record_action('batch', {'orders': fills})
+        
+        return {
+            'success': True,
+            'message': f'成功执行{len(fills)}笔订单（卖出{len(sells)}笔，买入{len(buys)}笔），当前现金{self.cash:.2f}元',
+            'fills': fills
+        }
+    
+    def rebalance_to(self, weights):
+        """
+        按目标权重调仓
+        
+        以当前总资产为基数计算每只基金的目标市值，未列出的持仓基金目标权重为0（全部卖出），
+        权重之和小于1的部分保留为现金。生成的订单通过 execute_orders 原子执行。
+        
+        Args:
+            weights: {基金代码: 目标权重}，权重非负且之和不超过1
+        
+        Returns:
+            execute_orders 的结果；无需调仓时返回成功且 fills 为空
+        """
+        if self.is_simulation_over:
+            return {'success': False, 'message': '模拟已经结束'}
+        for fund_code, weight in weights.items():
+            if fund_code not in self.market.fund_index:
+                return {'success': False, 'message': f'基金{fund_code}不可交易或不存在'}
+            if weight < 0:
+                return {'success': False, 'message': '目标权重不能为负数'}
+        if sum(weights.values()) > 1 + 1e-9:
+            return {'success': False, 'message': '目标权重之和不能超过1'}
+        
+        row = self.market.row_of(self.current_date)
+        navs = self.market.nav[row]
+        shares = self.state.shares
+        target = np.zeros(len(self.market.fund_codes))
+        for fund_code, weight in weights.items():
+            target[self.market.fund_index[fund_code]] = weight
+        
+        values = np.where(shares > 0, shares * navs, 0.0)
+        diff = target * (self.cash + values.sum()) - values
+        
+        orders = []
+        available = self.cash
+        for col in np.flatnonzero(diff <= -MIN_ORDER_AMOUNT):
+            # 目标权重为0时卖出全部份额，不留零头
+            sell_shares = float(shares[col]) if target[col] == 0 else min(-diff[col] / navs[col], float(shares[col]))
+            orders.append({'action': 'sell', 'fund_code': self.market.fund_codes[col], 'shares': sell_shares})
+            available += sell_shares * navs[col]
+        for col in np.flatnonzero(diff >= MIN_ORDER_AMOUNT):
+            amount = min(float(diff[col]), available)
+            if amount >= MIN_ORDER_AMOUNT:
+                orders.append({'action': 'buy', 'fund_code': self.market.fund_codes[col], 'amount': amount})
+                available -= amount
+        
+        if not orders:
+            return {'success': True, 'message': '当前持仓已符合目标权重，无需调仓', 'fills': []}
+        return self.execute_orders(orders)
+    
     def next_day(self):
         """推进到下一个交易日"""
         if self.is_simulation_over:
@@ -346,7 +1126,7 @@ class InvestmentSimulator:
         self.current_date_index += 1
         
         # 检查是否已到时间线末尾
-        if self.current_date_index >= len(self.data['timeline']):
+        if self.current_date_index >= len(self.market):
             self.is_simulation_over = True
             return {
                 'success': True,
@@ -354,8 +1134,8 @@ class InvestmentSimulator:
                 'simulation_ended': True
             }
         
-        # 更新当前日期
-        self.current_date = self.data['timeline'][self.current_date_index]['date']
+        # 按新一天的净值重新估值
+        self._update_net_worth()
         
         return {
             'success': True,
@@ -363,6 +1143,170 @@ class InvestmentSimulator:
             'simulation_ended': False
         }
     
+    def advance(self, days=1):
+        """
+        一次推进多个交易日
+        
+        跳过期间持仓不变，各交易日的估值由行情矩阵批量计算，净值历史仍为每天一条记录，
+        用户行为记录中只记一条 advance。
+        
+        Args:
+            days: 推进的交易日数
+        
+        Returns:
+            操作结果字典
+        """
+        if self.is_simulation_over:
+            return {
+                'success': False,
+                'message': '模拟已经结束'
+            }
+        
+        try:
+            days = int(days)
+        except (TypeError, ValueError, OverflowError):
+            return {
+                'success': False,
+                'message': '推进天数必须是整数'
+            }
+        if days < 1:
+            return {
+                'success': False,
+                'message': '推进天数必须大于0'
+            }
+        if days == 1:
+            return self.next_day()
+        
+        start = self.current_date_index + 1
+        stop = min(self.current_date_index + days, len(self.market) - 1) + 1
+        
+        self._record_action('advance', {
+            'from_date': self.current_date.strftime('%Y-%m-%d'),
+            'days': days
+        })
+        
+        self._append_valuations(start, stop)
+        self.current_date_index += days
+        
+        # 检查是否已越过时间线末尾
+        if self.current_date_index >= len(self.market):
+            self.current_date_index = len(self.market)
+            self.is_simulation_over = True
+            return {
+                'success': True,
+                'message': '模拟已经结束，已经到达最后一个交易日',
+                'simulation_ended': True,
+                'days': stop - start
+            }
+        
+        return {
+            'success': True,
+            'message': f'前进{days}个交易日，当前日期: {self.current_date.strftime("%Y-%m-%d")}',
+            'simulation_ended': False,
+            'days': days
+        }
+    
+    def advance_to(self, target_date):
+        """
+        推进到指定日期（非交易日时推进到其后的第一个交易日）
+        
+        Args:
+            target_date: 目标日期，date对象或 YYYY-MM-DD 字符串
+        
+        Returns:
+            操作结果字典
+        """
+        if isinstance(target_date, str):
+            try:
+                target_date = datetime.datetime.strptime(target_date, "%Y-%m-%d").date()
+            except ValueError:
+                return {'success': False, 'message': f"日期格式错误: {target_date}，请使用YYYY-MM-DD格式"}
+        
+        row = self.market.row_on_or_after(target_date)
+        if row is None:
+            return {'success': False, 'message': f"日期 {target_date} 超出模拟范围 (截至 {self.market.dates[-1]})"}
+        if row <= self.current_date_index:
+            return {'success': False, 'message': f"目标日期必须晚于当前日期 {self.current_date}"}
+        
+        return self.advance(row - self.current_date_index)
+    
+    def run_until(self, condition, max_days=None):
+        """
+        持续推进直到条件满足
+        
+        先按当前持仓批量计算之后各交易日的估值，再逐日检查条件，停在第一个满足条件的交易日；
+        条件始终不满足时停在检查范围内的最后一个交易日。
+        
+        Args:
+            condition: 条件函数 condition(day)，day 为包含 date/row/cash/holdings_value/total_assets/return_pct
+                的字典，返回 True 时停止
+            max_days: 最多推进的交易日数，默认直到时间线末尾
+        
+        Returns:
+            操作结果字典，matched 表示是否因条件满足而停止
+        """
+        if self.is_simulation_over:
+            return {
+                'success': False,
+                'message': '模拟已经结束'
+            }
+        
+        start = self.current_date_index + 1
+        stop = len(self.market)
+        if max_days is not None:
+            stop = min(stop, start + max(int(max_days), 0))
+        if start >= stop:
+            return {
+                'success': False,
+                'message': '没有可推进的交易日'
+            }
+        
+        holdings_values, total_assets = self._value_rows(start, stop)
+        days = stop - start
+        matched = False
+        for i in range(stop - start):
+            day = {
+                'date': self.market.dates[start + i],
+                'row': start + i,
+                'cash': self.cash,
+                'holdings_value': float(holdings_values[i]),
+                'total_assets': float(total_assets[i]),
+                'return_pct': (float(total_assets[i]) - self.initial_capital) / self.initial_capital * 100,
+            }
+            if condition(day):
+                days = i + 1
+                matched = True
+                break
+        
+        result = self.advance(days)
+        result['matched'] = matched
+        return result
+    
+    def _value_rows(self, start, stop):
+        """
+        按当前持仓批量计算行 [start, stop) 各交易日的估值
+        
+        Returns:
+            (持仓价值数组, 总资产数组)
+        """
+        held = np.flatnonzero(self.state.shares > 0)
+        if len(held):
+            holdings_values = self.market.nav[start:stop, held] @ self.state.shares[held]
+        else:
+            holdings_values = np.zeros(max(stop - start, 0))
+        return holdings_values, self.cash + holdings_values
+    
+    def _append_valuations(self, start, stop):
+        """将行 [start, stop) 各交易日的估值批量追加到净值历史和指标累加器"""
+        if start >= stop:
+            return
+        holdings_values, total_assets = self._value_rows(start, stop)
+        self.state.history.extend(
+            (row, self.cash, holdings_value, total)
+            for row, holdings_value, total in zip(range(start, stop), holdings_values.tolist(), total_assets.tolist())
+        )
+        self.tracker.update_days(self.market.dates[start:stop], total_assets, self.market.index_close[start:stop])
+    
     def export_actions(self, output_file=None):
         """导出用户行为记录"""
         if not output_file:
@@ -380,13 +1324,13 @@ class InvestmentSimulator:
         # 准备输出数据
         output_data = {
             'simulation_info': {
-                'start_date': self.data['timeline'][0]['date'].strftime('%Y-%m-%d') if self.data['timeline'] else None,
+                'start_date': self.market.dates[0].strftime('%Y-%m-%d') if self.market.dates else None,
                 'end_date': self.current_date.strftime('%Y-%m-%d') if self.current_date else None,
                 'initial_capital': self.initial_capital,
                 'final_assets': self.net_worth_history[-1]['total_assets'] if self.net_worth_history else self.initial_capital,
                 'return_rate': total_return
             },
-            'actions': [],
+            'actions': self._all_actions(),
             'net_worth_history': [
                 {
                     'date': item['date'].strftime('%Y-%m-%d'),
@@ -398,25 +1342,6 @@ class InvestmentSimulator:
             ],
         }
         
-        # 处理用户行为记录，确保日期对象被序列化为字符串
-        for action in self.user_actions:
-            serialized_action = {
-                'date': action['date'].strftime('%Y-%m-%d') if isinstance(action['date'], (datetime.date, datetime.datetime)) else action['date'],
-                'action_type': action['action_type'],
-                'timestamp': action['timestamp'],
-                'cash_after': action['cash_after']
-            }
-            
-            # 处理详情字段，检查其中是否包含日期对象
-            details = action['details'].copy() if isinstance(action['details'], dict) else action['details']
-            if isinstance(details, dict):
-                for key, value in details.items():
-                    if isinstance(value, (datetime.date, datetime.datetime)):
-                        details[key] = value.strftime('%Y-%m-%d')
-            
-            serialized_action['details'] = details
-            output_data['actions'].append(serialized_action)
-        
         # 写入JSON文件
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(output_data, f, ensure_ascii=False, indent=2)
@@ -426,7 +1351,7 @@ class InvestmentSimulator:
             'message': f'用户行为记录已导出到: {output_file}',
             'file_path': str(output_file),
             'stats': {
-                'action_count': len(self.user_actions),
+                'action_count': len(output_data['actions']),
                 'return_rate': total_return
             }
         }
@@ -439,58 +1364,28 @@ class InvestmentSimulator:
                 'message': '没有足够的数据生成投资表现总结'
             }
         
-        # 计算关键指标
+        # 关键指标（最大回撤、交易次数、收益率的矩）均由累加器随交易和日期推进维护
         initial_assets = self.initial_capital
         final_assets = self.net_worth_history[-1]['total_assets']
-        total_return = (final_assets - initial_assets) / initial_assets * 100
-        
-        # 计算最大回撤
-        max_drawdown = 0
-        peak = 0
-        
-        for item in self.net_worth_history:
-            asset = item['total_assets']
-            if asset > peak:
-                peak = asset
-            drawdown = (peak - asset) / peak * 100 if peak > 0 else 0
-            max_drawdown = max(max_drawdown, drawdown)
-        
-        # 统计交易次数
-        buy_count = sum(1 for action in self.user_actions if action['action_type'] == 'buy')
-        sell_count = sum(1 for action in self.user_actions if action['action_type'] == 'sell')
+        metrics = self.tracker.summary()
         
         # 获取市场基准表现（上证指数）
-        market_performance = 0
-        first_index = None
-        last_index = None
-        
-        for day in self.data['timeline']:
-            if 'sh_index' in day['funds'] and 'close' in day['funds']['sh_index']:
-                if first_index is None:
-                    first_index = day['funds']['sh_index']['close']
-                    
-                # 持续更新，直到最后一天
-                last_index = day['funds']['sh_index']['close']
+        market_performance = market_return(self.market, 'sh_index')
         
-        if first_index and last_index:
-            market_performance = (last_index - first_index) / first_index * 100
+        summary = build_summary(
+            initial_assets, final_assets, metrics['max_drawdown'], metrics['buy_count'], metrics['sell_count'],
+            len(self.net_worth_history), market_performance
+        )
+        summary.update({
+            'volatility': metrics['volatility'],
+            'sharpe_ratio': metrics['sharpe_ratio'],
+            'beta': metrics['beta'],
+            'win_rate': metrics['win_rate'],
+        })
         
         return {
             'success': True,
-            'summary': {
-                'initial_capital': initial_assets,
-                'final_assets': final_assets,
-                'total_return': total_return,
-                'market_return': market_performance,
-                'outperformance': total_return - market_performance,
-                'max_drawdown': max_drawdown,
-                'trade_count': {
-                    'buy': buy_count,
-                    'sell': sell_count,
-                    'total': buy_count + sell_count
-                },
-                'simulation_days': len(self.net_worth_history),
-            }
+            'summary': summary
         }
 
     def get_data_by_date(self, days_ago=0, target_date=None, fund_code=None):
@@ -514,38 +1409,21 @@ class InvestmentSimulator:
                     return {"success": False, "message": f"日期格式错误: {target_date}，请使用YYYY-MM-DD格式"}
                 
                 # 检查日期是否在模拟范围内
-                timeline_start = self.data['timeline'][0]['date']
-                timeline_end = self.data['timeline'][-1]['date']
+                timeline_start = self.market.dates[0]
+                timeline_end = self.market.dates[-1]
                 
                 if target_date < timeline_start or target_date > timeline_end:
                     return {"success": False, "message": f"日期 {target_date} 超出模拟范围 ({timeline_start} 至 {timeline_end})"}
                 
-                # 查找最接近的交易日
-                closest_day = None
-                closest_diff = datetime.timedelta.max
+                # 查找不晚于目标日期的最近交易日（精确匹配时即为目标日期）
+                row = self.market.row_on_or_before(target_date)
                 
-                for day in self.data['timeline']:
-                    day_date = day['date']
-                    # 如果找到完全匹配的日期
-                    if day_date == target_date:
-                        closest_day = day
-                        break
-                    
-                    # 如果是过去的日期，保存差距最小的
-                    if day_date < target_date:
-                        diff = target_date - day_date
-                        if diff < closest_diff:
-                            closest_diff = diff
-                            closest_day = day
-                
-                if closest_day is None:
+                if row is None:
                     return {"success": False, "message": f"在 {target_date} 之前没有有效交易日"}
                 
-                date_data = closest_day
-                
                 # 如果不是精确匹配，提醒用户
-                if date_data['date'] != target_date:
-                    print(f"注意: {target_date} 不是有效交易日，显示最接近的交易日 {date_data['date']} 的数据")
+                if self.market.dates[row] != target_date:
+                    print(f"注意: {target_date} 不是有效交易日，显示最接近的交易日 {self.market.dates[row]} 的数据")
                 
             else:
                 # 基于当前日期和days_ago计算
@@ -555,38 +1433,16 @@ class InvestmentSimulator:
                 if days_ago > self.current_date_index:
                     return {"success": False, "message": f"无法查看 {days_ago} 天前的数据，超出模拟开始日期"}
                 
-                date_data = self.data['timeline'][self.current_date_index - days_ago]
+                row = self.current_date_index - days_ago
             
-            # 构建结果数据
+            # 构建结果数据，指数和基金均直接读取行情矩阵的对应行
             result_data = {
-                "date": date_data['date'].strftime("%Y-%m-%d"),
-                "indices": {},
-                "funds": {},
-                "news": date_data['news']
+                "date": self.market.dates[row].strftime("%Y-%m-%d"),
+                "indices": self._build_indices_info(row),
+                "funds": self._build_funds_info(row, fund_code),
+                "news": list(self.market.news[row])
             }
             
-            # 添加所有数据
-            for fund_code_key, fund_info in date_data['funds'].items():
-                # 区分指数和基金
-                if fund_code_key == 'sh_index':
-                    result_data['indices']['上证指数'] = {
-                        '收盘价': fund_info.get('close', '暂无'),
-                        '涨跌幅': fund_info.get('change_pct', '暂无')
-                    }
-                elif fund_code_key == 'dj_index':
-                    result_data['indices']['道琼斯指数'] = {
-                        '收盘价': fund_info.get('close', '暂无'),
-                        '涨跌幅': fund_info.get('change_pct', '暂无')
-                    }
-                # 如果指定了基金代码且不匹配，则跳过
-                elif fund_code and fund_code_key != fund_code:
-                    continue
-                else:
-                    result_data['funds'][fund_code_key] = {
-                        '净值': fund_info.get('nav', '暂无'),
-                        '涨跌幅': fund_info.get('change_pct', '暂无')
-                    }
-            
             # 如果指定了基金代码但结果中没有该基金数据
             if fund_code and fund_code not in result_data['funds']:
                 return {"success": True, "data": result_data, "message": f"指定日期没有基金{fund_code}的数据"}
@@ -598,21 +1454,23 @@ class InvestmentSimulator:
             traceback.print_exc()
             return {"success": False, "message": f"获取数据时出错: {str(e)}"}
             
-    def get_fund_history(self, fund_code, days=30):
+    def get_fund_history(self, fund_code, days=30, start_date=None, end_date=None, freq='D'):
         """
         获取基金或指数的历史数据
         
         Args:
             fund_code: 基金代码或指数代码
-            days: 天数
+            days: 天数，未指定 start_date 时取截至 end_date 的最近 days 个交易日
+            start_date: 起始日期 'YYYY-MM-DD'（可选）
+            end_date: 截止日期 'YYYY-MM-DD'（可选，默认当前日期，不能晚于当前日期）
+            freq: 'D' 每日、'W' 每周、'M' 每月（取每个周期最后一个交易日，适合图表和摘要）
             
         Returns:
-            包含历史数据的字典
+            包含历史数据及区间收益率、年化波动率、最大回撤的字典
         """
         try:
             # 确定是基金还是指数
             is_index = False
-            data_source = None
             display_name = fund_code
             
             # 处理基金代码，确保格式一致性
@@ -622,84 +1480,74 @@ class InvestmentSimulator:
             if fund_code in ['sh_index', 'SH000001', '上证指数']:
                 is_index = True
                 fund_code = 'sh_index'
-                data_source = self.data['indices']['sh_index']
                 display_name = '上证指数'
             elif fund_code in ['dj_index', 'DJI', '道琼斯指数']:
                 is_index = True
                 fund_code = 'dj_index'
-                data_source = self.data['indices']['dj_index']
                 display_name = '道琼斯指数'
-            # 检查是否为基金
-            elif fund_code in self.data['funds']:
-                data_source = self.data['funds'][fund_code]
-            else:
-                return {"success": False, "message": f"找不到基金或指数: {fund_code}"}
-            
-            # 获取当前日期
-            current_date = self.data['timeline'][self.current_day_index]['date']
             
-            # 找到当前日期在时间线中的位置
-            current_idx = -1
-            for i, day in enumerate(self.data['timeline']):
-                if day['date'] == current_date:
-                    current_idx = i
-                    break
+            ranges = self.market.ranges
+            if is_index != (fund_code in self.market.index_column) or ranges.column(fund_code) is None:
+                return {"success": False, "message": f"找不到基金或指数: {fund_code}"}
+            col = ranges.column(fund_code)
             
-            # 限制天数不超过已有的数据
-            days = min(days, current_idx + 1)
+            freq = FREQUENCIES.get(freq or 'D')
+            if freq is None:
+                return {"success": False, "message": "频率必须是 D(每日)、W(每周) 或 M(每月)"}
             
-            # 收集历史数据
-            history_data = []
-            start_date = None
-            end_date = current_date
-            total_return = None
+            # 历史窗口不能越过当前日期
+            last_idx = min(self.current_date_index, len(self.market) - 1)
+            try:
+                end_idx = last_idx
+                if end_date:
+                    end_row = self.market.row_on_or_before(datetime.datetime.strptime(end_date, "%Y-%m-%d").date())
+                    if end_row is None:
+                        return {"success": False, "message": f"{end_date} 之前没有交易数据"}
+                    end_idx = min(end_row, last_idx)
+                if start_date:
+                    start_idx = self.market.row_on_or_after(datetime.datetime.strptime(start_date, "%Y-%m-%d").date())
+                    if start_idx is None or start_idx > end_idx:
+                        return {"success": False, "message": f"{start_date} 至 {self.market.dates[end_idx]} 之间没有交易数据"}
+                else:
+                    start_idx = max(0, end_idx - max(days, 1) + 1)
+            except ValueError:
+                return {"success": False, "message": "日期格式错误，请使用YYYY-MM-DD格式"}
             
-            for i in range(current_idx, current_idx - days, -1):
-                if i < 0:
-                    break
-                    
-                date = self.data['timeline'][i]['date']
-                date_str = date.strftime("%Y-%m-%d")
-                
-                if not start_date:
-                    start_date = date
-                
-                # 检查该日期是否有数据
-                if date_str in data_source:
-                    item = {
-                        'date': date_str
-                    }
-                    
-                    if is_index:
-                        item['close'] = data_source[date_str]['close']
-                        if 'change_pct' in data_source[date_str]:
-                            item['change_pct'] = data_source[date_str]['change_pct']
-                    else:
-                        item['nav'] = data_source[date_str]['nav']
-                        if 'change_pct' in data_source[date_str]:
-                            item['change_pct'] = data_source[date_str]['change_pct']
-                    
-                    history_data.append(item)
+            value_key = 'close' if is_index else 'nav'
+            rows = ranges.sample_rows(start_idx, end_idx, freq)
+            values = ranges.series(col)[rows].tolist()
+            if freq == 'D':
+                changes_source = self.market.index_change if is_index else self.market.fund_change
+                col_in_source = self.market.index_column[fund_code] if is_index else col
+                changes = changes_source[rows, col_in_source].tolist()
+            else:
+                # 降采样后的涨跌幅为相对上一周期末的涨跌幅
+                changes = [None if np.isnan(c) else c for c in ranges.period_changes(col, rows, freq).tolist()]
             
-            # 计算期间总收益率
-            if len(history_data) >= 2:
-                start_value = history_data[-1]['close' if is_index else 'nav']
-                end_value = history_data[0]['close' if is_index else 'nav']
-                
-                if start_value > 0:
-                    total_return = (end_value - start_value) / start_value * 100
+            # 收集历史数据，按日期从近到远排列
+            dates = self.market.dates
+            history_data = [
+                {
+                    'date': dates[rows[i]].strftime("%Y-%m-%d"),
+                    value_key: values[i],
+                    'change_pct': changes[i]
+                }
+                for i in range(len(rows) - 1, -1, -1)
+            ]
             
-            # 结果按日期排序
-            history_data.sort(key=lambda x: x['date'], reverse=True)
+            stats = ranges.window_stats(col, start_idx, end_idx)
             
             return {
                 "success": True,
                 "fund_code": fund_code,
                 "display_name": display_name,
+                "frequency": freq,
                 "data": history_data,
-                "start_date": start_date.strftime("%Y-%m-%d") if start_date else None,
-                "end_date": end_date.strftime("%Y-%m-%d"),
-                "total_return": total_return
+                "start_date": dates[start_idx].strftime("%Y-%m-%d"),
+                "end_date": dates[end_idx].strftime("%Y-%m-%d"),
+                "total_return": stats['total_return'] if end_idx > start_idx else None,
+                "volatility": stats['volatility'],
+                "max_drawdown": stats['max_drawdown']
             }
             
         except Exception as e:
@@ -707,6 +1555,93 @@ class InvestmentSimulator:
             traceback.print_exc()
             return {"success": False, "message": f"获取历史数据时出错: {str(e)}"}
 
+    def search_news(self, keywords, include_future=False, limit=20):
+        """
+        全文搜索场景新闻
+        
+        Args:
+            keywords: 关键词，多个关键词用空格分隔，需同时命中
+            include_future: 是否包含当前日期之后的新闻（默认不包含，避免提前看到未来信息）
+            limit: 最多返回的条数
+            
+        Returns:
+            包含命中总数和按日期从近到远排列的新闻列表的字典
+        """
+        if not keywords or not str(keywords).strip():
+            return {"success": False, "message": "请输入搜索关键词"}
+        
+        until = None if include_future else self.current_date
+        total, hits = self.news_index.search(keywords, until=until, limit=limit)
+        return {
+            "success": True,
+            "query": keywords,
+            "total": total,
+            "results": [
+                {'date': hit['date'].strftime("%Y-%m-%d"), 'content': hit['content']}
+                for hit in hits
+            ]
+        }
+
+    def _apply_import(self, end_row, cash, actions, net_worth_history):
+        """
+        用导入的记录整体替换会话状态
+        
+        Args:
+            end_row: 导入记录结束日期所在行
+            cash: 导入记录结束时的现金
+            actions: 序列化的用户行为记录（导出文件中的格式）
+            net_worth_history: [{'date', 'cash', 'holdings_value', 'total_assets'}, ...]
+        """
+        self.state = SessionState(self.market, cash, end_row, PerformanceTracker(self.market.index_codes))
+        self._history_synced = 0
+        self._history_segments = []
+        
+        # 恢复持仓、持仓成本和交易统计（需要从操作记录中重建）
+        holdings = {}
+        cost_basis = {}
+        for action_type, details in trade_fills(actions):
+            if action_type == 'buy':
+                fund_code = details['fund_code']
+                shares = details['shares']
+                holdings[fund_code] = holdings.get(fund_code, 0) + shares
+                cost_basis[fund_code] = cost_basis.get(fund_code, 0) + details['amount']
+                self.tracker.record_trade('buy')
+            elif action_type == 'sell':
+                fund_code = details['fund_code']
+                shares = details['shares']
+                realized_pnl = None
+                if fund_code in holdings:
+                    sold_cost = cost_basis.get(fund_code, 0) * min(shares / holdings[fund_code], 1)
+                    realized_pnl = details['amount'] - sold_cost
+                    holdings[fund_code] -= shares
+                    cost_basis[fund_code] = cost_basis.get(fund_code, 0) - sold_cost
+                    if holdings[fund_code] <= 0:
+                        del holdings[fund_code]
+                        cost_basis.pop(fund_code, None)
+                self.tracker.record_trade('sell', realized_pnl)
+        self.state.set_holdings(holdings, cost_basis)
+        
+        # 导入历史操作
+        self.state.actions.extend(self._action_record(action) for action in actions)
+        
+        # 重建净值历史，旧版本导出的文件中同一天可能有多条记录，只保留当天最后一条；
+        # 不在当前时间线上的日期无法定位行情，予以忽略
+        history = self.state.history
+        for record in net_worth_history:
+            row = self.market.row_of(datetime.datetime.strptime(record['date'], '%Y-%m-%d').date())
+            if row is None:
+                continue
+            item = (row, record['cash'], record['holdings_value'], record['total_assets'])
+            if len(history) and history[-1][0] == row:
+                history.set_last(item)
+            else:
+                history.append(item)
+        
+        # 用导入的净值历史重建指标累加器，只在导入时遍历一次
+        for row, _, _, total_assets in history:
+            self.tracker.update_day(self.market.dates[row], total_assets, self.market.index_close[row])
+        self._update_net_worth()
+    
     def import_history(self, history_file):
         """导入历史投资记录并恢复投资状态
         
@@ -743,54 +1678,37 @@ class InvestmentSimulator:
             last_date = datetime.datetime.strptime(last_date_str, '%Y-%m-%d').date()
             
             # 查找日期在时间线上的位置
-            found_idx = -1
-            for i, day in enumerate(self.data['timeline']):
-                if day['date'] == last_date:
-                    found_idx = i
-                    break
+            found_idx = self.market.row_of(last_date)
                     
-            if found_idx == -1:
+            if found_idx is None:
                 return {
                     'success': False,
                     'message': f'无法在当前时间线中找到历史记录的结束日期: {last_date_str}'
                 }
             
-            # 恢复资金和持仓
-            last_net_worth = history_data['net_worth_history'][-1]
-            self.cash = last_net_worth['cash']
-            
-            # 恢复持仓（需要从操作记录中重建）
-            self.holdings = {}
-            for action in history_data['actions']:
-                if action['action_type'] == 'buy':
-                    fund_code = action['details']['fund_code']
-                    shares = action['details']['shares']
-                    self.holdings[fund_code] = self.holdings.get(fund_code, 0) + shares
-                elif action['action_type'] == 'sell':
-                    fund_code = action['details']['fund_code']
-                    shares = action['details']['shares']
-                    if fund_code in self.holdings:
-                        self.holdings[fund_code] -= shares
-                        if self.holdings[fund_code] <= 0:
-                            del self.holdings[fund_code]
-            
-            # 设置当前日期和索引
-            self.current_date_index = found_idx
-            self.current_date = self.data['timeline'][found_idx]['date']
-            
-            # 导入历史操作
-            self.user_actions = history_data['actions']
-            
-            # 重建净值历史
-            self.net_worth_history = []
-            for record in history_data['net_worth_history']:
-                date_obj = datetime.datetime.strptime(record['date'], '%Y-%m-%d').date()
-                self.net_worth_history.append({
-                    'date': date_obj,
-                    'cash': record['cash'],
-                    'holdings_value': record['holdings_value'],
-                    'total_assets': record['total_assets']
+            # 恢复资金、持仓、用户行为记录和净值历史
+            cash = history_data['net_worth_history'][-1]['cash']
+            self._apply_import(found_idx, cash, history_data['actions'], history_data['net_worth_history'])
+            
+            # 导入会整体替换状态，日志中记录导入的操作并立即写快照
+            if self.session_log is not None and not self._replaying:
+                self._logged_actions_end = None
+                # 导入的状态记录在事件中，净值历史先写入历史文件、事件中只记录其区间，
+                # 恢复会话时不再依赖导入文件
+                self._sync_history()
+                self._log_event({
+                    'event': 'import',
+                    'file_path': str(history_path),
+                    'end_date': last_date_str,
+                    'cash': cash,
+                    'holdings': self.holdings,
+                    'cost_basis': self.cost_basis,
+                    'actions': history_data['actions'],
+                    'tracker': self.tracker.to_dict(),
+                    'history': list(self._history_segments),
+                    'last_history': self._unsynced_history(),
                 })
+                self._write_snapshot()
                 
             return {
                 'success': True,
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+import time
+import random
+import asyncio
+import argparse
+
+import numpy as np
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+
+class LatencyRecorder:
+    """按接口记录请求延迟"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = 0
+
+    async def request(self, http, method, url, endpoint, **kwargs):
+        start = time.perf_counter()
+        async with http.request(method, url, **kwargs) as response:
+            data = await response.json()
+            if response.status >= 400:
+                self.errors += 1
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+        return data
+
+    def report(self):
+        """
+        Returns:
+            {接口: {'count', 'p50', 'p99'}}，延迟单位为毫秒，'all' 为全部请求的汇总
+        """
+        rows = {}
+        all_latencies = []
+        for endpoint, values in self.latencies.items():
+            all_latencies.extend(values)
+            rows[endpoint] = self._percentiles(values)
+        if all_latencies:
+            rows['all'] = self._percentiles(all_latencies)
+        return rows
+
+    @staticmethod
+    def _percentiles(values):
+        values = np.asarray(values) * 1000
+        return {
+            'count': len(values),
+            'p50': float(np.percentile(values, 50)),
+            'p99': float(np.percentile(values, 99)),
+        }
+
+
+async def run_user(http, base_url, recorder, scene, rounds, rng):
+    """模拟一个用户：创建会话后重复“查看状态 → 交易 → 推进”，最后查看总结并关闭会话"""
+    created = await recorder.request(http, 'POST', f'{base_url}/sessions', 'create', json={'scene': scene})
+    if not created.get('success'):
+        raise RuntimeError(created.get('message'))
+    session_url = f"{base_url}/sessions/{created['session_id']}"
+    fund_codes = list(created['state']['funds'])
+
+    for _ in range(rounds):
+        state = await recorder.request(http, 'GET', f'{session_url}/state', 'state')
+        if state.get('status') != 'active':
+            break
+        if rng.random() < 0.5:
+            await recorder.request(http, 'POST', f'{session_url}/buy', 'buy',
+                                   json={'fund_code': rng.choice(fund_codes), 'amount': rng.uniform(100, 2000)})
+        elif state['holdings']:
+            holding = rng.choice(state['holdings'])
+            await recorder.request(http, 'POST', f'{session_url}/sell', 'sell',
+                                   json={'fund_code': holding['fund_code'], 'percentage': 0.5})
+        if rng.random() < 0.2:
+            await recorder.request(http, 'GET', f'{session_url}/history', 'history',
+                                   params={'fund_code': rng.choice(fund_codes), 'days': 30})
+        await recorder.request(http, 'POST', f'{session_url}/advance', 'advance', json={'days': rng.randint(1, 5)})
+
+    await recorder.request(http, 'GET', f'{session_url}/summary', 'summary')
+    await recorder.request(http, 'DELETE', session_url, 'delete')
+
+
+async def run_load_test(base_url, users, rounds, scene='2008', seed=0):
+    """
+    并发运行多个模拟用户并统计延迟
+
+    Returns:
+        结果字典：各接口延迟分位数、吞吐量，以及按服务端CPU时间折算的每核可承载会话数
+    """
+    rng = random.Random(seed)
+    recorder = LatencyRecorder()
+    timeout = ClientTimeout(total=None)
+    async with ClientSession(connector=TCPConnector(limit=users), timeout=timeout) as http:
+        before = await recorder.request(http, 'GET', f'{base_url}/stats', 'stats')
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            run_user(http, base_url, recorder, scene, rounds, random.Random(rng.random()))
+            for _ in range(users)
+        ])
+        elapsed = time.perf_counter() - start
+        after = await recorder.request(http, 'GET', f'{base_url}/stats', 'stats')
+    recorder.latencies.pop('stats', None)
+
+    report = recorder.report()
+    requests = report.get('all', {}).get('count', 0)
+    cpu_used = after['cpu_time'] - before['cpu_time']
+    # 服务端在测试期间平均占用的核数；并发会话数除以它即为一个满载核可承载的会话数
+    cores_busy = cpu_used / elapsed if elapsed > 0 else 0
+    return {
+        'users': users,
+        'rounds': rounds,
+        'elapsed': elapsed,
+        'requests': requests,
+        'errors': recorder.errors,
+        'throughput': requests / elapsed if elapsed > 0 else 0,
+        'server_cpu_time': cpu_used,
+        'sessions_per_core': users / cores_busy if cores_busy > 0 else float('inf'),
+        'latency': report,
+    }
+
+
+def print_report(result):
+    print("\n" + "="*70)
+    print("负载测试结果".center(60))
+    print("="*70)
+    print(f"并发用户: {result['users']}  每用户轮数: {result['rounds']}")
+    print(f"总请求数: {result['requests']}  错误: {result['errors']}  耗时: {result['elapsed']:.2f} 秒")
+    print(f"吞吐量: {result['throughput']:.1f} 请求/秒")
+    print(f"服务端CPU时间: {result['server_cpu_time']:.2f} 秒  每核可承载会话数: {result['sessions_per_core']:.1f}")
+    print("-"*70)
+    print("{:<10} {:>10} {:>12} {:>12}".format("接口", "请求数", "p50(ms)", "p99(ms)"))
+    print("-"*70)
+    for endpoint, row in result['latency'].items():
+        print("{:<10} {:>10} {:>12.2f} {:>12.2f}".format(endpoint, row['count'], row['p50'], row['p99']))
+    print("="*70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="投资模拟服务负载测试")
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8080', help="服务地址")
+    parser.add_argument('--users', type=int, default=100, help="并发用户数")
+    parser.add_argument('--rounds', type=int, default=20, help="每个用户的操作轮数")
+    parser.add_argument('--scene', type=str, default='2008', help="场景ID")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load_test(args.url.rstrip('/'), args.users, args.rounds, args.scene, args.seed))
+    print_report(result)
+
+
+if __name__ == "__main__":
+    main()
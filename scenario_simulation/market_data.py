@@ -0,0 +1,170 @@
+import bisect
+from collections.abc import Sequence
+
+import numpy as np
+
+from range_query import RangeQuery
+
+
+INDEX_CODES = ['sh_index', 'dj_index']
+
+
+class TimelineView(Sequence):
+    """
+    时间线兼容视图
+
+    按需从列式行情数据构建与旧版 timeline 相同结构的每日字典：
+    {'date': date, 'news': [...], 'funds': {code: {'nav'/'close': ..., 'change_pct': ...}}}
+    """
+
+    def __init__(self, market_data):
+        self._market = market_data
+
+    def __len__(self):
+        return len(self._market.dates)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('timeline index out of range')
+        return self._market.day_dict(i)
+
+
+class MarketData:
+    """
+    场景行情数据的列式存储
+
+    日期按升序排列，每个交易日对应矩阵的一行；基金和指数各自对应一列。
+    所有价格查询都是对 float64 矩阵的下标读取。
+    """
+
+    def __init__(self, dates, fund_codes, nav, fund_change, index_codes, index_close, index_change, news=None,
+                 fund_valid=None):
+        """
+        Args:
+            dates: 升序排列的交易日列表 (datetime.date)
+            fund_codes: 可交易基金代码列表，对应 nav/fund_change 的列
+            nav: 基金单位净值矩阵，形状 (交易日数, 基金数)
+            fund_change: 基金日涨跌幅矩阵 (%)，形状同 nav
+            index_codes: 指数键名列表，对应 index_close/index_change 的列
+            index_close: 指数收盘价矩阵，形状 (交易日数, 指数数)
+            index_change: 指数日涨跌幅矩阵 (%)，形状同 index_close
+            news: 每个交易日的新闻列表
+            fund_valid: 基金净值有效性掩码，形状同 nav；False 表示当天没有披露净值、
+                矩阵中的值是向前填充的旧净值，不能按此价格交易。默认全部有效
+        """
+        self.dates = list(dates)
+        self.fund_codes = list(fund_codes)
+        self.index_codes = list(index_codes)
+
+        n_days = len(self.dates)
+        self.nav = np.asarray(nav, dtype=np.float64).reshape(n_days, len(self.fund_codes))
+        self.fund_change = np.asarray(fund_change, dtype=np.float64).reshape(n_days, len(self.fund_codes))
+        self.index_close = np.asarray(index_close, dtype=np.float64).reshape(n_days, len(self.index_codes))
+        self.index_change = np.asarray(index_change, dtype=np.float64).reshape(n_days, len(self.index_codes))
+        self.news = list(news) if news is not None else [[] for _ in range(n_days)]
+        if fund_valid is None:
+            self.fund_valid = np.ones(self.nav.shape, dtype=bool)
+        else:
+            self.fund_valid = np.asarray(fund_valid, dtype=bool).reshape(self.nav.shape)
+
+        self.fund_index = {code: i for i, code in enumerate(self.fund_codes)}
+        self.index_column = {code: i for i, code in enumerate(self.index_codes)}
+        self.date_index = {date: i for i, date in enumerate(self.dates)}
+
+        self.timeline = TimelineView(self)
+        self._ranges = None
+
+    @classmethod
+    def from_frames(cls, dates, values, changes, news_by_date=None, valid=None):
+        """
+        从按日期对齐的宽表构建列式行情数据
+
+        Args:
+            dates: 有效交易日列表
+            values: 以日期为索引、代码为列的净值/收盘价 DataFrame
+            changes: 以日期为索引、代码为列的涨跌幅 DataFrame
+            news_by_date: {date: [新闻内容]} 字典
+            valid: 以日期为索引、代码为列的净值有效性 DataFrame，None 表示全部有效
+        """
+        news_by_date = news_by_date or {}
+        columns = list(dict.fromkeys(list(values.columns) + list(changes.columns)))
+        fund_codes = [code for code in columns if code not in INDEX_CODES]
+        index_codes = [code for code in INDEX_CODES if code in columns]
+
+        def matrix(frame, codes):
+            return frame.reindex(index=dates, columns=codes).to_numpy(dtype=np.float64)
+
+        return cls(
+            dates=dates,
+            fund_codes=fund_codes,
+            nav=matrix(values, fund_codes),
+            fund_change=matrix(changes, fund_codes),
+            index_codes=index_codes,
+            index_close=matrix(values, index_codes),
+            index_change=matrix(changes, index_codes),
+            news=[list(news_by_date.get(date, [])) for date in dates],
+            fund_valid=None if valid is None else valid.reindex(
+                index=dates, columns=fund_codes, fill_value=False).to_numpy(dtype=bool),
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def ranges(self):
+        """区间查询引擎（首次访问时构建，之后与所有会话共享）"""
+        if self._ranges is None:
+            self._ranges = RangeQuery(self)
+        return self._ranges
+
+    def row_of(self, date):
+        """精确查找交易日所在行，非交易日返回 None"""
+        return self.date_index.get(date)
+
+    def row_on_or_before(self, date):
+        """查找不晚于指定日期的最近交易日所在行，不存在时返回 None"""
+        row = bisect.bisect_right(self.dates, date) - 1
+        return row if row >= 0 else None
+
+    def row_on_or_after(self, date):
+        """查找不早于指定日期的最近交易日所在行，不存在时返回 None"""
+        row = bisect.bisect_left(self.dates, date)
+        return row if row < len(self.dates) else None
+
+    def is_fund_valid(self, fund_code, row):
+        """基金在指定行是否有当天披露的净值（不是向前填充的旧净值）"""
+        col = self.fund_index.get(fund_code)
+        return col is not None and row is not None and bool(self.fund_valid[row, col])
+
+    def fund_info(self, fund_code, row):
+        """获取指定行的基金信息 {'nav', 'change_pct'}，不存在时返回 None"""
+        col = self.fund_index.get(fund_code)
+        if col is None or row is None:
+            return None
+        return {'nav': float(self.nav[row, col]), 'change_pct': float(self.fund_change[row, col])}
+
+    def index_info(self, index_code, row):
+        """获取指定行的指数信息 {'close', 'change_pct'}，不存在时返回 None"""
+        col = self.index_column.get(index_code)
+        if col is None or row is None:
+            return None
+        return {'close': float(self.index_close[row, col]), 'change_pct': float(self.index_change[row, col])}
+
+    def day_dict(self, row):
+        """构建与旧版 timeline 相同结构的单日字典"""
+        funds = {}
+        navs = self.nav[row].tolist()
+        fund_changes = self.fund_change[row].tolist()
+        for col, code in enumerate(self.fund_codes):
+            funds[code] = {'nav': navs[col], 'change_pct': fund_changes[col]}
+
+        closes = self.index_close[row].tolist()
+        index_changes = self.index_change[row].tolist()
+        for col, code in enumerate(self.index_codes):
+            funds[code] = {'close': closes[col], 'change_pct': index_changes[col]}
+
+        return {'date': self.dates[row], 'news': list(self.news[row]), 'funds': funds}
@@ -0,0 +1,101 @@
+import bisect
+from collections import defaultdict
+
+
+def tokenize(text):
+    """
+    把文本切分为索引词：相邻两字的二元组（不依赖分词词典，英文统一转为小写）
+
+    Returns:
+        索引词集合
+    """
+    text = text.lower()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _intersect(doc_ids, posting):
+    """
+    两个升序编号列表求交集
+
+    对较短的 doc_ids 中的每个编号在 posting 中二分查找，查找下界随编号单调前进，
+    耗时只与 doc_ids 的长度（乘以 log(len(posting))）有关，不随常见二元组的长编号列表增长。
+    """
+    result = []
+    lo, n = 0, len(posting)
+    for doc_id in doc_ids:
+        lo = bisect.bisect_left(posting, doc_id, lo)
+        if lo == n:
+            break
+        if posting[lo] == doc_id:
+            result.append(doc_id)
+    return result
+
+
+class NewsIndex:
+    """
+    场景新闻的内存倒排索引
+
+    新闻按日期升序编号，每个二元组对应包含它的新闻编号列表（升序）。查询时对关键词各二元组的
+    编号列表求交集，再用原文子串匹配排除二元组拼接造成的误匹配，结果与逐条子串匹配完全一致；
+    单字关键词没有二元组，直接在截止日期前的新闻中做子串匹配。
+    按日期截止时只需二分查找截止日期对应的编号上界。
+    """
+
+    def __init__(self, news_data):
+        """
+        Args:
+            news_data: [{'date': datetime.date, 'content': str}, ...]
+        """
+        items = sorted(news_data, key=lambda item: item['date'])
+        self.dates = [item['date'] for item in items]
+        self.contents = [item['content'] for item in items]
+        self._lowered = [content.lower() for content in self.contents]
+
+        postings = defaultdict(list)
+        for doc_id, content in enumerate(self._lowered):
+            for token in tokenize(content):
+                postings[token].append(doc_id)
+        self.postings = dict(postings)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def search(self, keywords, until=None, limit=20):
+        """
+        搜索同时包含所有关键词的新闻
+
+        Args:
+            keywords: 关键词字符串（空格分隔，需全部命中）或关键词列表
+            until: 只返回不晚于该日期的新闻（datetime.date），None 表示不限制
+            limit: 最多返回的条数，None 表示不限制
+
+        Returns:
+            (命中总数, [{'date', 'content'}, ...])，结果按日期从近到远排列
+        """
+        if isinstance(keywords, str):
+            keywords = keywords.split()
+        keywords = [keyword.lower() for keyword in keywords if keyword.strip()]
+        if not keywords:
+            return 0, []
+
+        end = len(self.dates) if until is None else bisect.bisect_right(self.dates, until)
+
+        tokens = set()
+        for keyword in keywords:
+            tokens |= tokenize(keyword)
+        # 从最短的编号列表开始求交集
+        postings = sorted((self.postings.get(token, []) for token in tokens), key=len)
+        if tokens and not postings[0]:
+            return 0, []
+        candidates = range(end) if not postings else postings[0][:bisect.bisect_left(postings[0], end)]
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates = _intersect(candidates, posting)
+
+        matches = [
+            doc_id for doc_id in candidates
+            if all(keyword in self._lowered[doc_id] for keyword in keywords)
+        ]
+        hits = matches[::-1][:limit] if limit is not None else matches[::-1]
+        return len(matches), [{'date': self.dates[doc_id], 'content': self.contents[doc_id]} for doc_id in hits]
@@ -0,0 +1,296 @@
+import copy
+import datetime
+import math
+
+import numpy as np
+
+
+def max_drawdown(net_worth):
+    """
+    计算净值序列的最大回撤 (%)
+
+    Args:
+        net_worth: 净值序列，最后一维为时间；可以是多条序列组成的二维数组
+    """
+    net_worth = np.asarray(net_worth, dtype=np.float64)
+    if net_worth.shape[-1] == 0:
+        return np.zeros(net_worth.shape[:-1]) if net_worth.ndim > 1 else 0.0
+
+    peaks = np.maximum.accumulate(net_worth, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = np.where(peaks > 0, (peaks - net_worth) / peaks * 100, 0.0)
+    result = drawdowns.max(axis=-1)
+    return float(result) if np.ndim(result) == 0 else result
+
+
+def market_return(market, index_code='sh_index'):
+    """计算整个场景时间线上指数的涨跌幅 (%)，作为市场基准表现"""
+    col = market.index_column.get(index_code)
+    if col is None or not len(market):
+        return 0
+
+    first_index = float(market.index_close[0, col])
+    last_index = float(market.index_close[-1, col])
+    if first_index and last_index:
+        return (last_index - first_index) / first_index * 100
+    return 0
+
+
+def build_summary(initial_capital, final_assets, max_drawdown_pct, buy_count, sell_count, simulation_days,
+                  market_performance):
+    """构建与 InvestmentSimulator.get_performance_summary 相同结构的投资表现总结"""
+    total_return = (final_assets - initial_capital) / initial_capital * 100
+    return {
+        'initial_capital': initial_capital,
+        'final_assets': final_assets,
+        'total_return': total_return,
+        'market_return': market_performance,
+        'outperformance': total_return - market_performance,
+        'max_drawdown': max_drawdown_pct,
+        'trade_count': {
+            'buy': buy_count,
+            'sell': sell_count,
+            'total': buy_count + sell_count
+        },
+        'simulation_days': simulation_days,
+    }
+
+
+class PerformanceTracker:
+    """
+    投资表现的流式累加器
+
+    每次交易和日期推进时更新，get_performance_summary 只读取累加结果，复杂度为 O(1)。
+    当天净值在收盘前可能因交易多次变化，因此当天记录先作为“未结算”值保存，
+    日期推进时才并入累加器；生成总结时把未结算值临时并入计算，不修改累加器本身。
+    """
+
+    TRADING_DAYS_PER_YEAR = 252
+
+    def __init__(self, benchmark_codes=('sh_index', 'dj_index')):
+        self.benchmark_codes = list(benchmark_codes)
+        k = len(self.benchmark_codes)
+
+        self.days = 0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.last_value = None
+        self.last_benchmarks = None
+
+        # 组合日收益率的一阶、二阶矩
+        self.n = 0
+        self.sum_r = 0.0
+        self.sum_r2 = 0.0
+
+        # 与每个基准指数日收益率成对的矩，用于计算 beta
+        self.pair_n = np.zeros(k)
+        self.pair_r = np.zeros(k)
+        self.pair_b = np.zeros(k)
+        self.pair_b2 = np.zeros(k)
+        self.pair_rb = np.zeros(k)
+
+        self.buy_count = 0
+        self.sell_count = 0
+        self.win_count = 0
+
+        self._pending = None  # (日期, 总资产, 基准指数点位)
+
+    def update_day(self, date, total_assets, benchmarks):
+        """
+        记录某个交易日的总资产
+
+        Args:
+            date: 交易日，同一天多次调用时覆盖当天的未结算值
+            total_assets: 当前总资产
+            benchmarks: 与 benchmark_codes 对应的当天指数点位
+        """
+        if self._pending is not None and self._pending[0] != date:
+            self._commit(*self._pending)
+        self._pending = (date, float(total_assets), np.asarray(benchmarks, dtype=np.float64))
+
+    def update_days(self, dates, total_assets, benchmarks):
+        """
+        批量记录连续多个交易日的总资产，效果与逐日调用 update_day 相同
+
+        Args:
+            dates: 交易日列表，均晚于已记录的日期
+            total_assets: 每个交易日的总资产，形状 (天数,)
+            benchmarks: 每个交易日的基准指数点位，形状 (天数, 基准数)
+        """
+        if not len(dates):
+            return
+        values = np.asarray(total_assets, dtype=np.float64)
+        benchmarks = np.asarray(benchmarks, dtype=np.float64)
+        if self._pending is not None:
+            self._commit(*self._pending)
+        # 最后一天作为未结算值保存，其余各天向量化地并入累加器
+        if len(dates) > 1:
+            self._commit_many(values[:-1], benchmarks[:-1])
+        self._pending = (dates[-1], float(values[-1]), benchmarks[-1])
+
+    def _commit_many(self, values, benchmarks):
+        self.days += len(values)
+        peaks = np.maximum.accumulate(np.maximum(values, self.peak))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdowns = np.where(peaks > 0, (peaks - values) / peaks * 100, 0.0)
+        self.peak = float(peaks[-1])
+        self.max_drawdown = max(self.max_drawdown, float(drawdowns.max()))
+        last_value, last_benchmarks = float(values[-1]), benchmarks[-1]
+
+        if self.last_value:
+            prev_values = np.concatenate([[self.last_value], values[:-1]])
+            prev_benchmarks = np.vstack([self.last_benchmarks[None, :], benchmarks[:-1]])
+        else:
+            # 尚无上一交易日时第一天不产生收益率
+            prev_values = values[:-1]
+            prev_benchmarks = benchmarks[:-1]
+            values = values[1:]
+            benchmarks = benchmarks[1:]
+
+        if len(values):
+            r = values / prev_values - 1
+            self.n += len(r)
+            self.sum_r += float(r.sum())
+            self.sum_r2 += float((r * r).sum())
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                b = benchmarks / prev_benchmarks - 1
+            valid = np.isfinite(b)
+            b = np.where(valid, b, 0.0)
+            self.pair_n += valid.sum(axis=0)
+            self.pair_r += np.where(valid, r[:, None], 0.0).sum(axis=0)
+            self.pair_b += b.sum(axis=0)
+            self.pair_b2 += (b * b).sum(axis=0)
+            self.pair_rb += (b * r[:, None]).sum(axis=0)
+
+        self.last_value = last_value
+        self.last_benchmarks = last_benchmarks
+
+    def record_trade(self, action_type, realized_pnl=None):
+        """记录一笔交易；卖出时传入已实现盈亏用于统计胜率"""
+        if action_type == 'buy':
+            self.buy_count += 1
+        elif action_type == 'sell':
+            self.sell_count += 1
+            if realized_pnl is not None and realized_pnl > 0:
+                self.win_count += 1
+
+    def to_dict(self):
+        """导出累加器状态（可JSON序列化），用于会话快照"""
+        pending = None
+        if self._pending is not None:
+            date, value, benchmarks = self._pending
+            pending = [date.isoformat(), value, benchmarks.tolist()]
+        return {
+            'benchmark_codes': self.benchmark_codes,
+            'days': self.days,
+            'peak': self.peak,
+            'max_drawdown': self.max_drawdown,
+            'last_value': self.last_value,
+            'last_benchmarks': None if self.last_benchmarks is None else self.last_benchmarks.tolist(),
+            'n': self.n,
+            'sum_r': self.sum_r,
+            'sum_r2': self.sum_r2,
+            'pair': [getattr(self, name).tolist() for name in ['pair_n', 'pair_r', 'pair_b', 'pair_b2', 'pair_rb']],
+            'buy_count': self.buy_count,
+            'sell_count': self.sell_count,
+            'win_count': self.win_count,
+            'pending': pending,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict 的结果恢复累加器"""
+        tracker = cls(data['benchmark_codes'])
+        for name in ['days', 'peak', 'max_drawdown', 'last_value', 'n', 'sum_r', 'sum_r2',
+                     'buy_count', 'sell_count', 'win_count']:
+            setattr(tracker, name, data[name])
+        if data['last_benchmarks'] is not None:
+            tracker.last_benchmarks = np.array(data['last_benchmarks'], dtype=np.float64)
+        for name, values in zip(['pair_n', 'pair_r', 'pair_b', 'pair_b2', 'pair_rb'], data['pair']):
+            setattr(tracker, name, np.array(values, dtype=np.float64))
+        if data['pending'] is not None:
+            date, value, benchmarks = data['pending']
+            tracker._pending = (datetime.date.fromisoformat(date), value, np.array(benchmarks, dtype=np.float64))
+        return tracker
+
+    def _commit(self, date, value, benchmarks):
+        self.days += 1
+        if value > self.peak:
+            self.peak = value
+        if self.peak > 0:
+            self.max_drawdown = max(self.max_drawdown, (self.peak - value) / self.peak * 100)
+
+        if self.last_value:
+            r = value / self.last_value - 1
+            self.n += 1
+            self.sum_r += r
+            self.sum_r2 += r * r
+
+            if self.last_benchmarks is not None:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    b = benchmarks / self.last_benchmarks - 1
+                valid = np.isfinite(b)
+                b = np.where(valid, b, 0.0)
+                self.pair_n += valid
+                self.pair_r += np.where(valid, r, 0.0)
+                self.pair_b += b
+                self.pair_b2 += b * b
+                self.pair_rb += b * r
+
+        self.last_value = value
+        self.last_benchmarks = benchmarks
+
+    def copy(self):
+        """返回独立的累加器副本"""
+        tracker = copy.copy(self)
+        for name in ['pair_n', 'pair_r', 'pair_b', 'pair_b2', 'pair_rb']:
+            setattr(tracker, name, getattr(self, name).copy())
+        return tracker
+
+    def _settled(self):
+        """返回并入未结算当天数据后的累加器副本"""
+        settled = self.copy()
+        if self._pending is not None:
+            settled._commit(*self._pending)
+            settled._pending = None
+        return settled
+
+    def summary(self):
+        """
+        Returns:
+            包含最大回撤、年化波动率、夏普比率、beta、胜率和交易次数的字典
+        """
+        s = self._settled()
+
+        volatility = None
+        sharpe_ratio = None
+        if s.n >= 2:
+            mean = s.sum_r / s.n
+            variance = max((s.sum_r2 - s.n * mean * mean) / (s.n - 1), 0.0)
+            std = math.sqrt(variance)
+            volatility = std * math.sqrt(self.TRADING_DAYS_PER_YEAR) * 100
+            if std > 0:
+                sharpe_ratio = mean / std * math.sqrt(self.TRADING_DAYS_PER_YEAR)
+
+        beta = {}
+        for i, code in enumerate(self.benchmark_codes):
+            n = s.pair_n[i]
+            beta[code] = None
+            if n >= 2:
+                var_b = (s.pair_b2[i] - s.pair_b[i] ** 2 / n) / (n - 1)
+                cov_rb = (s.pair_rb[i] - s.pair_r[i] * s.pair_b[i] / n) / (n - 1)
+                if var_b > 0:
+                    beta[code] = float(cov_rb / var_b)
+
+        return {
+            'final_assets': s.last_value,
+            'max_drawdown': s.max_drawdown,
+            'volatility': volatility,
+            'sharpe_ratio': sharpe_ratio,
+            'beta': beta,
+            'win_rate': s.win_count / s.sell_count * 100 if s.sell_count else None,
+            'buy_count': s.buy_count,
+            'sell_count': s.sell_count,
+            'days': s.days,
+        }
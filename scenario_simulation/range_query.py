@@ -0,0 +1,220 @@
+import math
+
+import numpy as np
+
+
+# 降采样频率：每个周期取最后一个交易日
+FREQUENCIES = {
+    'D': 'D', 'day': 'D', 'daily': 'D',
+    'W': 'W', 'week': 'W', 'weekly': 'W',
+    'M': 'M', 'month': 'M', 'monthly': 'M',
+}
+
+
+class RangeQuery:
+    """
+    行情区间查询引擎
+
+    基金净值和指数收盘价按代码映射到列，每列在首次查询时才计算：
+        - 对数价格：任意区间的期间收益率为两端对数价格之差，O(1)
+        - 日对数收益率及其平方的前缀和：任意区间的波动率 O(1)
+        - 区间最大值/最小值/最大回撤的稀疏表：任意区间的最大回撤 O(1)
+    稀疏表第 k 层保存从每一行开始、长度为 2^k 的区间的统计量，每列 O(n log n) 个数。
+    只缓存最近查询的 max_columns 列，内存不随场景的基金数增长。
+    """
+
+    TRADING_DAYS_PER_YEAR = 252
+    MAX_CACHED_COLUMNS = 256
+
+    def __init__(self, market, max_columns=MAX_CACHED_COLUMNS):
+        self.market = market
+        self.dates = market.dates
+        self.columns = {code: i for i, code in enumerate(market.fund_codes)}
+        self._offset = len(market.fund_codes)
+        self.columns.update({code: self._offset + i for i, code in enumerate(market.index_codes)})
+        self.max_columns = max_columns
+        # 列号 -> _ColumnTables，按最近使用的顺序排列
+        self._tables = {}
+        self._periods = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, code):
+        """代码对应的列，不存在时返回 None"""
+        return self.columns.get(code)
+
+    def series(self, col):
+        """列对应的净值/收盘价序列（行情矩阵的视图，不复制）"""
+        if col < self._offset:
+            return self.market.nav[:, col]
+        return self.market.index_close[:, col - self._offset]
+
+    def _column(self, col):
+        """取出（必要时构建）一列的查询表，并把它移到最近使用的位置"""
+        tables = self._tables.pop(col, None)
+        if tables is None:
+            tables = _ColumnTables(self.series(col))
+            if len(self._tables) >= self.max_columns:
+                del self._tables[next(iter(self._tables))]
+        self._tables[col] = tables
+        return tables
+
+    def period_return(self, col, start, end):
+        """
+        区间 [start, end] 行的期间收益率 (%)
+
+        Returns:
+            收益率；起止价格无效时返回 None
+        """
+        log_values = self._column(col).log_values
+        diff = log_values[end] - log_values[start]
+        if not np.isfinite(diff):
+            return None
+        return math.expm1(diff) * 100
+
+    def volatility(self, col, start, end, annualize=True):
+        """
+        区间 [start, end] 行内日对数收益率的样本标准差 (%)
+
+        Args:
+            annualize: 是否按每年252个交易日年化
+
+        Returns:
+            波动率；区间内收益率少于2个时返回 None
+        """
+        n = end - start
+        if n < 2:
+            return None
+        tables = self._column(col)
+        total = tables.cum_r[end] - tables.cum_r[start]
+        total2 = tables.cum_r2[end] - tables.cum_r2[start]
+        variance = max((total2 - total * total / n) / (n - 1), 0.0)
+        std = math.sqrt(variance)
+        if annualize:
+            std *= math.sqrt(self.TRADING_DAYS_PER_YEAR)
+        return std * 100
+
+    def max_drawdown(self, col, start, end):
+        """
+        区间 [start, end] 行内的最大回撤 (%)
+
+        用两个长度为 2^k 的重叠块 A、B 覆盖区间：高低点同在 A 或同在 B 的回撤由稀疏表直接给出，
+        其余情况高点只能在 A\\B、低点只能在 B\\A，两段的区间最值也可 O(1) 查得。
+        """
+        if end <= start:
+            return 0.0
+        tables = self._column(col)
+        k = (end - start + 1).bit_length() - 1
+        a, b = start, end - (1 << k) + 1
+        drop = max(tables.drop[k][a], tables.drop[k][b])
+        if b > a:
+            # A\B = [a, b-1]，B\A = [a+2^k, end]
+            cross = tables.range_max(a, b - 1) - tables.range_min(a + (1 << k), end)
+            if np.isfinite(cross):
+                drop = max(drop, cross)
+        return -math.expm1(-drop) * 100
+
+    def window_stats(self, col, start, end):
+        """区间 [start, end] 行的期间收益率、年化波动率和最大回撤"""
+        return {
+            'total_return': self.period_return(col, start, end),
+            'volatility': self.volatility(col, start, end),
+            'max_drawdown': self.max_drawdown(col, start, end),
+        }
+
+    def _period_bounds(self, freq):
+        """
+        按周/月划分交易日
+
+        Returns:
+            (每个周期最后一个交易日的行号数组, 每行所在周期第一个交易日的行号数组)
+        """
+        if freq not in self._periods:
+            if freq == 'W':
+                keys = [date.isocalendar()[:2] for date in self.dates]
+            else:
+                keys = [(date.year, date.month) for date in self.dates]
+            n = len(keys)
+            is_end = np.array([i == n - 1 or keys[i] != keys[i + 1] for i in range(n)], dtype=bool)
+            is_start = np.concatenate([[True], is_end[:-1]]) if n else np.zeros(0, dtype=bool)
+            period_start = np.maximum.accumulate(np.where(is_start, np.arange(n), 0)) if n else np.zeros(0, dtype=int)
+            self._periods[freq] = (np.flatnonzero(is_end), period_start)
+        return self._periods[freq]
+
+    def sample_rows(self, start, end, freq='D'):
+        """
+        区间 [start, end] 内按频率降采样后的行号
+
+        Args:
+            freq: 'D' 每日、'W' 每周最后一个交易日、'M' 每月最后一个交易日；
+                  区间最后一行总会被保留（可能是尚未结束的周期）
+
+        Returns:
+            升序行号数组
+        """
+        if freq == 'D':
+            return np.arange(start, end + 1)
+        period_ends, _ = self._period_bounds(freq)
+        lo, hi = np.searchsorted(period_ends, [start, end])
+        rows = period_ends[lo:hi]
+        return np.append(rows, end)
+
+    def period_changes(self, col, rows, freq='D'):
+        """
+        降采样各行相对上一周期末的涨跌幅 (%)
+
+        Returns:
+            与 rows 等长的数组；没有上一周期（场景第一个周期）或价格无效时为 nan
+        """
+        rows = np.asarray(rows)
+        if freq == 'D':
+            base = rows - 1
+        else:
+            _, period_start = self._period_bounds(freq)
+            base = period_start[rows] - 1
+        valid = base >= 0
+        changes = np.full(len(rows), np.nan)
+        log_values = self._column(col).log_values
+        changes[valid] = np.expm1(log_values[rows[valid]] - log_values[base[valid]]) * 100
+        return changes
+
+
+class _ColumnTables:
+    """单列的对数价格、日对数收益率前缀和，以及区间最大/最小对数价格和区间内最大回撤（对数形式）的稀疏表"""
+
+    def __init__(self, values):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.log_values = np.where(values > 0, np.log(values), np.nan)
+
+        # cum_r[t] = 第1..t天日对数收益率之和，cum_r2 为平方和；第0行为0
+        log_returns = np.diff(self.log_values)
+        log_returns = np.where(np.isfinite(log_returns), log_returns, 0.0)
+        self.cum_r = np.concatenate([[0.0], np.cumsum(log_returns)])
+        self.cum_r2 = np.concatenate([[0.0], np.cumsum(log_returns * log_returns)])
+
+        finite = np.isfinite(self.log_values)
+        self.max = [np.where(finite, self.log_values, -np.inf)]
+        self.min = [np.where(finite, self.log_values, np.inf)]
+        self.drop = [np.zeros_like(self.log_values)]
+
+        length = 1
+        while length * 2 <= len(self.log_values):
+            prev_max, prev_min, prev_drop = self.max[-1], self.min[-1], self.drop[-1]
+            n = len(prev_max) - length
+            left, right = slice(0, n), slice(length, length + n)
+            # 左右两半不相交：高点在左半、低点在右半的回撤即为左半最大值减右半最小值
+            cross = prev_max[left] - prev_min[right]
+            self.max.append(np.maximum(prev_max[left], prev_max[right]))
+            self.min.append(np.minimum(prev_min[left], prev_min[right]))
+            self.drop.append(np.maximum(np.maximum(prev_drop[left], prev_drop[right]),
+                                        np.where(np.isfinite(cross), cross, 0.0)))
+            length *= 2
+
+    def range_max(self, start, end):
+        k = (end - start + 1).bit_length() - 1
+        return max(self.max[k][start], self.max[k][end - (1 << k) + 1])
+
+    def range_min(self, start, end):
+        k = (end - start + 1).bit_length() - 1
+        return min(self.min[k][start], self.min[k][end - (1 << k) + 1])
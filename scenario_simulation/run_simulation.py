@@ -2,7 +2,9 @@
 import os
 import sys
 import argparse
+import contextlib
 from pathlib import Path
+from data_loader import ALIGNMENT_MODES, DEFAULT_ALIGNMENT
 from simulation_app import SimulationApp
 
 def main():
@@ -10,8 +12,20 @@ def main():
     parser.add_argument('--capital', type=float, default=100000, help="初始资金，默认100000元")
     parser.add_argument('--debug', action='store_true', help="启用调试模式")
     parser.add_argument('--import-file', type=str, help="导入历史投资记录文件路径")
+    parser.add_argument('--resume', type=str, help="从会话日志(.jsonl)恢复上次的模拟")
+    parser.add_argument('--alignment', type=str, choices=ALIGNMENT_MODES, default=DEFAULT_ALIGNMENT,
+                        help="交易日历对齐方式：strict 只保留所有基金和指数都有数据的日期，"
+                             "union/primary 以全部日期/上证指数交易日为日历并向前填充缺失净值")
+    parser.add_argument('--script', type=str,
+                        help="非交互地执行命令脚本文件（每行一条命令），'-' 表示从标准输入读取")
+    parser.add_argument('--json', action='store_true',
+                        help="脚本模式下每条命令输出一行JSON结果，其余提示信息输出到标准错误")
+    parser.add_argument('--no-log', action='store_true', help="不记录会话日志")
     args = parser.parse_args()
     
+    if args.script:
+        sys.exit(run_script(args))
+    
     # 获取当前脚本所在目录
     current_dir = Path(__file__).parent
     
@@ -30,7 +44,8 @@ def main():
         print("调试模式已启用")
     
     try:
-        app = SimulationApp(current_dir, args.capital)
+        app = SimulationApp(current_dir, args.capital, resume_log=args.resume, alignment=args.alignment,
+                            log_session=not args.no_log)
         
         # 如果指定了导入文件，则先导入历史记录
         if args.import_file:
@@ -52,6 +67,37 @@ def main():
             traceback.print_exc()
     
     print("\n感谢使用2008金融危机投资模拟系统!")
-    
+
+
+def run_script(args):
+    """
+    脚本模式：不渲染状态、不等待输入，执行完脚本后输出总结
+
+    Returns:
+        进程退出码，有命令执行失败或无法启动时为1
+    """
+    current_dir = Path(__file__).parent
+    # JSON 模式下标准输出只保留JSON结果
+    log = sys.stderr if args.json else sys.stdout
+    try:
+        with contextlib.redirect_stdout(log):
+            app = SimulationApp(current_dir, args.capital, resume_log=args.resume, alignment=args.alignment,
+                                log_session=not args.no_log)
+            if args.import_file:
+                import_result = app.simulator.import_history(args.import_file)
+                if not import_result['success']:
+                    print(f"导入历史记录失败: {import_result['message']}")
+                    return 1
+        
+        if args.script == '-':
+            failed = app.run_script(sys.stdin, json_output=args.json)
+        else:
+            with open(args.script, 'r', encoding='utf-8') as f:
+                failed = app.run_script(f, json_output=args.json)
+    except (OSError, ValueError) as e:
+        print(f"脚本执行出错: {e}", file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
 if __name__ == "__main__":
     main()
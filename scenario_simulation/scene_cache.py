@@ -0,0 +1,129 @@
+import os
+import json
+import hashlib
+import datetime
+from pathlib import Path
+
+import numpy as np
+
+from market_data import MarketData
+
+# 缓存格式版本，修改缓存内容结构时递增以使旧缓存失效
+CACHE_VERSION = 2
+
+
+def scene_cache_paths(db_path, alignment='strict'):
+    """
+    获取场景缓存文件路径（与数据库文件放在同一目录）
+
+    Args:
+        alignment: 交易日历对齐方式，非默认的 strict 对齐使用单独的缓存文件
+
+    Returns:
+        (数组文件路径 .scene.npz, 元数据文件路径 .scene.json)
+    """
+    db_path = Path(db_path)
+    stem = db_path.stem if alignment == 'strict' else f"{db_path.stem}.{alignment}"
+    return db_path.with_name(stem + '.scene.npz'), db_path.with_name(stem + '.scene.json')
+
+
+def compute_cache_key(input_paths):
+    """
+    根据输入文件的大小和修改时间计算缓存键
+
+    任一输入文件被修改、替换或删除时缓存键都会变化，从而触发重建。
+    """
+    digest = hashlib.sha256(f"v{CACHE_VERSION}".encode('utf-8'))
+    for path in input_paths:
+        path = Path(path)
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+        else:
+            digest.update(f"{path.name}:missing;".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def save_scene_cache(db_path, cache_key, market_data, news_data, description, simulation_start_date,
+                     alignment='strict'):
+    """
+    将编译后的场景数据写入缓存
+
+    先写数组文件再写元数据文件，均通过临时文件原子替换；
+    元数据中记录缓存键，只有两者都写完时缓存才会被视为有效。
+    """
+    npz_path, meta_path = scene_cache_paths(db_path, alignment)
+
+    tmp_npz = npz_path.with_name(npz_path.name + '.tmp')
+    with open(tmp_npz, 'wb') as f:
+        np.savez(
+            f,
+            dates=np.array([d.toordinal() for d in market_data.dates], dtype=np.int64),
+            nav=market_data.nav,
+            fund_change=market_data.fund_change,
+            index_close=market_data.index_close,
+            index_change=market_data.index_change,
+            fund_valid=market_data.fund_valid,
+        )
+    os.replace(tmp_npz, npz_path)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'cache_key': cache_key,
+        'fund_codes': market_data.fund_codes,
+        'index_codes': market_data.index_codes,
+        'day_news': market_data.news,
+        'news_data': [{'date': item['date'].isoformat(), 'content': item['content']} for item in news_data],
+        'description': description,
+        'simulation_start_date': simulation_start_date.isoformat() if simulation_start_date else None,
+    }
+    tmp_meta = meta_path.with_name(meta_path.name + '.tmp')
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_meta, meta_path)
+
+
+def load_scene_cache(db_path, cache_key, alignment='strict'):
+    """
+    读取场景缓存
+
+    Returns:
+        缓存有效时返回包含 market_data/news_data/description/simulation_start_date 的字典，
+        缓存不存在、已过期或损坏时返回 None
+    """
+    npz_path, meta_path = scene_cache_paths(db_path, alignment)
+    if not npz_path.exists() or not meta_path.exists():
+        return None
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != CACHE_VERSION or meta.get('cache_key') != cache_key:
+            return None
+
+        with np.load(npz_path, allow_pickle=False) as arrays:
+            market_data = MarketData(
+                dates=[datetime.date.fromordinal(int(d)) for d in arrays['dates']],
+                fund_codes=meta['fund_codes'],
+                nav=arrays['nav'],
+                fund_change=arrays['fund_change'],
+                index_codes=meta['index_codes'],
+                index_close=arrays['index_close'],
+                index_change=arrays['index_change'],
+                news=meta['day_news'],
+                fund_valid=arrays['fund_valid'],
+            )
+    except Exception as e:
+        print(f"读取场景缓存时出错，将重新构建: {e}")
+        return None
+
+    start_date = meta['simulation_start_date']
+    return {
+        'market_data': market_data,
+        'news_data': [
+            {'date': datetime.date.fromisoformat(item['date']), 'content': item['content']}
+            for item in meta['news_data']
+        ],
+        'description': meta['description'],
+        'simulation_start_date': datetime.date.fromisoformat(start_date) if start_date else None,
+    }
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+import itertools
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+
+from scenes import SCENE_ROOT, register_scene
+
+# 单个合成场景的基金数量上限
+MAX_FUNDS = 10000
+TRADING_DAYS_PER_YEAR = 252
+# 合成场景的第一个交易日
+START_DATE = datetime.date(2010, 1, 4)
+# 每批生成并写入的基金数量，限制净值矩阵占用的内存
+CHUNK_FUNDS = 500
+
+DB_NAME = 'synthetic.db'
+NEWS_NAME = '新闻.json'
+INTRO_NAME = '介绍.json'
+
+# 指数代码、名称（DataLoader 按名称识别上证/道琼斯）、起始点位、日波动率、成交量单位
+INDICES = [
+    ('SH000001', '上证指数', 3000.0, 0.016, 'B'),
+    ('DJI', '道琼斯工业平均指数', 10000.0, 0.012, 'M'),
+]
+# 道琼斯指数每年休市（上证指数正常交易）的天数
+DJ_HOLIDAYS_PER_YEAR = 9
+
+FUND_STYLES = ['成长', '价值', '红利', '精选', '稳健', '优选', '蓝筹', '中小盘', '债券', '收益']
+PURCHASE_STATUS = (['开放申购', '暂停申购', '限制大额申购', '封闭期'], [0.75, 0.1, 0.1, 0.05])
+REDEEM_STATUS = (['开放赎回', '暂停赎回', '封闭期'], [0.93, 0.02, 0.05])
+
+NEWS_TEMPLATES = [
+    '上证指数{direction}{pct}%，收于{close}点，两市成交额{volume}亿元。',
+    '道琼斯指数{direction}{pct}%，市场关注美联储最新政策动向。',
+    '{fund}发布季度报告，基金经理表示将{stance}仓位。',
+    '央行宣布{policy}，{sector}板块{direction}{pct}%。',
+    '{sector}板块资金净流入{volume}亿元，{fund}重仓股表现活跃。',
+    '机构预计下季度GDP增速为{gdp}%，{sector}行业景气度{trend}。',
+]
+NEWS_WORDS = {
+    'direction': ['上涨', '下跌', '微涨', '微跌', '大涨', '大跌'],
+    'stance': ['提高', '降低', '维持'],
+    'policy': ['下调存款准备金率', '下调基准利率', '上调基准利率', '开展逆回购操作'],
+    'sector': ['银行', '地产', '医药', '科技', '消费', '能源', '有色', '军工'],
+    'trend': ['回升', '回落', '平稳'],
+}
+
+
+def _converter():
+    """加载 database/scene/csv_to_db_converter.py，与真实场景数据库使用同一份建表语句"""
+    spec = importlib.util.spec_from_file_location('csv_to_db_converter', SCENE_ROOT / 'csv_to_db_converter.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def trading_days(start, n_days):
+    """从 start 起的 n_days 个工作日"""
+    days = []
+    date = start
+    while len(days) < n_days:
+        if date.weekday() < 5:
+            days.append(date)
+        date += datetime.timedelta(days=1)
+    return days
+
+
+def _market_returns(rng, n_days):
+    """
+    生成两个指数的日收益率：上证指数在平稳和动荡两种状态间切换，道琼斯指数与其部分相关
+
+    Returns:
+        (交易日数, 2) 的日收益率矩阵
+    """
+    # 每天以 2% 的概率切换状态，动荡状态波动率翻倍且均值为负
+    switches = rng.random(n_days) < 0.02
+    turbulent = np.cumsum(switches) % 2 == 1
+    mean = np.where(turbulent, -0.001, 0.0005)
+    scale = np.where(turbulent, 2.0, 1.0)
+
+    common = rng.normal(0, 1, n_days)
+    returns = np.empty((n_days, len(INDICES)))
+    for i, (_, _, _, vol, _) in enumerate(INDICES):
+        own = rng.normal(0, 1, n_days)
+        shock = common if i == 0 else 0.4 * common + np.sqrt(1 - 0.4 ** 2) * own
+        returns[:, i] = mean + vol * scale * shock
+    return returns
+
+
+def _index_rows(rng, index_code, dates, returns, start, volume_unit, skip):
+    """生成一个指数的 index_data 行，格式与真实场景一致（成交量和涨跌幅为字符串）"""
+    close = start * np.cumprod(1 + returns)
+    prev = np.concatenate([[start], close[:-1]])
+    open_ = prev * (1 + rng.normal(0, 0.003, len(dates)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, len(dates))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, len(dates))))
+    volume = rng.uniform(50, 300, len(dates))
+
+    rows = []
+    for t, date in enumerate(dates):
+        if skip[t]:
+            continue
+        rows.append((
+            index_code, date.isoformat(),
+            round(float(close[t]), 2), round(float(open_[t]), 2),
+            round(float(high[t]), 2), round(float(low[t]), 2),
+            f'{volume[t]:.2f}{volume_unit}', f'{returns[t] * 100:.2f}%',
+        ))
+    return rows
+
+
+def _fund_rows(rng, codes, date_strs, market, missing_ratio):
+    """
+    生成一批基金的 fund_nav 行，按 (基金代码, 日期) 排序
+
+    每只基金的日收益率 = beta × 上证指数收益率 + 特质收益率；按 missing_ratio 随机删除部分记录，
+    删除后次日的日增长率仍相对上一交易日计算，与真实数据中停牌/未公布净值的情形一致。
+    """
+    n_days, n = len(date_strs), len(codes)
+    beta = rng.uniform(0.1, 1.2, n)
+    idio = rng.uniform(0.001, 0.012, n)
+    returns = market[:, None] * beta + rng.normal(0, 1, (n_days, n)) * idio
+    nav = np.round(rng.uniform(0.8, 2.0, n) * np.cumprod(1 + returns, axis=0), 4)
+    nav = np.maximum(nav, 0.0001)
+    growth = np.empty_like(nav)
+    growth[0] = returns[0] * 100
+    growth[1:] = (nav[1:] / nav[:-1] - 1) * 100
+    growth = np.round(growth, 2)
+    acc_nav = np.round(nav + rng.uniform(0, 1.5, n).round(4), 4)
+
+    keep = rng.random((n_days, n)) >= missing_ratio
+    purchase = rng.choice(len(PURCHASE_STATUS[0]), size=(n_days, n), p=PURCHASE_STATUS[1])
+    redeem = rng.choice(len(REDEEM_STATUS[0]), size=(n_days, n), p=REDEEM_STATUS[1])
+    purchase_names = np.array(PURCHASE_STATUS[0], dtype=object)
+    redeem_names = np.array(REDEEM_STATUS[0], dtype=object)
+
+    for j, code in enumerate(codes):
+        rows = np.flatnonzero(keep[:, j])
+        yield from zip(
+            itertools.repeat(code, len(rows)),
+            date_strs[rows].tolist(),
+            nav[rows, j].tolist(),
+            acc_nav[rows, j].tolist(),
+            growth[rows, j].tolist(),
+            purchase_names[purchase[rows, j]].tolist(),
+            redeem_names[redeem[rows, j]].tolist(),
+        )
+
+
+def _news_items(rng, dates, news_per_day, fund_names, market):
+    """按泊松分布为每个交易日生成若干条模板新闻"""
+    counts = rng.poisson(news_per_day, len(dates))
+    items = []
+    for t in np.flatnonzero(counts):
+        for _ in range(counts[t]):
+            template = NEWS_TEMPLATES[rng.integers(len(NEWS_TEMPLATES))]
+            words = {key: values[rng.integers(len(values))] for key, values in NEWS_WORDS.items()}
+            items.append({
+                'date': dates[t].isoformat(),
+                'content': template.format(
+                    fund=fund_names[rng.integers(len(fund_names))],
+                    pct=f'{abs(market[t]) * 100:.2f}',
+                    close=f'{rng.uniform(2000, 5000):.2f}',
+                    volume=int(rng.integers(500, 5000)),
+                    gdp=f'{rng.uniform(5, 10):.1f}',
+                    **words,
+                ),
+            })
+    return items
+
+
+def generate_scene(output_dir, n_funds=100, years=3, missing_ratio=0.0, news_per_day=1.0, seed=0,
+                   scene_id=None, overwrite=False):
+    """
+    生成合成场景：场景数据库（与 csv_to_db_converter.create_db 相同的表结构）、新闻和场景介绍
+
+    数据库写入使用批量插入：关闭日志和同步、单个事务内按主键顺序 executemany，
+    基金每 CHUNK_FUNDS 只一批生成和写入，内存占用与基金总数无关。
+
+    Args:
+        output_dir: 场景数据目录，不存在时自动创建
+        n_funds: 基金数量（不超过 MAX_FUNDS）
+        years: 日线数据年数，每年 252 个交易日，可以是小数
+        missing_ratio: 随机缺失的基金净值记录比例；存在缺失时各基金的交易日不一致，
+                       strict 对齐会丢弃大部分日期，应使用 union/primary 对齐方式加载
+        news_per_day: 平均每个交易日的新闻条数
+        seed: 随机种子，相同参数和种子生成相同的场景
+        scene_id: 指定时把生成的场景注册到 scenes.SCENES，之后可按该ID加载
+        overwrite: 场景数据库已存在时是否覆盖
+
+    Returns:
+        {'db_path', 'news_path', 'intro_path', 'funds', 'days', 'nav_rows', 'index_rows', 'news', 'seconds'}
+    """
+    if not 1 <= n_funds <= MAX_FUNDS:
+        raise ValueError(f"基金数量必须在 1 到 {MAX_FUNDS} 之间")
+    n_days = int(round(years * TRADING_DAYS_PER_YEAR))
+    if n_days < 2:
+        raise ValueError("场景至少需要2个交易日")
+    if not 0 <= missing_ratio < 1:
+        raise ValueError("缺失比例必须在 [0, 1) 之间")
+    if news_per_day < 0:
+        raise ValueError("每日新闻条数不能为负数")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    db_path = output_dir / DB_NAME
+    if db_path.exists():
+        if not overwrite:
+            raise FileExistsError(f"场景数据库已存在: {db_path}")
+        db_path.unlink()
+
+    start_time = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    dates = trading_days(START_DATE, n_days)
+    date_strs = np.array([date.isoformat() for date in dates], dtype=object)
+    market = _market_returns(rng, n_days)
+
+    codes = [f'{i + 1:06d}' for i in range(n_funds)]
+    names = [f'合成{FUND_STYLES[i % len(FUND_STYLES)]}{i + 1:05d}' for i in range(n_funds)]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        cursor = conn.cursor()
+        _converter().create_tables(cursor)
+
+        cursor.executemany("INSERT INTO funds (fund_code, fund_name) VALUES (?, ?)", zip(codes, names))
+        cursor.executemany("INSERT INTO indices (index_code, index_name) VALUES (?, ?)",
+                           [(code, name) for code, name, _, _, _ in INDICES])
+
+        index_rows = 0
+        for i, (code, _, start, _, unit) in enumerate(INDICES):
+            skip = np.zeros(n_days, dtype=bool)
+            if code == 'DJI':
+                holidays = max(1, int(n_days / TRADING_DAYS_PER_YEAR * DJ_HOLIDAYS_PER_YEAR))
+                skip[rng.choice(np.arange(1, n_days), size=min(holidays, n_days - 1), replace=False)] = True
+            rows = _index_rows(rng, code, dates, market[:, i], start, unit, skip)
+            cursor.executemany(
+                "INSERT INTO index_data (index_code, date, close, open, high, low, volume, change_pct) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            index_rows += len(rows)
+
+        nav_rows = 0
+        for offset in range(0, n_funds, CHUNK_FUNDS):
+            cursor.executemany(
+                "INSERT INTO fund_nav (fund_code, date, unit_nav, acc_nav, daily_growth, status_purchase, "
+                "status_redeem) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _fund_rows(rng, codes[offset:offset + CHUNK_FUNDS], date_strs, market[:, 0], missing_ratio))
+            nav_rows += cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+
+    news = _news_items(rng, dates, news_per_day, names, market[:, 0])
+    news_path = output_dir / NEWS_NAME
+    with open(news_path, 'w', encoding='utf-8') as f:
+        json.dump(news, f, ensure_ascii=False, indent=2)
+
+    intro_path = output_dir / INTRO_NAME
+    with open(intro_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'description': (f"合成场景：{n_funds} 只基金，{dates[0]} 至 {dates[-1]} 共 {n_days} 个交易日，"
+                            f"净值缺失比例 {missing_ratio:.1%}，{len(news)} 条新闻（随机种子 {seed}）。\n\n"
+                            "行情为随机生成，大盘在平稳和动荡两种状态间切换，仅用于测试模拟器在不同数据规模下的表现。")
+        }, f, ensure_ascii=False, indent=2)
+
+    if scene_id is not None:
+        register_scene(scene_id, f'合成场景 {n_funds}只基金×{n_days}天', output_dir, DB_NAME, NEWS_NAME, INTRO_NAME)
+
+    return {
+        'db_path': db_path,
+        'news_path': news_path,
+        'intro_path': intro_path,
+        'funds': n_funds,
+        'days': n_days,
+        'nav_rows': nav_rows,
+        'index_rows': index_rows,
+        'news': len(news),
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成场景数据，用于测试数据加载和模拟器在不同规模下的表现")
+    parser.add_argument('output_dir', type=str, help="场景数据目录")
+    parser.add_argument('--funds', type=int, default=100, help=f"基金数量，最多 {MAX_FUNDS}")
+    parser.add_argument('--years', type=float, default=3, help="日线数据年数")
+    parser.add_argument('--missing', type=float, default=0.0, help="随机缺失的净值记录比例，如 0.01")
+    parser.add_argument('--news-per-day', type=float, default=1.0, help="平均每个交易日的新闻条数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--overwrite', action='store_true', help="覆盖已存在的场景数据库")
+    args = parser.parse_args()
+
+    try:
+        result = generate_scene(args.output_dir, args.funds, args.years, args.missing, args.news_per_day,
+                                args.seed, overwrite=args.overwrite)
+    except (ValueError, FileExistsError) as e:
+        parser.error(str(e))
+
+    print(f"已生成场景数据库: {result['db_path']}")
+    print(f"基金 {result['funds']} 只，交易日 {result['days']} 天，净值记录 {result['nav_rows']} 条，"
+          f"指数记录 {result['index_rows']} 条，新闻 {result['news']} 条，耗时 {result['seconds']:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+# 场景数据根目录
+SCENE_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) / "database" / "scene"
+
+# 场景注册表：场景ID -> 数据目录及文件名
+SCENES = {
+    '2008': {
+        'name': '2008金融危机',
+        'dir': '2008金融危机',
+        'db': 'fund_2007-2008_crisis.db',
+        'news': '新闻.json',
+        'intro': '2008金融危机介绍.json',
+    },
+    '2015': {
+        'name': '2015年中国股灾',
+        'dir': '2015年中国股灾',
+        'db': 'fund_2015_crash.db',
+        'news': '新闻.json',
+        'intro': '介绍.json',
+    },
+    '2020': {
+        'name': '2020年疫情冲击',
+        'dir': '2020年疫情冲击',
+        'db': 'fund_2020_covid.db',
+        'news': '新闻.json',
+        'intro': '介绍.json',
+    },
+}
+
+DEFAULT_SCENE = '2008'
+
+
+def register_scene(scene_id, name, data_dir, db, news='新闻.json', intro='介绍.json'):
+    """
+    注册一个额外的场景（如 scene_generator 生成的合成场景），注册后即可按场景ID加载
+
+    Args:
+        data_dir: 场景数据目录，可以是 SCENE_ROOT 下的目录名或任意绝对路径
+        db, news, intro: 目录下的数据库、新闻和场景介绍文件名
+    """
+    SCENES[scene_id] = {
+        'name': name,
+        'dir': str(data_dir),
+        'db': db,
+        'news': news,
+        'intro': intro,
+    }
+
+
+def scene_files(scene_id=DEFAULT_SCENE):
+    """
+    获取场景的数据文件路径
+
+    Returns:
+        (数据目录, 数据库路径, 新闻路径, 场景介绍路径)
+    """
+    if scene_id not in SCENES:
+        raise ValueError(f"未知的场景: {scene_id}，可选: {', '.join(SCENES)}")
+    scene = SCENES[scene_id]
+    data_dir = SCENE_ROOT / scene['dir']
+    return data_dir, data_dir / scene['db'], data_dir / scene['news'], data_dir / scene['intro']
+
+
+def list_scenes():
+    """
+    列出所有注册的场景及其是否可用
+
+    只有存在场景数据库的场景可以加载；2015、2020 场景目前只有原始CSV，
+    需要先用 database/scene/csv_to_db_converter.py 转换为数据库。
+    """
+    scenes = []
+    for scene_id, scene in SCENES.items():
+        _, db_path, _, _ = scene_files(scene_id)
+        scenes.append({
+            'scene_id': scene_id,
+            'name': scene['name'],
+            'available': db_path.exists(),
+            'message': '' if db_path.exists() else f'缺少场景数据库: {db_path.name}',
+        })
+    return scenes
@@ -0,0 +1,223 @@
+import os
+import json
+from pathlib import Path
+from collections.abc import Sequence
+
+# 快照格式版本，修改快照内容结构时递增
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_path(log_path):
+    """获取会话日志对应的快照文件路径（与日志放在同一目录）"""
+    log_path = Path(log_path)
+    return log_path.with_name(log_path.stem + '.snapshot.json')
+
+
+def history_path(log_path):
+    """获取会话日志对应的净值历史文件路径（与日志放在同一目录）"""
+    log_path = Path(log_path)
+    return log_path.with_name(log_path.stem + '.history.jsonl')
+
+
+def read_records(path, segments):
+    """
+    读取历史文件中若干字节区间内的记录
+
+    Args:
+        segments: [(起始偏移量, 结束偏移量, 记录数), ...]
+
+    Returns:
+        按区间顺序排列的记录列表
+    """
+    records = []
+    with open(path, 'rb') as f:
+        for start, end, _ in segments:
+            f.seek(start)
+            records.extend(json.loads(line) for line in f.read(end - start).splitlines())
+    return records
+
+
+class LoggedRecords(Sequence):
+    """
+    历史文件中若干字节区间内记录的只读视图
+
+    首次按下标访问时才读取并解析这些区间，恢复会话时不必读取整个净值历史。
+    """
+
+    def __init__(self, path, segments, parse=None):
+        """
+        Args:
+            path: 历史文件路径
+            segments: [(起始偏移量, 结束偏移量, 记录数), ...]
+            parse: 把文件中的一条记录转换为内存中的记录的函数
+        """
+        self.path = Path(path)
+        self.segments = [tuple(segment) for segment in segments]
+        self._parse = parse
+        self._length = sum(count for _, _, count in self.segments)
+        self._items = None
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if self._items is None:
+            records = read_records(self.path, self.segments)
+            self._items = [self._parse(record) for record in records] if self._parse else records
+        return self._items[index]
+
+
+class SessionLog:
+    """
+    模拟会话的追加式事件日志
+
+    每个事件写为 JSONL 文件中的一行，写入后立即刷盘，进程崩溃时最多丢失正在写入的一条事件；
+    每隔若干事件写一次状态快照，快照中记录对应的日志偏移量，恢复时只需读取快照和其后的日志尾部。
+    已经结束的交易日的净值记录追加到单独的历史文件中，快照只记录它们所在的字节区间，
+    快照大小和恢复耗时不随会话长度增长。
+    """
+
+    def __init__(self, log_path, snapshot_every=100, sync=True):
+        """
+        Args:
+            log_path: 日志文件路径 (.jsonl)
+            snapshot_every: 每追加多少条事件写一次快照
+            sync: 每条事件写入后是否调用 fsync，保证断电时也不丢失已写入的事件
+        """
+        self.log_path = Path(log_path)
+        self.snapshot_path = snapshot_path(self.log_path)
+        self.history_path = history_path(self.log_path)
+        self.snapshot_every = max(int(snapshot_every), 1)
+        self.sync = sync
+        self.events_since_snapshot = 0
+        self.snapshot_offset = None  # load() 读取到的快照所对应的日志偏移量
+        self._file = None
+        self._history_file = None
+
+    def open(self, truncate_at=None):
+        """
+        打开日志文件用于追加
+
+        Args:
+            truncate_at: 恢复时最后一条完整事件之后的偏移量，之后的残缺内容会被截断
+        """
+        os.makedirs(self.log_path.parent, exist_ok=True)
+        self._file = open(self.log_path, 'ab')
+        if truncate_at is not None and self._file.tell() > truncate_at:
+            self._file.truncate(truncate_at)
+            self._file.seek(truncate_at)
+        self._history_file = open(self.history_path, 'ab')
+        return self
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._history_file is not None:
+            self._history_file.close()
+            self._history_file = None
+
+    @property
+    def offset(self):
+        """当前日志末尾的字节偏移量"""
+        return self._file.tell()
+
+    def append(self, event):
+        """
+        追加一条事件
+
+        Returns:
+            是否需要写快照（距上次快照的事件数达到 snapshot_every）
+        """
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n'
+        self._file.write(line.encode('utf-8'))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self.events_since_snapshot += 1
+        return self.events_since_snapshot >= self.snapshot_every
+
+    def append_history(self, records):
+        """
+        向历史文件追加净值记录
+
+        历史文件只追加不修改，之前返回的区间始终有效；崩溃时未被快照引用的内容会被忽略。
+
+        Returns:
+            写入内容的区间 (起始偏移量, 结束偏移量, 记录数)
+        """
+        start = self._history_file.seek(0, os.SEEK_END)
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        self._history_file.write(data.encode('utf-8'))
+        self._history_file.flush()
+        if self.sync:
+            os.fsync(self._history_file.fileno())
+        return start, self._history_file.tell(), len(records)
+
+    def write_snapshot(self, state):
+        """
+        原子地写入状态快照
+
+        Args:
+            state: 可JSON序列化的会话状态，快照中会附加当前日志偏移量
+        """
+        snapshot = {'version': SNAPSHOT_VERSION, 'log_offset': self.offset, 'state': state}
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self.events_since_snapshot = 0
+
+    def load(self):
+        """
+        读取最新快照及其之后的日志尾部
+
+        Returns:
+            (快照状态或None, 尾部事件列表, 最后一条完整事件之后的偏移量)
+        """
+        state = None
+        offset = 0
+        if self.snapshot_path.exists():
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                if snapshot.get('version') == SNAPSHOT_VERSION:
+                    state = snapshot['state']
+                    offset = snapshot['log_offset']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"读取会话快照时出错，将从日志开头恢复: {e}")
+                state, offset = None, 0
+        self.snapshot_offset = offset if state is not None else None
+
+        events = []
+        end = offset
+        if self.log_path.exists():
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    # 崩溃时可能留下没有换行符或无法解析的最后一行，丢弃它及之后的内容
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        break
+                    end += len(line)
+        return state, events, end
+
+    def read_events(self, end=None):
+        """按顺序读取日志中偏移量 end 之前的全部事件（导出完整操作记录时使用）"""
+        events = []
+        if not self.log_path.exists():
+            return events
+        position = 0
+        with open(self.log_path, 'rb') as f:
+            for line in f:
+                if (end is not None and position >= end) or not line.endswith(b'\n'):
+                    break
+                position += len(line)
+                events.append(json.loads(line))
+        return events
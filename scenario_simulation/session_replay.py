@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+import io
+import os
+import json
+import argparse
+import datetime
+import itertools
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import BacktestContext
+from data_loader import DataLoader
+from investment_simulator import MIN_ORDER_AMOUNT, trade_fills
+from performance import market_return, max_drawdown
+from scene_generator import DB_NAME, INTRO_NAME, NEWS_NAME
+from scenes import DEFAULT_SCENE, SCENES, register_scene
+from shared_market import SharedMarketData, attach_scene_data
+
+# export_actions 导出文件的默认文件名模式
+SESSION_PATTERN = 'user_actions_*.json'
+# 对照组：在录制会话的场景中按原样重放
+BASELINE_VARIANT = {'name': 'original', 'scene': None, 'delay': 0, 'fees': None}
+
+
+def load_session(path):
+    """
+    读取 export_actions 导出的会话文件
+
+    Returns:
+        {'file', 'initial_capital', 'end_date', 'final_assets', 'fills': [(日期, action_type, details), ...]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    info = data['simulation_info']
+    fills = []
+    for action in data['actions']:
+        date = datetime.datetime.strptime(action['date'], '%Y-%m-%d').date()
+        fills.extend((date, action_type, details) for action_type, details in trade_fills([action]))
+    end_date = info.get('end_date')
+    return {
+        'file': str(path),
+        'initial_capital': info['initial_capital'],
+        'end_date': datetime.datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None,
+        'final_assets': info.get('final_assets'),
+        'fills': fills,
+    }
+
+
+def _start_row(scene_data):
+    market = scene_data['market_data']
+    if scene_data.get('simulation_start_date'):
+        return market.row_on_or_after(scene_data['simulation_start_date']) or 0
+    return 0
+
+
+def session_plan(session, scene_data):
+    """
+    把会话的逐笔成交转换为与行情无关的交易意图，以便在其他场景、延迟或费率下重放
+
+    买入保留金额，卖出换算为卖出时持仓份额的比例（其他条件下持仓份额不同，按比例卖出才保持原意）；
+    日期换算为相对模拟开始日的交易日偏移量。
+
+    Returns:
+        {'orders': [(偏移量, 'buy'/'sell', 基金代码, 金额或比例), ...], 'end_offset': 会话结束日的偏移量}
+    """
+    market = scene_data['market_data']
+    start_row = _start_row(scene_data)
+    holdings = {}
+    orders = []
+    for date, action_type, details in session['fills']:
+        row = market.row_of(date)
+        if row is None:
+            raise ValueError(f'交易日期 {date} 不在场景时间线上，会话可能录制于其他场景')
+        fund_code = details['fund_code']
+        if action_type == 'buy':
+            holdings[fund_code] = holdings.get(fund_code, 0.0) + details['shares']
+            orders.append((row - start_row, 'buy', fund_code, details['amount']))
+        else:
+            held = holdings.get(fund_code, 0.0)
+            fraction = min(details['shares'] / held, 1.0) if held > 0 else 1.0
+            holdings[fund_code] = max(held - details['shares'], 0.0)
+            orders.append((row - start_row, 'sell', fund_code, fraction))
+
+    end_row = market.row_of(session['end_date']) if session['end_date'] else None
+    if end_row is None:
+        end_row = max([start_row + order[0] for order in orders], default=len(market) - 1)
+    return {'orders': orders, 'end_offset': end_row - start_row}
+
+
+def replay_plan(plan, scene_data, initial_capital, delay=0, fees=None, fund_codes=None):
+    """
+    在指定场景中按交易意图重放一个会话
+
+    Args:
+        plan: session_plan() 的结果
+        scene_data: 重放使用的场景数据
+        delay: 每笔交易推迟执行的交易日数
+        fees: 交易费率，见 BacktestContext
+        fund_codes: 录制场景的基金代码列表；重放场景中不存在某只基金时，换用重放场景同一位置的基金
+
+    Returns:
+        {'final_assets', 'total_return', 'market_return', 'max_drawdown', 'buy_count', 'sell_count',
+         'skipped', 'fees', 'days'}；无法执行的交易（基金不存在、当天无净值、超出会话结束日）计入 skipped
+    """
+    market = scene_data['market_data']
+    start_row = _start_row(scene_data)
+    end_row = min(start_row + plan['end_offset'], len(market) - 1)
+
+    def resolve(fund_code):
+        if fund_code in market.fund_index or fund_codes is None or fund_code not in fund_codes:
+            return fund_code
+        position = fund_codes.index(fund_code)
+        return market.fund_codes[position] if position < len(market.fund_codes) else fund_code
+
+    ctx = BacktestContext(market, initial_capital, fees)
+    orders = sorted(((offset + delay, i, action_type, fund_code, value)
+                     for i, (offset, action_type, fund_code, value) in enumerate(plan['orders'])))
+    skipped = sum(1 for order in orders if start_row + order[0] > end_row)
+    pending = iter([order for order in orders if start_row + order[0] <= end_row])
+    order = next(pending, None)
+
+    net_worth = np.empty(end_row - start_row + 1)
+    for i, row in enumerate(range(start_row, end_row + 1)):
+        ctx.row = row
+        while order is not None and start_row + order[0] == row:
+            _, _, action_type, fund_code, value = order
+            fund_code = resolve(fund_code)
+            if action_type == 'buy':
+                # 条件变化后现金可能不足，按可用现金买入
+                amount = min(value, ctx.cash)
+                done = amount >= MIN_ORDER_AMOUNT and ctx.buy(fund_code, amount)
+            else:
+                done = ctx.sell(fund_code, percentage=value)
+            skipped += not done
+            order = next(pending, None)
+        net_worth[i] = ctx.total_assets
+
+    final_assets = float(net_worth[-1]) if len(net_worth) else float(initial_capital)
+    buy_count = sum(1 for trade in ctx.trades if trade[1] == 'buy')
+    return {
+        'final_assets': final_assets,
+        'total_return': (final_assets - initial_capital) / initial_capital * 100,
+        'market_return': market_return(market, 'sh_index'),
+        'max_drawdown': max_drawdown(net_worth),
+        'buy_count': buy_count,
+        'sell_count': len(ctx.trades) - buy_count,
+        'skipped': skipped,
+        'fees': ctx.fees_paid,
+        'days': len(net_worth),
+    }
+
+
+def replay_session(path, scenes, variants, base_scene=DEFAULT_SCENE):
+    """
+    读取一个会话文件，在每个对比条件下重放
+
+    Args:
+        scenes: {场景ID: 场景数据}，需包含 base_scene 和各对比条件用到的场景
+        variants: 对比条件列表，每项为 {'name', 'scene': 场景ID（None 为录制场景）, 'delay', 'fees'}
+        base_scene: 会话录制时使用的场景
+
+    Returns:
+        每个对比条件一行的结果列表；会话无法解析时返回一行带 error 字段的结果
+    """
+    try:
+        session = load_session(path)
+        plan = session_plan(session, scenes[base_scene])
+    except KeyError as e:
+        return [{'file': str(path), 'variant': None, 'error': f'会话文件缺少字段: {e}'}]
+    except (OSError, ValueError, TypeError) as e:
+        return [{'file': str(path), 'variant': None, 'error': str(e)}]
+
+    fund_codes = scenes[base_scene]['market_data'].fund_codes
+    rows = []
+    for variant in variants:
+        scene_id = variant.get('scene') or base_scene
+        result = replay_plan(plan, scenes[scene_id], session['initial_capital'], variant.get('delay', 0),
+                             variant.get('fees'), fund_codes)
+        rows.append({
+            'file': str(path),
+            'variant': variant['name'],
+            'scene': scene_id,
+            'delay': variant.get('delay', 0),
+            'recorded_final_assets': session['final_assets'],
+            'orders': len(plan['orders']),
+            'error': None,
+            **result,
+        })
+    return rows
+
+
+# 工作进程中挂载的共享场景数据和重放参数
+_worker_scenes = None
+_worker_args = None
+
+
+def _init_worker(handles, variants, base_scene):
+    global _worker_scenes, _worker_args
+    _worker_scenes = {scene_id: attach_scene_data(handle) for scene_id, handle in handles.items()}
+    _worker_args = (variants, base_scene)
+
+
+def _replay_in_worker(path):
+    variants, base_scene = _worker_args
+    return replay_session(path, _worker_scenes, variants, base_scene)
+
+
+def replay_directory(directory, scenes, variants, base_scene=DEFAULT_SCENE, pattern=SESSION_PATTERN,
+                     processes=None, chunksize=8):
+    """
+    并行重放目录下的全部导出会话
+
+    各场景行情只通过共享内存发布一次；会话文件由工作进程各自读取解析，每个会话的重放结果
+    依次流式返回主进程，主进程不持有任何会话的原始数据。
+
+    Args:
+        directory: 会话文件目录（通常为 scene_path/save）
+        scenes: {场景ID: 场景数据}
+        variants: 对比条件列表，见 replay_session；对照组 original 总会放在第一位
+        pattern: 会话文件名模式
+        processes: 进程数，默认CPU核数；为1时在当前进程内顺序执行
+
+    Returns:
+        每个 会话 × 对比条件 一行的 DataFrame，含相对对照组的收益率差 return_diff
+    """
+    variants = [BASELINE_VARIANT] + [v for v in variants if v['name'] != BASELINE_VARIANT['name']]
+    missing = {v['scene'] for v in variants if v.get('scene')} | {base_scene}
+    missing -= set(scenes)
+    if missing:
+        raise ValueError(f"缺少场景数据: {', '.join(sorted(missing))}")
+    paths = sorted(Path(directory).glob(pattern))
+    processes = processes or os.cpu_count() or 1
+
+    rows = []
+    if processes == 1 or len(paths) <= 1:
+        for path in paths:
+            rows.extend(replay_session(path, scenes, variants, base_scene))
+    else:
+        with contextlib.ExitStack() as stack:
+            handles = {scene_id: stack.enter_context(SharedMarketData(data)).handle for scene_id, data in scenes.items()}
+            pool = stack.enter_context(ProcessPoolExecutor(processes, initializer=_init_worker,
+                                                           initargs=(handles, variants, base_scene)))
+            for session_rows in pool.map(_replay_in_worker, paths, chunksize=chunksize):
+                rows.extend(session_rows)
+
+    table = pd.DataFrame(rows) if rows else pd.DataFrame(columns=['file', 'variant', 'error'])
+    if not len(table) or 'total_return' not in table:
+        return table
+    baseline = table[table['variant'] == BASELINE_VARIANT['name']].set_index('file')['total_return']
+    table['return_diff'] = table['total_return'] - table['file'].map(baseline)
+    return table
+
+
+def compare_variants(table):
+    """
+    按对比条件汇总重放结果
+
+    Returns:
+        每个对比条件一行的 DataFrame：会话数、平均/中位收益率、相对对照组的平均收益率差、
+        平均最大回撤、跳过的交易数和手续费合计
+    """
+    ok = table[table['error'].isna()]
+    return ok.groupby('variant', sort=False).agg(
+        sessions=('file', 'count'),
+        mean_return=('total_return', 'mean'),
+        median_return=('total_return', 'median'),
+        mean_return_diff=('return_diff', 'mean'),
+        mean_max_drawdown=('max_drawdown', 'mean'),
+        skipped=('skipped', 'sum'),
+        fees=('fees', 'sum'),
+    ).reset_index()
+
+
+def build_variants(scene_ids=(None,), delays=(0,), fee_rates=(0.0,)):
+    """由 场景 × 延迟 × 费率 网格生成对比条件列表（费率同时用于申购和赎回）"""
+    variants = []
+    for scene_id, delay, fee_rate in itertools.product(scene_ids, delays, fee_rates):
+        parts = [f'scene={scene_id}'] if scene_id else []
+        parts += [f'delay={delay}'] if delay else []
+        parts += [f'fee={fee_rate:g}'] if fee_rate else []
+        variants.append({
+            'name': ','.join(parts) or BASELINE_VARIANT['name'],
+            'scene': scene_id,
+            'delay': delay,
+            'fees': {'buy': fee_rate, 'sell': fee_rate} if fee_rate else None,
+        })
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在其他场景、交易延迟或费率下并行重放导出的用户会话并对比结果")
+    parser.add_argument('directory', type=str, nargs='?', default=str(Path(__file__).parent / 'save'),
+                        help="会话文件目录，默认 save")
+    parser.add_argument('--base-scene', type=str, default=DEFAULT_SCENE, help="会话录制时使用的场景")
+    parser.add_argument('--scenes', type=str, nargs='*', default=[],
+                        help="额外对比的场景ID，或 scene_generator 生成的场景目录")
+    parser.add_argument('--delays', type=int, nargs='*', default=[0], help="交易延迟（交易日）")
+    parser.add_argument('--fees', type=float, nargs='*', default=[0.0], help="交易费率，如 0.0015")
+    parser.add_argument('--processes', type=int, help="进程数，默认CPU核数")
+    parser.add_argument('--output', type=str, help="把逐会话结果保存为CSV文件")
+    args = parser.parse_args()
+
+    for scene_id in args.scenes:
+        if scene_id not in SCENES and Path(scene_id).is_dir():
+            register_scene(scene_id, Path(scene_id).name, Path(scene_id).resolve(), DB_NAME, NEWS_NAME, INTRO_NAME)
+    scene_ids = [args.base_scene] + [s for s in args.scenes if s != args.base_scene]
+    unknown = [scene_id for scene_id in scene_ids if scene_id not in SCENES]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        scenes = {scene_id: DataLoader(Path(__file__).parent, scene_id).load_all_data() for scene_id in scene_ids}
+
+    variants = build_variants([None] + args.scenes, args.delays, args.fees)
+    table = replay_directory(args.directory, scenes, variants, args.base_scene, processes=args.processes)
+    if not len(table):
+        print(f"目录中没有会话文件: {args.directory}")
+        return
+
+    errors = table[table['error'].notna()]
+    for _, row in errors.iterrows():
+        print(f"跳过 {row['file']}: {row['error']}")
+    if len(errors) < len(table):
+        print(compare_variants(table).to_string(index=False, float_format=lambda x: f'{x:.2f}'))
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"已保存逐会话结果: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
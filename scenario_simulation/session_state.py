@@ -0,0 +1,203 @@
+import datetime
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class CowList(Sequence):
+    """
+    支持写时复制分叉的追加式列表
+
+    fork() 时把当前元素冻结为共享段，父子两个列表都只引用共享段而不复制元素；
+    之后各自追加的元素写入自己的私有列表。共享段中的元素永不修改，
+    修改最后一个元素（set_last）时若它位于共享段，则先把它复制到私有列表。
+    """
+
+    __slots__ = ('_segments', '_shared_len', '_items')
+
+    def __init__(self, items=None):
+        self._segments = ()  # 共享段 ((列表, 长度), ...)
+        self._shared_len = 0
+        self._items = list(items) if items is not None else []
+
+    @classmethod
+    def over(cls, shared, items=None):
+        """以只读序列 shared 作为共享段构建列表（例如按需读取的历史文件记录），之后追加的元素写入私有列表"""
+        cow = cls(items)
+        if len(shared):
+            cow._segments = ((shared, len(shared)),)
+            cow._shared_len = len(shared)
+        return cow
+
+    def __len__(self):
+        return self._shared_len + len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('CowList index out of range')
+        if index >= self._shared_len:
+            return self._items[index - self._shared_len]
+        for items, length in self._segments:
+            if index < length:
+                return items[index]
+            index -= length
+
+    def __iter__(self):
+        for items, length in self._segments:
+            for i in range(length):
+                yield items[i]
+        yield from self._items
+
+    def append(self, item):
+        self._items.append(item)
+
+    def extend(self, items):
+        self._items.extend(items)
+
+    def set_last(self, item):
+        """替换最后一个元素"""
+        if not self._items:
+            # 最后一个元素在共享段中：从共享段中去掉它，改为写入私有列表
+            *head, (items, length) = self._segments
+            self._segments = tuple(head) + (((items, length - 1),) if length > 1 else ())
+            self._shared_len -= 1
+        else:
+            self._items.pop()
+        self._items.append(item)
+
+    def fork(self):
+        """返回与当前列表内容相同的分叉，不复制任何元素"""
+        if self._items:
+            self._segments = self._segments + ((self._items, len(self._items)),)
+            self._shared_len += len(self._items)
+            self._items = []
+        child = CowList()
+        child._segments = self._segments
+        child._shared_len = self._shared_len
+        return child
+
+
+class SessionState:
+    """
+    一个模拟会话的全部可变状态
+
+    持仓和持仓成本是按场景基金列对齐的数组；净值历史和用户行为记录以紧凑元组保存在 CowList 中：
+        净值记录: (行, 现金, 持仓价值, 总资产)
+        用户行为: (行, 行为类型, 详情, 时间戳(秒), 操作后现金)
+    日期只保存行情矩阵的行号，需要时再转换为日期对象。
+    """
+
+    __slots__ = ('market', 'cash', 'shares', 'cost', 'current_date_index', 'is_simulation_over',
+                 'history', 'actions', 'tracker')
+
+    def __init__(self, market, cash, current_date_index, tracker):
+        self.market = market
+        self.cash = cash
+        self.shares = np.zeros(len(market.fund_codes))
+        self.cost = np.zeros(len(market.fund_codes))
+        self.current_date_index = current_date_index
+        self.is_simulation_over = False
+        self.history = CowList()
+        self.actions = CowList()
+        self.tracker = tracker
+
+    def fork(self):
+        """在当前交易日分叉出一个独立的会话状态；行情数据与已有的历史记录均与原会话共享"""
+        child = SessionState.__new__(SessionState)
+        child.market = self.market
+        child.cash = self.cash
+        child.shares = self.shares.copy()
+        child.cost = self.cost.copy()
+        child.current_date_index = self.current_date_index
+        child.is_simulation_over = self.is_simulation_over
+        child.history = self.history.fork()
+        child.actions = self.actions.fork()
+        child.tracker = self.tracker.copy()
+        return child
+
+    @property
+    def holdings(self):
+        """持仓 {fund_code: shares}，只包含份额大于0的基金"""
+        fund_codes = self.market.fund_codes
+        return {fund_codes[col]: float(self.shares[col]) for col in np.flatnonzero(self.shares > 0)}
+
+    @property
+    def cost_basis(self):
+        """持仓成本 {fund_code: 买入金额}"""
+        fund_codes = self.market.fund_codes
+        return {fund_codes[col]: float(self.cost[col]) for col in np.flatnonzero(self.shares > 0)}
+
+    def set_holdings(self, holdings, cost_basis=None):
+        """按 {fund_code: shares} 设置持仓，不在场景中的基金会被忽略"""
+        self.shares[:] = 0.0
+        self.cost[:] = 0.0
+        for fund_code, shares in holdings.items():
+            col = self.market.fund_index.get(fund_code)
+            if col is not None and shares > 0:
+                self.shares[col] = shares
+                self.cost[col] = (cost_basis or {}).get(fund_code, 0.0)
+
+
+class HistoryView(Sequence):
+    """将净值历史的紧凑记录按需转换为 {'date', 'cash', 'holdings_value', 'total_assets'} 字典的只读视图"""
+
+    __slots__ = ('_state',)
+
+    def __init__(self, state):
+        self._state = state
+
+    def __len__(self):
+        return len(self._state.history)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._record(self._state.history[index])
+
+    def __iter__(self):
+        for record in self._state.history:
+            yield self._record(record)
+
+    def _record(self, record):
+        row, cash, holdings_value, total_assets = record
+        return {
+            'date': self._state.market.dates[row],
+            'cash': cash,
+            'holdings_value': holdings_value,
+            'total_assets': total_assets
+        }
+
+
+class ActionsView(Sequence):
+    """将用户行为的紧凑记录按需转换为 {'date', 'action_type', 'details', 'timestamp', 'cash_after'} 字典的只读视图"""
+
+    __slots__ = ('_state',)
+
+    def __init__(self, state):
+        self._state = state
+
+    def __len__(self):
+        return len(self._state.actions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._record(self._state.actions[index])
+
+    def __iter__(self):
+        for record in self._state.actions:
+            yield self._record(record)
+
+    def _record(self, record):
+        row, action_type, details, timestamp, cash_after = record
+        return {
+            'date': self._state.market.dates[row] if row is not None else None,
+            'action_type': action_type,
+            'details': details,
+            'timestamp': datetime.datetime.fromtimestamp(timestamp).isoformat(),
+            'cash_after': cash_after,
+        }
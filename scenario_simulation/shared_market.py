@@ -0,0 +1,114 @@
+import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from market_data import MarketData
+
+# 需要放入共享内存的行情矩阵；布尔掩码放在最后，使前面的 float64 矩阵保持8字节对齐
+SHARED_FIELDS = ['nav', 'fund_change', 'index_close', 'index_change', 'fund_valid']
+
+
+class SharedMarketData:
+    """
+    将场景行情矩阵发布到一块共享内存中
+
+    由主进程创建一次，工作进程通过 handle 调用 attach_scene_data 零拷贝挂载，
+    各进程只读访问同一份物理内存，单个工作进程的常驻内存不随基金数量增长。
+    """
+
+    def __init__(self, scene_data):
+        """
+        Args:
+            scene_data: DataLoader.load_all_data() 返回的场景数据字典
+        """
+        market_data = scene_data['market_data']
+
+        layout = []
+        offset = 0
+        for field in SHARED_FIELDS:
+            array = getattr(market_data, field)
+            layout.append((field, offset, array.shape, array.dtype.str))
+            offset += array.nbytes
+
+        # 共享内存大小不能为0
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for field, start, shape, dtype in layout:
+            target = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=start)
+            target[...] = getattr(market_data, field)
+
+        simulation_start_date = scene_data.get('simulation_start_date')
+        self.handle = {
+            'shm_name': self._shm.name,
+            'layout': layout,
+            'dates': [d.toordinal() for d in market_data.dates],
+            'fund_codes': market_data.fund_codes,
+            'index_codes': market_data.index_codes,
+            'day_news': market_data.news,
+            'news_data': scene_data.get('news_data', []),
+            'description': scene_data.get('description', ''),
+            'simulation_start_date': simulation_start_date.toordinal() if simulation_start_date else None,
+        }
+
+    def close(self):
+        """关闭并释放共享内存，应在所有工作进程结束后由创建者调用"""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _open_shared_memory(name):
+    """挂载已存在的共享内存，挂载方不负责其生命周期"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前不支持 track 参数；由创建者派生的工作进程与创建者共用同一个
+        # resource_tracker，重复登记不会导致共享内存被提前删除
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach_scene_data(handle):
+    """
+    在工作进程中挂载共享的场景数据
+
+    Args:
+        handle: SharedMarketData.handle
+
+    Returns:
+        与 DataLoader.load_all_data() 结构相同的场景数据字典，行情矩阵为共享内存上的只读视图，
+        可直接传给 InvestmentSimulator(..., data=scene_data)
+    """
+    shm = _open_shared_memory(handle['shm_name'])
+
+    arrays = {}
+    for field, start, shape, dtype in handle['layout']:
+        array = np.ndarray(tuple(shape), dtype=dtype, buffer=shm.buf, offset=start)
+        array.flags.writeable = False
+        arrays[field] = array
+
+    market_data = MarketData(
+        dates=[datetime.date.fromordinal(d) for d in handle['dates']],
+        fund_codes=handle['fund_codes'],
+        index_codes=handle['index_codes'],
+        news=handle['day_news'],
+        **arrays,
+    )
+    # 行情矩阵引用共享内存缓冲区，需与其保持同样的生命周期
+    market_data.shared_memory = shm
+
+    start_date = handle['simulation_start_date']
+    return {
+        'funds_data': {},
+        'news_data': handle['news_data'],
+        'timeline': market_data.timeline,
+        'market_data': market_data,
+        'description': handle['description'],
+        'simulation_start_date': datetime.date.fromordinal(start_date) if start_date else None,
+    }
@@ -1,25 +1,61 @@
+import io
 import os
+import sys
+import json
+import time
 import argparse
 import datetime
+import contextlib
 from pathlib import Path
+from data_loader import DEFAULT_ALIGNMENT
 from investment_simulator import InvestmentSimulator
+from state_renderer import FUND_FILTERS, StateRenderer
+
+
+def _json_default(value):
+    """把日期、numpy 标量等转换为可JSON序列化的值"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
 
 class SimulationApp:
-    def __init__(self, scene_path, initial_capital=100000):
+    def __init__(self, scene_path, initial_capital=100000, resume_log=None, alignment=DEFAULT_ALIGNMENT,
+                 log_session=True):
         """
         初始化模拟器应用
         
         Args:
             scene_path: 场景数据目录路径
             initial_capital: 初始资金
+            resume_log: 要恢复的会话日志路径，不指定则开始新的会话日志
+            alignment: 交易日历对齐方式（strict/union/primary）
+            log_session: 是否把操作记录到会话日志（恢复会话时总会继续记录）
         """
         self.scene_path = Path(scene_path)
         # 创建保存目录
         self.save_dir = self.scene_path / "save"
         os.makedirs(self.save_dir, exist_ok=True)
         
-        self.simulator = InvestmentSimulator(scene_path, initial_capital)
+        self.simulator = InvestmentSimulator(scene_path, initial_capital, alignment=alignment)
         self.running = True
+        # 交互模式下危险操作需要确认；脚本模式（run_script）下不读取任何输入
+        self.interactive = True
+        # 当日状态的显示：基金列表的分页、筛选和搜索条件在命令之间保持
+        self.renderer = StateRenderer()
+        
+        # 每个操作都实时追加到会话日志，程序异常退出后可用 --resume 恢复
+        if resume_log:
+            result = self.simulator.resume_session(resume_log)
+            print(result['message'])
+            if not result['success']:
+                result = self.simulator.start_session_log()
+                print(result['message'])
+        elif log_session:
+            result = self.simulator.start_session_log()
+            print(result['message'])
         
     def start(self):
         """启动模拟器应用"""
@@ -37,6 +73,71 @@ class SimulationApp:
                 
             self._display_state(state)
             self._process_command()
+        
+        self.simulator.close_session_log()
+    
+    def run_script(self, lines, json_output=False, output=None):
+        """
+        非交互地依次执行命令脚本
+        
+        命令之间不渲染当日状态，也不等待确认；遇到 exit/quit 或模拟结束时不再执行后续命令，
+        最后输出投资表现总结。
+        
+        Args:
+            lines: 命令行的可迭代对象（如文件对象或字符串列表），空行和以 # 开头的行会被忽略
+            json_output: 为 True 时每条命令输出一行JSON结果（JSON Lines），最后一行为总结，
+                         命令本身打印的文本不输出
+            output: JSON结果的输出流，默认为标准输出
+        
+        Returns:
+            执行失败的命令数
+        """
+        output = output or sys.stdout
+        self.interactive = False
+        executed = failed = 0
+        command = None
+        for line_number, line in enumerate(lines, 1):
+            command = line.strip()
+            if not command or command.startswith('#'):
+                continue
+            if not self.running or self.simulator.is_simulation_over:
+                break
+            
+            start = time.perf_counter()
+            if json_output:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = self.execute_command(command)
+            else:
+                print(f"\n> {command}")
+                result = self.execute_command(command)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            
+            executed += 1
+            failed += not result.get('success', False)
+            if json_output:
+                print(json.dumps({
+                    'line': line_number,
+                    'command': command,
+                    'success': bool(result.get('success', False)),
+                    'elapsed_ms': round(elapsed_ms, 3),
+                    'result': result,
+                }, ensure_ascii=False, default=_json_default), file=output)
+        
+        if json_output:
+            summary = self.simulator.get_performance_summary()
+            print(json.dumps({
+                'summary': summary.get('summary'),
+                'commands': executed,
+                'failed': failed,
+                'simulation_ended': bool(self.simulator.is_simulation_over),
+            }, ensure_ascii=False, default=_json_default), file=output)
+        elif self.running:
+            # exit/quit 已经显示过总结
+            self._show_summary()
+        
+        self.running = False
+        self.simulator.close_session_log()
+        return failed
     
     def _print_welcome(self):
         """打印欢迎信息"""
@@ -61,113 +162,91 @@ class SimulationApp:
         input("按回车键开始模拟...")
     
     def _display_state(self, state):
-        """显示当前状态"""
-        print("\n" + "="*70)
-        print(f"当前日期: {state['date']}".center(60))
-        print("="*70)
-        
-        # 显示市场指数
-        if 'indices' in state and state['indices']:
-            print("\n市场指数:")
-            print("-"*70)
-            for name, data in state['indices'].items():
-                change_str = ""
-                if '涨跌幅' in data and data['涨跌幅'] != '暂无':
-                    change = float(data['涨跌幅'])
-                    change_color = '\033[92m' if change > 0 else '\033[91m' if change < 0 else ''
-                    change_str = f"{change_color}{change:+.2f}%\033[0m"
-                print(f"{name}: {data['收盘价']} {change_str}")
-        
-        # 显示新闻
-        if 'news' in state and state['news']:
-            print("\n今日新闻:")
-            print("-"*70)
-            for news in state['news']:
-                print(f"- {news}")
-        
-        # 显示用户资产
-        print("\n我的资产:")
-        print("-"*70)
-        print(f"现金: {state['cash']:,.2f} 元")
-        
-        if 'holdings' in state and state['holdings']:
-            print("\n持仓基金:")
-            print("{:<10} {:<15} {:<15} {:<15} {:<15}".format("基金代码", "持有份额", "单位净值", "持仓价值", "日涨跌幅"))
-            print("-"*70)
-            for holding in state['holdings']:
-                change_color = ''
-                if holding.get('change_pct', 0) > 0:
-                    change_color = '\033[92m'  # 绿色
-                elif holding.get('change_pct', 0) < 0:
-                    change_color = '\033[91m'  # 红色
-                    
-                change_str = f"{change_color}{holding.get('change_pct', 0):+.2f}%\033[0m"
-                print("{:<10} {:<15.2f} {:<15.4f} {:<15,.2f} {:<15}".format(
-                    holding['fund_code'], 
-                    holding['shares'], 
-                    holding['nav'], 
-                    holding['value'],
-                    change_str
-                ))
-        
-        print(f"\n总资产: {state['total_assets']:,.2f} 元")
-        print(f"收益率: {(state['total_assets'] - self.simulator.initial_capital) / self.simulator.initial_capital * 100:+.2f}%")
-        
-        # 显示可交易基金
-        if 'funds' in state and state['funds']:
-            print("\n可交易基金:")
-            print("{:<10} {:<15} {:<15}".format("基金代码", "单位净值", "日涨跌幅"))
-            print("-"*70)
-            for code, data in state['funds'].items():
-                change_str = ""
-                if '涨跌幅' in data and data['涨跌幅'] != '暂无':
-                    change = float(data['涨跌幅'])
-                    change_color = '\033[92m' if change > 0 else '\033[91m' if change < 0 else ''
-                    change_str = f"{change_color}{change:+.2f}%\033[0m"
-                print("{:<10} {:<15} {:<15}".format(code, data['净值'], change_str))
-        
-        print("="*70)
+        """显示当前状态（整屏一次写出）"""
+        sys.stdout.write(self.renderer.render(state, self.simulator.initial_capital))
+        sys.stdout.flush()
     
     def _process_command(self):
-        """处理用户命令"""
-        command = input("\n请输入命令: ").strip().lower()
+        """读取并处理一条用户命令"""
+        self.execute_command(input("\n请输入命令: "))
+    
+    def _fail(self, message):
+        """打印错误提示并返回失败结果"""
+        print(message)
+        return {'success': False, 'message': message}
+    
+    def execute_command(self, command):
+        """
+        执行一条命令并打印结果
+        
+        Args:
+            command: 命令字符串（与交互模式输入的命令相同）
+        
+        Returns:
+            命令的结果字典（至少包含 success），查询类命令为模拟器返回的完整数据
+        """
+        command = command.strip().lower()
         
         if command == 'exit' or command == 'quit':
-            self._show_summary()
+            result = self._show_summary()
             self.running = False
-            return
+            return result
         
         if command == 'help':
             self._show_help()
-            return
+            return {'success': True}
         
         if command == 'next' or command == 'n':
             result = self.simulator.next_day()
             print(result['message'])
-            return
+            return result
+        
+        # 一次推进多个交易日
+        if command.startswith('next ') or command.startswith('n '):
+            parts = command.split()
+            if len(parts) != 2 or not parts[1].isdigit():
+                return self._fail("格式错误。正确格式: next 天数")
+            result = self.simulator.advance(int(parts[1]))
+            print(result['message'])
+            return result
+        
+        if command.startswith('goto '):
+            parts = command.split()
+            if len(parts) != 2:
+                return self._fail("格式错误。正确格式: goto YYYY-MM-DD")
+            result = self.simulator.advance_to(parts[1])
+            print(result['message'])
+            return result
+        
+        if command.startswith('until '):
+            return self._run_until(command.split()[1:])
+        
+        if command.startswith('search '):
+            parts = command.split(maxsplit=2)
+            if len(parts) < 3 or parts[1] != 'news':
+                return self._fail("格式错误。正确格式: search news 关键词")
+            return self._search_news(parts[2])
         
         if command.startswith('buy '):
             try:
                 parts = command.split()
                 if len(parts) != 3:
-                    print("格式错误。正确格式: buy 基金代码 金额")
-                    return
+                    return self._fail("格式错误。正确格式: buy 基金代码 金额")
                     
                 fund_code = parts[1]
                 amount = float(parts[2])
                 
                 result = self.simulator.buy_fund(fund_code, amount)
                 print(result['message'])
+                return result
             except ValueError:
-                print("金额必须是有效的数字")
-            return
+                return self._fail("金额必须是有效的数字")
         
         if command.startswith('sell '):
             try:
                 parts = command.split()
                 if len(parts) != 3:
-                    print("格式错误。正确格式: sell 基金代码 份额/百分比")
-                    return
+                    return self._fail("格式错误。正确格式: sell 基金代码 份额/百分比")
                     
                 fund_code = parts[1]
                 value = parts[2]
@@ -181,9 +260,24 @@ class SimulationApp:
                     result = self.simulator.sell_fund(fund_code, shares=shares)
                 
                 print(result['message'])
+                return result
             except ValueError:
-                print("份额/百分比必须是有效的数字")
-            return
+                return self._fail("份额/百分比必须是有效的数字")
+        
+        if command.startswith('rebalance '):
+            weights = {}
+            try:
+                for item in command.split()[1:]:
+                    fund_code, weight = item.split('=')
+                    weights[fund_code] = float(weight.rstrip('%')) / 100
+            except ValueError:
+                return self._fail("格式错误。正确格式: rebalance 基金代码=权重% ...，例如 rebalance 000011=30% 162201=20%")
+            result = self.simulator.rebalance_to(weights)
+            print(result['message'])
+            for fill in result.get('fills', []):
+                action = '卖出' if fill['action_type'] == 'sell' else '买入'
+                print(f"  {action} {fill['fund_code']}: {fill['shares']:.2f}份，金额{fill['amount']:.2f}元")
+            return result
         
         # 查看指定日期的基金数据
         if command.startswith('check '):
@@ -196,7 +290,7 @@ class SimulationApp:
                     self._display_market_data(result['data'])
                 else:
                     print(result['message'])
-                return
+                return result
                 
             if len(parts) >= 2:
                 fund_code = parts[1].strip()
@@ -209,24 +303,27 @@ class SimulationApp:
                         self._display_fund_data(result['data'], fund_code)
                     else:
                         print(result['message'])
-                    return
+                    return result
                 
                 # 检查是否查询历史
                 if len(parts) >= 3 and parts[2] == 'history':
                     days = 30  # 默认显示30天
+                    freq = 'D'
                     
                     if len(parts) >= 4:
                         try:
                             days = int(parts[3])
                         except ValueError:
                             print(f"天数格式错误: {parts[3]}，使用默认值30")
+                    if len(parts) >= 5:
+                        freq = parts[4].upper()
                     
-                    result = self.simulator.get_fund_history(fund_code, days=days)
+                    result = self.simulator.get_fund_history(fund_code, days=days, freq=freq)
                     if result['success']:
                         self._display_fund_history(result)
                     else:
                         print(result['message'])
-                    return
+                    return result
                 
                 # 默认查看当前日期的数据
                 result = self.simulator.get_data_by_date(fund_code=fund_code)
@@ -234,59 +331,66 @@ class SimulationApp:
                     self._display_fund_data(result['data'], fund_code)
                 else:
                     print(result['message'])
-                return
+                return result
         
         # 查看前几天的数据
         if command.startswith('history '):
             parts = command.split()
             
-            if len(parts) >= 2:
-                try:
-                    days_ago = int(parts[1])
-                    
-                    # 如果指定了基金代码
-                    fund_code = None
-                    if len(parts) >= 3:
-                        fund_code = parts[2]
-                    
-                    result = self.simulator.get_data_by_date(days_ago=days_ago, fund_code=fund_code)
-                    if result['success']:
-                        self._display_market_data(result['data'])
-                    else:
-                        print(result['message'])
-                except ValueError:
-                    print(f"天数格式错误: {parts[1]}")
-            return
+            try:
+                days_ago = int(parts[1])
+            except ValueError:
+                return self._fail(f"天数格式错误: {parts[1]}")
+            
+            # 如果指定了基金代码
+            fund_code = None
+            if len(parts) >= 3:
+                fund_code = parts[2]
+            
+            result = self.simulator.get_data_by_date(days_ago=days_ago, fund_code=fund_code)
+            if result['success']:
+                self._display_market_data(result['data'])
+            else:
+                print(result['message'])
+            return result
+        
+        if command == 'funds' or command.startswith('funds '):
+            return self._set_fund_view(command.split()[1:])
+        
+        if command.startswith('page '):
+            return self._set_page(command.split()[1:])
         
         if command == 'export':
             result = self.simulator.export_actions()
             print(result['message'])
-            return
+            return result
         
         if command == 'summary':
-            self._show_summary()
-            return
+            return self._show_summary()
         
         if command == 'reset':
-            confirm = input("确定要重置模拟吗? (y/n): ").strip().lower()
-            if confirm == 'y':
-                self.simulator.reset_simulation()
-                print("模拟已重置到初始状态")
-            return
+            # 脚本模式下命令本身即为确认
+            if self.interactive:
+                confirm = input("确定要重置模拟吗? (y/n): ").strip().lower()
+                if confirm != 'y':
+                    return {'success': False, 'message': '已取消重置'}
+            self.simulator.reset_simulation()
+            print("模拟已重置到初始状态")
+            return {'success': True, 'message': '模拟已重置到初始状态'}
         
         # 新增命令：导入历史记录
         if command == 'import' or command.startswith('import '):
             parts = command.split(maxsplit=1)
             if len(parts) == 1:
+                if not self.interactive:
+                    return self._fail("脚本模式下必须指定文件路径。正确格式: import 文件路径")
                 # 显示导入对话框
-                self._show_import_dialog()
-            else:
-                # 直接导入指定文件
-                file_path = parts[1].strip()
-                self._import_history(file_path)
-            return
+                return self._show_import_dialog()
+            # 直接导入指定文件
+            file_path = parts[1].strip()
+            return self._import_history(file_path)
         
-        print("无效命令。输入 'help' 查看帮助。")
+        return self._fail("无效命令。输入 'help' 查看帮助。")
     
     def _display_market_data(self, data):
         """显示市场数据"""
@@ -383,10 +487,13 @@ class SimulationApp:
         print(f"时间范围: {result['start_date']} 至 {result['end_date']}".center(60))
         if result['total_return'] is not None:
             print(f"期间总收益率: {result['total_return']:+.2f}%".center(60))
+        if result.get('volatility') is not None:
+            print(f"年化波动率: {result['volatility']:.2f}%  最大回撤: {result['max_drawdown']:.2f}%".center(60))
         print("="*70)
         
         # 创建表格并显示历史数据
-        print("{:<12} {:<15} {:<15}".format("日期", "净值/收盘价", "日涨跌幅"))
+        change_label = {'W': "周涨跌幅", 'M': "月涨跌幅"}.get(result.get('frequency'), "日涨跌幅")
+        print("{:<12} {:<15} {:<15}".format("日期", "净值/收盘价", change_label))
         print("-"*70)
         
         # 判断是否为指数
@@ -414,20 +521,101 @@ class SimulationApp:
         
         print("="*70)
     
+    def _run_until(self, args):
+        """处理 until 命令：推进到有新闻或收益率达到阈值的交易日"""
+        if args == ['news']:
+            market = self.simulator.market
+            result = self.simulator.run_until(lambda day: bool(market.news[day['row']]))
+        elif len(args) == 2 and args[0] == 'return':
+            try:
+                threshold = float(args[1].rstrip('%'))
+            except ValueError:
+                return self._fail("收益率阈值必须是有效的数字")
+            # 阈值为负时等待收益率跌破阈值，否则等待收益率升至阈值
+            if threshold < 0:
+                result = self.simulator.run_until(lambda day: day['return_pct'] <= threshold)
+            else:
+                result = self.simulator.run_until(lambda day: day['return_pct'] >= threshold)
+        else:
+            return self._fail("格式错误。正确格式: until news 或 until return 收益率%")
+        
+        print(result['message'])
+        if result['success'] and not result.get('matched') and not result.get('simulation_ended'):
+            print("条件未满足，已推进到最后一个交易日")
+        return result
+    
+    def _set_fund_view(self, args):
+        """设置当日状态中基金列表的筛选方式、代码搜索或每页行数"""
+        renderer = self.renderer
+        if not args:
+            message = (f"基金列表: {FUND_FILTERS[renderer.fund_filter]}"
+                       + (f"，代码包含 {renderer.search}" if renderer.search else '')
+                       + f"，每页 {renderer.page_size} 行")
+        elif args[0] in FUND_FILTERS and len(args) == 1:
+            renderer.set_filter(args[0])
+            message = f"基金列表: {FUND_FILTERS[args[0]]}"
+        elif args[0] == 'find' and len(args) <= 2:
+            renderer.set_search(args[1] if len(args) == 2 else None)
+            message = f"基金列表: 代码包含 {args[1]}" if len(args) == 2 else "已取消基金代码搜索"
+        elif args[0] == 'rows' and len(args) == 2 and args[1].isdigit() and int(args[1]) > 0:
+            renderer.set_page_size(int(args[1]))
+            message = f"基金列表每页 {args[1]} 行"
+        else:
+            return self._fail(f"格式错误。正确格式: funds {'|'.join(FUND_FILTERS)}、funds find [代码] 或 funds rows 行数")
+        print(message)
+        return {'success': True, 'message': message}
+    
+    def _set_page(self, args):
+        """翻到基金列表的指定页"""
+        if len(args) != 1:
+            return self._fail("格式错误。正确格式: page 页码|next|prev")
+        if args[0] == 'next':
+            page = self.renderer.page + 1
+        elif args[0] == 'prev':
+            page = self.renderer.page - 1
+        elif args[0].isdigit():
+            page = int(args[0])
+        else:
+            return self._fail("格式错误。正确格式: page 页码|next|prev")
+        self.renderer.set_page(page)
+        return {'success': True, 'message': f"基金列表第 {self.renderer.page} 页"}
+    
+    def _search_news(self, keywords):
+        """搜索截至当前日期的新闻并显示"""
+        result = self.simulator.search_news(keywords)
+        if not result['success']:
+            print(result['message'])
+            return result
+        
+        print(f"\n找到 {result['total']} 条相关新闻" + (f"，显示最近 {len(result['results'])} 条" if result['total'] > len(result['results']) else ""))
+        for item in result['results']:
+            print(f"{item['date']}  {item['content']}")
+        return result
+    
     def _show_help(self):
         """显示帮助信息"""
         print("\n可用命令:")
         print("-"*70)
         print("help       - 显示帮助信息")
         print("next (n)   - 进入下一个交易日")
+        print("next 天数  - 一次推进多个交易日")
+        print("goto YYYY-MM-DD  - 推进到指定日期")
+        print("until news  - 推进到下一个有新闻的交易日")
+        print("until return 收益率%  - 推进到总收益率达到（负数时跌破）阈值的交易日")
         print("buy 基金代码 金额  - 购买基金")
         print("sell 基金代码 份额  - 卖出指定份额的基金")
         print("sell 基金代码 百分比% - 卖出指定百分比的基金")
+        print("rebalance 基金代码=权重% ...  - 按目标权重调仓，未列出的持仓全部卖出，其余为现金")
         print("check market  - 查看当前市场状况")
         print("check 基金代码  - 查看指定基金当前数据")
         print("check 基金代码 YYYY-MM-DD  - 查看指定日期的基金数据")
-        print("check 基金代码 history [天数]  - 查看基金历史数据（默认30天）")
+        print("check 基金代码 history [天数] [W|M]  - 查看基金历史数据（默认30天，W/M 按周/月汇总）")
         print("history 天数 [基金代码]  - 查看N天前的市场或基金数据")
+        print("search news 关键词  - 搜索截至当前日期的新闻（多个关键词用空格分隔）")
+        print("funds all|held|movers|changed  - 基金列表显示全部/只看持仓/涨跌幅最大/与上一显示日相比有变化的基金")
+        print("funds find [代码]  - 只显示代码包含指定字符的基金，不带代码时取消")
+        print("funds rows 行数  - 设置基金列表每页行数")
+        print("page 页码|next|prev  - 基金列表翻页")
         print("summary    - 显示投资表现总结")
         print("export     - 导出用户行为记录")
         print("reset      - 重置模拟")
@@ -442,7 +630,7 @@ class SimulationApp:
         
         if not result['success']:
             print(result['message'])
-            return
+            return result
         
         summary = result['summary']
         
@@ -455,17 +643,29 @@ class SimulationApp:
         print(f"市场收益率(上证指数): {summary['market_return']:+.2f}%")
         print(f"超额收益: {summary['outperformance']:+.2f}%")
         print(f"最大回撤: {summary['max_drawdown']:.2f}%")
+        if summary.get('volatility') is not None:
+            print(f"年化波动率: {summary['volatility']:.2f}%")
+        if summary.get('sharpe_ratio') is not None:
+            print(f"夏普比率: {summary['sharpe_ratio']:.2f}")
+        beta = summary.get('beta') or {}
+        for index_code, name in [('sh_index', '上证指数'), ('dj_index', '道琼斯指数')]:
+            if beta.get(index_code) is not None:
+                print(f"Beta({name}): {beta[index_code]:.2f}")
+        if summary.get('win_rate') is not None:
+            print(f"胜率(盈利卖出占比): {summary['win_rate']:.2f}%")
         print(f"交易次数: {summary['trade_count']['total']} (买入: {summary['trade_count']['buy']}, 卖出: {summary['trade_count']['sell']})")
         print(f"模拟天数: {summary['simulation_days']} 天")
         print("="*70)
         
-        # 导出结果
+        # 导出结果（脚本模式下用 export 命令显式导出）
+        if not self.interactive:
+            return result
         export = input("\n是否导出投资记录? (y/n): ").strip().lower()
         if export == 'y':
             # 指定保存到save目录
             output_file = self.save_dir / f"investment_summary_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            result = self.simulator.export_actions(output_file)
-            print(result['message'])
+            print(self.simulator.export_actions(output_file)['message'])
+        return result
     
     def _show_import_dialog(self):
         """显示导入历史记录对话框"""
@@ -473,8 +673,7 @@ class SimulationApp:
         json_files = list(self.save_dir.glob('*.json'))
         
         if not json_files:
-            print("没有找到可导入的历史记录文件")
-            return
+            return self._fail("没有找到可导入的历史记录文件")
             
         print("\n可导入的历史记录文件:")
         print("-"*70)
@@ -488,30 +687,29 @@ class SimulationApp:
         choice = input("选择: ").strip()
         
         if choice.lower() == 'q':
-            return
+            return {'success': False, 'message': '已取消导入'}
             
         # 处理用户输入
         try:
             choice_num = int(choice)
-            if 1 <= choice_num <= len(json_files):
-                file_path = json_files[choice_num - 1]
-                self._import_history(str(file_path))
-            else:
-                print(f"无效的选项: {choice_num}，有效范围是1-{len(json_files)}")
         except ValueError:
             # 如果不是数字，当作文件路径处理
-            self._import_history(choice)
+            return self._import_history(choice)
+        if 1 <= choice_num <= len(json_files):
+            file_path = json_files[choice_num - 1]
+            return self._import_history(str(file_path))
+        return self._fail(f"无效的选项: {choice_num}，有效范围是1-{len(json_files)}")
 
     def _import_history(self, file_path):
         """导入历史记录"""
         # 确认操作
         print(f"\n即将导入历史记录: {file_path}")
         print("注意: 导入后将覆盖当前的投资状态，此操作不可撤销")
-        confirm = input("确定要继续吗? (y/n): ").strip().lower()
-        
-        if confirm != 'y':
-            print("已取消导入")
-            return
+        # 脚本模式下命令本身即为确认
+        if self.interactive:
+            confirm = input("确定要继续吗? (y/n): ").strip().lower()
+            if confirm != 'y':
+                return self._fail("已取消导入")
         
         # 执行导入
         result = self.simulator.import_history(file_path)
@@ -531,6 +729,7 @@ class SimulationApp:
             print("="*70)
         else:
             print(f"\n导入失败: {result['message']}")
+        return result
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="2008金融危机基金投资模拟系统")
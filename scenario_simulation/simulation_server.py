@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+import os
+import json
+import math
+import time
+import uuid
+import asyncio
+import argparse
+from pathlib import Path
+
+from aiohttp import web
+
+from data_loader import DataLoader
+from investment_simulator import InvestmentSimulator
+from scenes import SCENES, DEFAULT_SCENE, list_scenes
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _json(data, status=200):
+    return web.json_response(data, status=status, dumps=_dumps)
+
+
+def _number(value):
+    """把请求中的数值转换为 float；NaN 和正负无穷会污染会话状态，与非数字一样抛出 ValueError"""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"不是有限的数字: {value}")
+    return value
+
+
+class SceneStore:
+    """
+    场景数据仓库
+
+    每个场景的行情数据只加载一次，所有会话共享同一份只读的 MarketData；
+    首次请求某场景时在线程池中加载，并发的首次请求只会触发一次加载。
+    """
+
+    def __init__(self, scene_path):
+        self.scene_path = Path(scene_path)
+        self._data = {}
+        self._loading = {}
+
+    async def get(self, scene_id):
+        if scene_id in self._data:
+            return self._data[scene_id]
+        if scene_id not in self._loading:
+            loader = DataLoader(self.scene_path, scene_id)
+            self._loading[scene_id] = asyncio.get_running_loop().run_in_executor(None, loader.load_all_data)
+        try:
+            data = await self._loading[scene_id]
+        finally:
+            self._loading.pop(scene_id, None)
+        self._data[scene_id] = data
+        return data
+
+
+class Session:
+    """一个用户会话：模拟器实例及最后访问时间，行情数据引用 SceneStore 中的共享对象"""
+
+    __slots__ = ('session_id', 'scene_id', 'simulator', 'last_access')
+
+    def __init__(self, session_id, scene_id, simulator):
+        self.session_id = session_id
+        self.scene_id = scene_id
+        self.simulator = simulator
+        self.last_access = time.monotonic()
+
+
+class SimulationServer:
+    """
+    多会话投资模拟HTTP服务
+
+    模拟器的每个操作都是亚毫秒级的内存计算，直接在事件循环中执行，
+    单个会话内的请求按到达顺序依次处理。
+    """
+
+    def __init__(self, scene_path, max_sessions=1000, session_ttl=3600):
+        """
+        Args:
+            scene_path: 场景数据目录路径（会话的save目录位于其下）
+            max_sessions: 最大同时在线会话数
+            session_ttl: 会话空闲多少秒后被清理
+        """
+        self.scene_path = Path(scene_path)
+        self.scenes = SceneStore(scene_path)
+        self.sessions = {}
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.request_count = 0
+        self.started_at = time.monotonic()
+
+    def create_app(self):
+        app = web.Application(middlewares=[self._count_requests])
+        app.add_routes([
+            web.get('/scenes', self.handle_scenes),
+            web.get('/stats', self.handle_stats),
+            web.post('/sessions', self.handle_create),
+            web.delete('/sessions/{session_id}', self.handle_delete),
+            web.get('/sessions/{session_id}/state', self.handle_state),
+            web.post('/sessions/{session_id}/buy', self.handle_buy),
+            web.post('/sessions/{session_id}/sell', self.handle_sell),
+            web.post('/sessions/{session_id}/orders', self.handle_orders),
+            web.post('/sessions/{session_id}/rebalance', self.handle_rebalance),
+            web.post('/sessions/{session_id}/advance', self.handle_advance),
+            web.get('/sessions/{session_id}/history', self.handle_history),
+            web.get('/sessions/{session_id}/summary', self.handle_summary),
+            web.get('/sessions/{session_id}/news', self.handle_news),
+        ])
+        app.on_startup.append(self._start_cleanup)
+        app.on_cleanup.append(self._stop_cleanup)
+        return app
+
+    @web.middleware
+    async def _count_requests(self, request, handler):
+        self.request_count += 1
+        return await handler(request)
+
+    async def _start_cleanup(self, app):
+        app['cleanup_task'] = asyncio.create_task(self._expire_sessions())
+
+    async def _stop_cleanup(self, app):
+        app['cleanup_task'].cancel()
+
+    async def _expire_sessions(self):
+        """定期清理空闲超时的会话"""
+        while True:
+            await asyncio.sleep(min(self.session_ttl, 60))
+            deadline = time.monotonic() - self.session_ttl
+            for session_id in [sid for sid, s in self.sessions.items() if s.last_access < deadline]:
+                del self.sessions[session_id]
+
+    def _get_session(self, request):
+        session = self.sessions.get(request.match_info['session_id'])
+        if session is None:
+            raise web.HTTPNotFound(
+                text=_dumps({'success': False, 'message': '会话不存在或已过期'}),
+                content_type='application/json'
+            )
+        session.last_access = time.monotonic()
+        return session
+
+    async def _read_json(self, request):
+        if not request.can_read_body:
+            return {}
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(
+                text=_dumps({'success': False, 'message': '请求体必须是JSON'}),
+                content_type='application/json'
+            )
+        return body if isinstance(body, dict) else {}
+
+    async def handle_scenes(self, request):
+        return _json({'success': True, 'scenes': list_scenes()})
+
+    async def handle_stats(self, request):
+        return _json({
+            'success': True,
+            'sessions': len(self.sessions),
+            'requests': self.request_count,
+            'uptime': time.monotonic() - self.started_at,
+            'cpu_time': time.process_time(),
+            'cpu_count': os.cpu_count(),
+        })
+
+    async def handle_create(self, request):
+        body = await self._read_json(request)
+        scene_id = str(body.get('scene', DEFAULT_SCENE))
+        if scene_id not in SCENES:
+            return _json({'success': False, 'message': f'未知的场景: {scene_id}'}, status=400)
+        scene = next(s for s in list_scenes() if s['scene_id'] == scene_id)
+        if not scene['available']:
+            return _json({'success': False, 'message': f"场景 {scene['name']} 不可用: {scene['message']}"}, status=400)
+        if len(self.sessions) >= self.max_sessions:
+            return _json({'success': False, 'message': '在线会话数已达上限'}, status=503)
+
+        try:
+            initial_capital = _number(body.get('initial_capital', 100000))
+        except (TypeError, ValueError):
+            return _json({'success': False, 'message': '初始资金必须是有效的数字'}, status=400)
+        if initial_capital <= 0:
+            return _json({'success': False, 'message': '初始资金必须大于0'}, status=400)
+
+        data = await self.scenes.get(scene_id)
+        simulator = InvestmentSimulator(self.scene_path, initial_capital, data=data, scene_id=scene_id)
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = Session(session_id, scene_id, simulator)
+        return _json({
+            'success': True,
+            'session_id': session_id,
+            'scene': scene_id,
+            'state': simulator.get_current_state()
+        })
+
+    async def handle_delete(self, request):
+        session = self._get_session(request)
+        del self.sessions[session.session_id]
+        return _json({'success': True, 'message': '会话已关闭'})
+
+    async def handle_state(self, request):
+        """
+        当日状态：不带参数时为完整状态；指定 since（上次返回的 version）或 compact=1 时
+        使用版本化的增量状态，见 InvestmentSimulator.get_state_delta
+        """
+        session = self._get_session(request)
+        since = request.query.get('since')
+        compact = request.query.get('compact', '') in ('1', 'true')
+        if since is None and not compact:
+            return _json(session.simulator.get_current_state())
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return _json({'success': False, 'message': 'since 必须是整数版本号'}, status=400)
+        return _json(session.simulator.get_state_delta(since, compact=compact))
+
+    async def handle_buy(self, request):
+        session = self._get_session(request)
+        body = await self._read_json(request)
+        try:
+            amount = _number(body.get('amount'))
+        except (TypeError, ValueError):
+            return _json({'success': False, 'message': '金额必须是有效的数字'}, status=400)
+        return _json(session.simulator.buy_fund(str(body.get('fund_code', '')), amount))
+
+    async def handle_sell(self, request):
+        session = self._get_session(request)
+        body = await self._read_json(request)
+        try:
+            shares = _number(body['shares']) if body.get('shares') is not None else None
+            percentage = _number(body['percentage']) if body.get('percentage') is not None else None
+        except (TypeError, ValueError):
+            return _json({'success': False, 'message': '份额/比例必须是有效的数字'}, status=400)
+        return _json(session.simulator.sell_fund(str(body.get('fund_code', '')), shares=shares, percentage=percentage))
+
+    async def handle_orders(self, request):
+        """批量下单：body 为 {'orders': [...]}，格式见 InvestmentSimulator.execute_orders"""
+        session = self._get_session(request)
+        body = await self._read_json(request)
+        orders = body.get('orders')
+        if not isinstance(orders, list) or not all(isinstance(order, dict) for order in orders):
+            return _json({'success': False, 'message': 'orders 必须是订单对象列表'}, status=400)
+        for order in orders:
+            for key in ('amount', 'shares', 'percentage'):
+                if isinstance(order.get(key), float) and not math.isfinite(order[key]):
+                    return _json({'success': False, 'message': '订单中的金额/份额/比例必须是有限的数字'}, status=400)
+        try:
+            return _json(session.simulator.execute_orders(orders))
+        except TypeError:
+            return _json({'success': False, 'message': '订单中的金额/份额/比例必须是数字'}, status=400)
+
+    async def handle_rebalance(self, request):
+        """按目标权重调仓：body 为 {'weights': {基金代码: 权重}}"""
+        session = self._get_session(request)
+        body = await self._read_json(request)
+        try:
+            weights = {str(code): _number(weight) for code, weight in dict(body.get('weights') or {}).items()}
+        except (TypeError, ValueError):
+            return _json({'success': False, 'message': 'weights 必须是 {基金代码: 权重} 对象'}, status=400)
+        return _json(session.simulator.rebalance_to(weights))
+
+    async def handle_advance(self, request):
+        """推进交易日：body 中指定 date 时推进到该日期，否则推进 days 个交易日（默认1）"""
+        session = self._get_session(request)
+        body = await self._read_json(request)
+        if body.get('date'):
+            return _json(session.simulator.advance_to(str(body['date'])))
+        try:
+            days = _number(body.get('days', 1))
+        except (TypeError, ValueError):
+            return _json({'success': False, 'message': '推进天数必须是有效的数字'}, status=400)
+        if days != int(days) or days < 1:
+            return _json({'success': False, 'message': '推进天数必须是正整数'}, status=400)
+        return _json(session.simulator.advance(int(days)))
+
+    async def handle_history(self, request):
+        session = self._get_session(request)
+        fund_code = request.query.get('fund_code')
+        if not fund_code:
+            return _json({'success': False, 'message': '必须指定 fund_code'}, status=400)
+        try:
+            days = int(request.query.get('days', 30))
+        except ValueError:
+            return _json({'success': False, 'message': '天数必须是整数'}, status=400)
+        if days < 1:
+            return _json({'success': False, 'message': '天数必须大于0'}, status=400)
+        return _json(session.simulator.get_fund_history(
+            fund_code, days,
+            start_date=request.query.get('start'),
+            end_date=request.query.get('end'),
+            freq=request.query.get('freq', 'D'),
+        ))
+
+    async def handle_summary(self, request):
+        session = self._get_session(request)
+        return _json(session.simulator.get_performance_summary())
+
+    async def handle_news(self, request):
+        """搜索新闻：q 为关键词，默认只返回截至会话当前日期的新闻"""
+        session = self._get_session(request)
+        try:
+            limit = int(request.query.get('limit', 20))
+        except ValueError:
+            return _json({'success': False, 'message': 'limit 必须是整数'}, status=400)
+        if limit < 1:
+            return _json({'success': False, 'message': 'limit 必须大于0'}, status=400)
+        return _json(session.simulator.search_news(request.query.get('q', ''), limit=limit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多会话基金投资模拟服务")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8080, help="监听端口")
+    parser.add_argument('--max-sessions', type=int, default=1000, help="最大同时在线会话数")
+    parser.add_argument('--session-ttl', type=int, default=3600, help="会话空闲超时（秒）")
+    parser.add_argument('--preload', type=str, nargs='*', default=[DEFAULT_SCENE], help="启动时预加载的场景ID")
+    args = parser.parse_args()
+
+    server = SimulationServer(Path(__file__).parent, args.max_sessions, args.session_ttl)
+    app = server.create_app()
+
+    async def preload(app):
+        for scene in list_scenes():
+            if scene['scene_id'] not in args.preload:
+                continue
+            if scene['available']:
+                await server.scenes.get(scene['scene_id'])
+                print(f"已加载场景: {scene['name']}")
+            else:
+                print(f"场景 {scene['name']} 不可用: {scene['message']}")
+
+    app.on_startup.append(preload)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import math
+import heapq
+
+# 基金列表的筛选方式
+FUND_FILTERS = {
+    'all': '全部基金',
+    'held': '只看持仓',
+    'movers': '涨跌幅最大',
+    'changed': '只看有变化',
+}
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_NEWS_LIMIT = 10
+LINE_WIDTH = 70
+
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+
+def format_change(change, color=True):
+    """把涨跌幅格式化为带颜色的 +x.xx%，没有数据时返回空字符串"""
+    if change is None or change == '暂无':
+        return ''
+    try:
+        change = float(change)
+    except (ValueError, TypeError):
+        return str(change)
+    if math.isnan(change):
+        return ''
+    if not color:
+        return f"{change:+.2f}%"
+    change_color = GREEN if change > 0 else RED if change < 0 else ''
+    return f"{change_color}{change:+.2f}%{RESET}"
+
+
+def _has_change(change):
+    """涨跌幅是否为有效数字"""
+    return isinstance(change, (int, float)) and not math.isnan(change)
+
+
+class StateRenderer:
+    """
+    当日状态的缓冲渲染器
+
+    整屏内容先拼接为一个字符串，由调用方一次写出，避免逐行 print 的开销。基金列表支持分页、
+    筛选（全部 / 只看持仓 / 涨跌幅最大 / 只看有变化）和按代码搜索；"有变化"以上一个显示过的
+    交易日为基准：净值不同的基金，以及份额或净值不同的持仓。同一天内重复渲染（例如买入后刷新）
+    基准不变。
+    """
+
+    def __init__(self, page_size=DEFAULT_PAGE_SIZE, news_limit=DEFAULT_NEWS_LIMIT, color=True):
+        """
+        Args:
+            page_size: 基金列表每页行数
+            news_limit: 最多显示的新闻条数，None 表示不限制
+            color: 是否用 ANSI 颜色显示涨跌
+        """
+        if page_size < 1:
+            raise ValueError(f"每页行数必须为正整数: {page_size}")
+        self.page_size = page_size
+        self.news_limit = news_limit
+        self.color = color
+        self.fund_filter = 'all'
+        self.search = None
+        self.page = 1
+
+        # 上一个显示过的交易日的 (净值, 持仓份额)，以及当前交易日最近一次渲染时的快照
+        self._date = None
+        self._baseline = None
+        self._latest = None
+
+    def set_filter(self, fund_filter):
+        """切换基金列表的筛选方式并回到第一页"""
+        if fund_filter not in FUND_FILTERS:
+            raise ValueError(f"未知的筛选方式: {fund_filter}，可选: {', '.join(FUND_FILTERS)}")
+        self.fund_filter = fund_filter
+        self.page = 1
+
+    def set_search(self, code=None):
+        """只显示代码包含 code 的基金，code 为空时取消搜索"""
+        self.search = code or None
+        self.page = 1
+
+    def set_page_size(self, page_size):
+        """设置每页行数并回到第一页"""
+        if page_size < 1:
+            raise ValueError(f"每页行数必须为正整数: {page_size}")
+        self.page_size = page_size
+        self.page = 1
+
+    def set_page(self, page):
+        """跳转到指定页（超出范围时在渲染时截断到有效页）"""
+        self.page = max(1, page)
+
+    def _observe(self, state):
+        """更新"有变化"的比较基准：日期变化时，上次渲染的快照成为新的基准"""
+        if state['date'] != self._date:
+            self._baseline = self._latest
+            self._date = state['date']
+        self._latest = (
+            {code: data['净值'] for code, data in state.get('funds', {}).items()},
+            {holding['fund_code']: holding['shares'] for holding in state.get('holdings', [])},
+        )
+
+    def _fund_changed(self, code, data):
+        if self._baseline is None:
+            # 没有显示过的前一交易日时按当日涨跌幅判断
+            return _has_change(data.get('涨跌幅')) and data['涨跌幅'] != 0
+        return self._baseline[0].get(code) != data['净值']
+
+    def _holding_changed(self, holding):
+        if self._baseline is None:
+            return True
+        navs, shares = self._baseline
+        code = holding['fund_code']
+        return shares.get(code) != holding['shares'] or navs.get(code) != holding['nav']
+
+    def select_funds(self, state):
+        """
+        按当前筛选和搜索条件选出基金
+
+        Returns:
+            ([(基金代码, {'净值', '涨跌幅'}), ...], 符合条件的基金总数)，
+            涨跌幅最大时只按涨跌幅绝对值降序排出到当前页为止的行
+        """
+        items = (state.get('funds') or {}).items()
+        if self.search:
+            items = [(code, data) for code, data in items if self.search in code]
+
+        if self.fund_filter == 'held':
+            held = {holding['fund_code'] for holding in state.get('holdings', [])}
+            rows = [(code, data) for code, data in items if code in held]
+        elif self.fund_filter == 'changed':
+            rows = [(code, data) for code, data in items if self._fund_changed(code, data)]
+        elif self.fund_filter == 'movers':
+            movers = [(code, data) for code, data in items if _has_change(data.get('涨跌幅'))]
+            return heapq.nlargest(self.page * self.page_size, movers,
+                                  key=lambda item: abs(item[1]['涨跌幅'])), len(movers)
+        else:
+            rows = list(items)
+        return rows, len(rows)
+
+    def _page_of(self, rows, total):
+        """取当前页的行，返回 (行, 页码, 总页数)"""
+        pages = max(1, math.ceil(total / self.page_size))
+        self.page = min(self.page, pages)
+        start = (self.page - 1) * self.page_size
+        return rows[start:start + self.page_size], self.page, pages
+
+    def render(self, state, initial_capital):
+        """
+        渲染当日状态
+
+        Args:
+            state: InvestmentSimulator.get_current_state() 的返回值
+            initial_capital: 初始资金，用于计算收益率
+
+        Returns:
+            整屏文本（以换行结尾）
+        """
+        self._observe(state)
+        lines = []
+        add = lines.append
+
+        add("=" * LINE_WIDTH)
+        add(f"当前日期: {state['date']}".center(60))
+        add("=" * LINE_WIDTH)
+
+        # 市场指数
+        if state.get('indices'):
+            add("\n市场指数:")
+            add("-" * LINE_WIDTH)
+            for name, data in state['indices'].items():
+                add(f"{name}: {data['收盘价']} {format_change(data.get('涨跌幅'), self.color)}")
+
+        # 新闻
+        news = state.get('news') or []
+        if news:
+            add("\n今日新闻:")
+            add("-" * LINE_WIDTH)
+            shown = news if self.news_limit is None else news[:self.news_limit]
+            for item in shown:
+                add(f"- {item}")
+            if len(shown) < len(news):
+                add(f"（另有 {len(news) - len(shown)} 条新闻，使用 search news 关键词 查看）")
+
+        # 用户资产
+        add("\n我的资产:")
+        add("-" * LINE_WIDTH)
+        add(f"现金: {state['cash']:,.2f} 元")
+
+        holdings = state.get('holdings') or []
+        if self.fund_filter == 'changed':
+            shown_holdings = [holding for holding in holdings if self._holding_changed(holding)]
+        else:
+            shown_holdings = holdings
+        if shown_holdings:
+            add("\n持仓基金:")
+            add("{:<10} {:<15} {:<15} {:<15} {:<15}".format("基金代码", "持有份额", "单位净值", "持仓价值", "日涨跌幅"))
+            add("-" * LINE_WIDTH)
+            for holding in shown_holdings:
+                add("{:<10} {:<15.2f} {:<15.4f} {:<15,.2f} {:<15}".format(
+                    holding['fund_code'],
+                    holding['shares'],
+                    holding['nav'],
+                    holding['value'],
+                    format_change(holding.get('change_pct', 0), self.color)
+                ))
+        if len(shown_holdings) < len(holdings):
+            add(f"（{len(holdings) - len(shown_holdings)} 只持仓没有变化，未显示）")
+
+        add(f"\n总资产: {state['total_assets']:,.2f} 元")
+        add(f"收益率: {(state['total_assets'] - initial_capital) / initial_capital * 100:+.2f}%")
+
+        # 可交易基金
+        if state.get('funds'):
+            rows, total = self.select_funds(state)
+            page_rows, page, pages = self._page_of(rows, total)
+
+            title = FUND_FILTERS[self.fund_filter] + (f"，代码包含 {self.search}" if self.search else '')
+            add(f"\n可交易基金（{title}）:")
+            add("{:<10} {:<15} {:<15}".format("基金代码", "单位净值", "日涨跌幅"))
+            add("-" * LINE_WIDTH)
+            for code, data in page_rows:
+                add("{:<10} {:<15} {:<15}".format(code, data['净值'], format_change(data.get('涨跌幅'), self.color)))
+            if not page_rows:
+                add("（没有符合条件的基金）")
+            add(f"第 {page}/{pages} 页，共 {total} 只 —— page 页码|next|prev 翻页，funds 切换筛选")
+
+        add("=" * LINE_WIDTH)
+        return "\n" + "\n".join(lines) + "\n"
@@ -0,0 +1,278 @@
+import numpy as np
+import pandas as pd
+
+from data_loader import DataLoader
+from performance import max_drawdown
+from scenes import list_scenes
+from sweep import simulate_rules
+
+# 用于校准市场状态的历史危机场景
+CRISIS_SCENES = ('2008', '2015', '2020')
+# 滚动波动率窗口（交易日）
+REGIME_WINDOW = 20
+# 滚动波动率高于该分位数的交易日视为动荡状态
+STRESS_QUANTILE = 0.7
+# 结果分布中报告的分位数 (%)
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def regime_labels(index_close, window=REGIME_WINDOW, quantile=STRESS_QUANTILE):
+    """
+    按指数滚动波动率把交易日划分为平稳/动荡两种状态
+
+    Args:
+        index_close: 指数收盘价序列
+        window: 滚动波动率窗口
+        quantile: 滚动波动率高于该分位数的交易日为动荡状态
+
+    Returns:
+        (日对数收益率数组, 每个收益率所在交易日是否处于动荡状态的布尔数组)，长度均为交易日数-1
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(np.log(np.asarray(index_close, dtype=np.float64)))
+    returns = np.where(np.isfinite(returns), returns, 0.0)
+    vol = pd.Series(returns).rolling(window, min_periods=2).std().bfill().fillna(0.0).to_numpy()
+    return returns, vol > np.quantile(vol, quantile)
+
+
+def calibrate_regimes(scene_datas, window=REGIME_WINDOW, quantile=STRESS_QUANTILE, index_code='sh_index'):
+    """
+    用一个或多个场景的指数数据校准两状态的市场状态模型
+
+    各场景分别按自身的波动率分位数划分状态，再合并统计状态转移次数和动荡/平稳波动率之比。
+
+    Args:
+        scene_datas: DataLoader.load_all_data() 结果的列表
+
+    Returns:
+        {'window', 'quantile', 'index_code', 'transition': 2×2 日转移概率矩阵（0 平稳、1 动荡）,
+         'stress_ratio': 动荡与平稳状态日收益率标准差之比的平均值, 'scenes': 参与校准的场景数}
+    """
+    counts = np.zeros((2, 2))
+    ratios = []
+    for data in scene_datas:
+        market = data['market_data']
+        col = market.index_column.get(index_code)
+        if col is None or len(market) < window + 2:
+            continue
+        returns, stress = regime_labels(market.index_close[:, col], window, quantile)
+        np.add.at(counts, (stress[:-1].astype(int), stress[1:].astype(int)), 1)
+        calm_std, stress_std = returns[~stress].std(), returns[stress].std()
+        if calm_std > 0:
+            ratios.append(stress_std / calm_std)
+
+    if not counts.sum():
+        raise ValueError(f"没有可用于校准的场景（需要至少 {window + 2} 个交易日的 {index_code} 数据）")
+
+    # 加一平滑，避免样本中未出现的转移概率为0
+    transition = (counts + 1) / (counts + 1).sum(axis=1, keepdims=True)
+    return {
+        'window': window,
+        'quantile': quantile,
+        'index_code': index_code,
+        'transition': transition,
+        'stress_ratio': float(np.mean(ratios)) if ratios else 1.0,
+        'scenes': len(ratios),
+    }
+
+
+def load_crisis_scenes(scene_path, scene_ids=CRISIS_SCENES):
+    """加载可用的历史危机场景数据（缺少数据库的场景跳过），用于 calibrate_regimes"""
+    available = {scene['scene_id'] for scene in list_scenes() if scene['available']}
+    return [DataLoader(scene_path, scene_id).load_all_data() for scene_id in scene_ids if scene_id in available]
+
+
+class StressPathGenerator:
+    """
+    基于历史场景的蒙特卡洛压力路径生成器
+
+    生成方法：
+        1. 按校准的转移概率模拟每条路径的市场状态序列（以区块为单位，转移矩阵取 block_length 次幂）；
+        2. 区块自助法：每个区块从历史上同一状态的交易日开始随机抽取连续 block_length 天，
+           基金和指数的日收益率整行抽取，保留同一天各序列之间的相关性和区块内的波动聚集；
+        3. 状态冲击：动荡交易日的收益率围绕该状态均值按系数放大，使本场景动荡/平稳波动率之比
+           与校准场景的平均水平一致，再乘以 shock_scale 作为额外的压力强度。
+    所有路径一次性向量化生成，净值张量形状为 (路径数, 交易日数, 基金数)。
+    """
+
+    def __init__(self, scene_data, model=None, block_length=10, shock_scale=1.0):
+        """
+        Args:
+            scene_data: DataLoader.load_all_data() 或 attach_scene_data() 的返回值，作为抽样来源
+            model: calibrate_regimes() 的结果，None 表示只用本场景校准
+            block_length: 区块长度（交易日）
+            shock_scale: 动荡状态的额外波动放大系数，1 表示不额外放大
+        """
+        market = scene_data['market_data']
+        if len(market) < 3:
+            raise ValueError("场景交易日太少，无法生成模拟路径")
+        self.model = model if model is not None else calibrate_regimes([scene_data])
+        self.fund_codes = list(market.fund_codes)
+        self.index_codes = list(market.index_codes)
+
+        start_row = 0
+        if scene_data.get('simulation_start_date'):
+            start_row = market.row_on_or_after(scene_data['simulation_start_date']) or 0
+        values = np.hstack([market.nav, market.index_close])
+        self.start_values = values[start_row]
+        self.default_days = len(market) - start_row
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.diff(np.log(values), axis=0)
+        self.returns = np.where(np.isfinite(returns), returns, 0.0)
+
+        col = market.index_column.get(self.model['index_code'])
+        if col is None:
+            raise ValueError(f"场景中不存在指数: {self.model['index_code']}")
+        index_returns, self.stress = regime_labels(market.index_close[:, col], self.model['window'],
+                                                   self.model['quantile'])
+        calm_std, stress_std = index_returns[~self.stress].std(), index_returns[self.stress].std()
+        scene_ratio = stress_std / calm_std if calm_std > 0 else 0.0
+        self.stress_scale = shock_scale * (self.model['stress_ratio'] / scene_ratio if scene_ratio > 0 else 1.0)
+        self.regime_mean = np.vstack([
+            self.returns[~self.stress].mean(axis=0) if (~self.stress).any() else np.zeros(values.shape[1]),
+            self.returns[self.stress].mean(axis=0) if self.stress.any() else np.zeros(values.shape[1]),
+        ])
+
+        self.block_length = max(1, min(int(block_length), len(self.returns)))
+        # 区块首尾相接（循环区块自助法），每个历史交易日被抽中的概率相同；
+        # 各状态可作为区块起点的位置，某一状态没有起点时退回到全部位置
+        starts = np.arange(len(self.returns))
+        self.block_starts = [starts[~self.stress], starts[self.stress]]
+        self.block_starts = [pool if len(pool) else starts for pool in self.block_starts]
+
+    def _block_regimes(self, rng, n_paths, n_blocks):
+        """模拟每条路径各区块的市场状态（0 平稳、1 动荡）"""
+        transition = np.linalg.matrix_power(self.model['transition'], self.block_length)
+        # 初始状态取日转移矩阵的平稳分布
+        p_stress = self.model['transition'][0, 1] / (self.model['transition'][0, 1] + self.model['transition'][1, 0])
+        regimes = np.empty((n_paths, n_blocks), dtype=np.int8)
+        regimes[:, 0] = rng.random(n_paths) < p_stress
+        for b in range(1, n_blocks):
+            stay = rng.random(n_paths) < transition[regimes[:, b - 1], regimes[:, b - 1]]
+            regimes[:, b] = np.where(stay, regimes[:, b - 1], 1 - regimes[:, b - 1])
+        return regimes
+
+    def generate(self, n_paths=1000, n_days=None, seed=None):
+        """
+        生成模拟路径
+
+        Args:
+            n_paths: 路径数量
+            n_days: 每条路径的交易日数（含起始日），默认与场景从模拟开始日起的长度相同
+            seed: 随机种子
+
+        Returns:
+            {'fund_codes', 'index_codes',
+             'nav': (路径数, 交易日数, 基金数) 净值张量,
+             'index_close': (路径数, 交易日数, 指数数) 指数点位张量,
+             'stress': (路径数, 交易日数-1) 每个模拟交易日是否处于动荡状态}
+            每条路径第0天为场景模拟开始日的真实净值和点位
+        """
+        n_days = self.default_days if n_days is None else int(n_days)
+        if n_paths < 1 or n_days < 2:
+            raise ValueError("路径数至少为1，交易日数至少为2")
+        rng = np.random.default_rng(seed)
+        n_steps = n_days - 1
+        length = self.block_length
+        n_blocks = -(-n_steps // length)
+
+        regimes = self._block_regimes(rng, n_paths, n_blocks)
+        starts = np.empty((n_paths, n_blocks), dtype=np.int64)
+        for regime, pool in enumerate(self.block_starts):
+            chosen = pool[rng.integers(len(pool), size=(n_paths, n_blocks))]
+            starts = np.where(regimes == regime, chosen, starts)
+        rows = ((starts[:, :, None] + np.arange(length)) % len(self.returns)).reshape(n_paths, -1)[:, :n_steps]
+
+        sampled = self.returns[rows]
+        stress = self.stress[rows]
+        if self.stress_scale != 1.0:
+            mean = self.regime_mean[1]
+            sampled = np.where(stress[:, :, None], mean + (sampled - mean) * self.stress_scale, sampled)
+
+        log_levels = np.concatenate([np.zeros((n_paths, 1, sampled.shape[2])), np.cumsum(sampled, axis=1)], axis=1)
+        levels = self.start_values * np.exp(log_levels)
+        n_funds = len(self.fund_codes)
+        return {
+            'fund_codes': self.fund_codes,
+            'index_codes': self.index_codes,
+            'nav': levels[:, :, :n_funds],
+            'index_close': levels[:, :, n_funds:],
+            'stress': stress,
+        }
+
+
+def evaluate_strategies(paths, strategies, initial_capital=100000, interval=20, index_code='sh_index'):
+    """
+    在全部模拟路径上同时回测一组规则策略（规则同 sweep.simulate_rules）
+
+    Args:
+        paths: StressPathGenerator.generate() 的返回值
+        strategies: 策略列表，每项为 {'weights': {基金代码: 权重}, 'dca_amount': 定投金额,
+                    'threshold': 再平衡阈值（None 不再平衡）, 'initial_amount': 首日买入金额, 'name': 名称}，
+                    除 weights 外均可省略
+        initial_capital: 初始资金
+        interval: 定投间隔（交易日）
+
+    Returns:
+        (summary, distribution)：summary 为每个策略一行的 DataFrame，包含收益率和最大回撤的分布统计；
+        distribution 为 {'total_return': (策略数, 路径数), 'max_drawdown': (策略数, 路径数),
+        'market_return': (路径数,)}，单位均为 %
+    """
+    fund_codes = list(dict.fromkeys(code for strategy in strategies for code in strategy['weights']))
+    unknown = [code for code in fund_codes if code not in paths['fund_codes']]
+    if unknown:
+        raise ValueError(f"模拟路径中不存在基金: {', '.join(unknown)}")
+    cols = [paths['fund_codes'].index(code) for code in fund_codes]
+    nav = paths['nav'][:, :, cols]
+    n_paths = nav.shape[0]
+
+    weight_matrix = np.zeros((len(strategies), len(fund_codes)))
+    for i, strategy in enumerate(strategies):
+        total = sum(strategy['weights'].values())
+        for code, weight in strategy['weights'].items():
+            weight_matrix[i, fund_codes.index(code)] = weight / total
+
+    def param(key, default):
+        return np.array([default if strategy.get(key) is None else strategy[key] for strategy in strategies],
+                        dtype=np.float64)
+
+    # 组合按 策略 × 路径 排列，第 s 个策略在第 p 条路径上的组合编号为 s * 路径数 + p
+    simulated = simulate_rules(
+        nav,
+        np.repeat(weight_matrix, n_paths, axis=0),
+        np.repeat(param('dca_amount', 0.0), n_paths),
+        np.repeat(param('threshold', np.inf), n_paths),
+        initial_capital=initial_capital,
+        interval=interval,
+        initial_amounts=np.repeat(param('initial_amount', 0.0), n_paths),
+    )
+    net_worth = simulated['net_worth']
+    total_return = ((net_worth[:, -1] - initial_capital) / initial_capital * 100).reshape(len(strategies), n_paths)
+    drawdown = np.asarray(max_drawdown(net_worth)).reshape(len(strategies), n_paths)
+
+    market = np.zeros(n_paths)
+    if index_code in paths['index_codes']:
+        index_close = paths['index_close'][:, :, paths['index_codes'].index(index_code)]
+        market = (index_close[:, -1] / index_close[:, 0] - 1) * 100
+
+    rows = []
+    for i, strategy in enumerate(strategies):
+        returns = total_return[i]
+        tail = returns[returns <= np.percentile(returns, 5)]
+        row = {
+            'name': strategy.get('name', f'策略{i + 1}'),
+            'weights': strategy['weights'],
+            'mean_return': float(returns.mean()),
+        }
+        row.update({f'return_p{q}': float(v) for q, v in zip(PERCENTILES, np.percentile(returns, PERCENTILES))})
+        row.update({
+            'loss_probability': float((returns < 0).mean() * 100),
+            'cvar_5': float(tail.mean()),
+            'mean_outperformance': float((returns - market).mean()),
+            'max_drawdown_p50': float(np.percentile(drawdown[i], 50)),
+            'max_drawdown_p95': float(np.percentile(drawdown[i], 95)),
+        })
+        rows.append(row)
+
+    return pd.DataFrame(rows), {'total_return': total_return, 'max_drawdown': drawdown, 'market_return': market}
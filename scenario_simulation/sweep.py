@@ -0,0 +1,245 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from performance import build_summary, market_return, max_drawdown
+
+# 低于该金额（元）的定投不执行，避免浮点误差残留的零头现金产生无意义的交易
+MIN_BUY_AMOUNT = 0.01
+
+
+def simulate_rules(nav, weights, dca_amounts, thresholds, initial_capital=100000, interval=20, initial_amounts=0.0,
+                   valid=None):
+    """
+    向量化地同时模拟一批“定投 + 阈值再平衡”规则策略
+
+    每个交易日按以下规则操作（与 make_rule_strategy 的逐日实现一致）：
+        1. 首日买入 initial_amount，每 interval 个交易日买入 dca_amount，金额不超过现有现金，按目标权重分配到各基金；
+        2. 持仓中任一基金的权重偏离目标权重超过 threshold，且目标权重不为0的基金当天都可交易时，
+           将持仓调整回目标权重（先卖后买，现金不变）。
+    买入份额 = 金额 / 净值，卖出金额 = 份额 × 净值，与 InvestmentSimulator.buy_fund / sell_fund 相同。
+
+    Args:
+        nav: 净值矩阵，形状 (交易日数, 基金数)，或 (组数, 交易日数, 基金数)：组数等于组合数时每个组合
+             使用各自的净值；组数能整除组合数时第 i 个组合使用 nav[i % 组数]（如多个策略共用同一批模拟路径）
+        weights: 目标权重，形状 (组合数, 基金数)，每行之和为1
+        dca_amounts: 每次定投金额，形状 (组合数,)
+        thresholds: 再平衡阈值（权重偏离的绝对值），形状 (组合数,)，np.inf 表示不再平衡
+        initial_capital: 初始资金
+        interval: 定投间隔（交易日）
+        initial_amounts: 首日一次性买入金额，标量或形状 (组合数,)
+        valid: 净值有效性掩码，形状同 nav；为 False 的基金当天只计算市值、不参与交易。None 表示全部有效
+
+    Returns:
+        字典：net_worth (组合数, 交易日数)、cash (组合数,)、shares (组合数, 基金数)、
+        buy_count / sell_count (组合数,)
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    n_runs, n_funds = weights.shape
+    nav = np.asarray(nav, dtype=np.float64)
+    if nav.ndim == 2:
+        nav = nav[None]
+    n_days = nav.shape[1]
+    if n_runs % nav.shape[0]:
+        raise ValueError("组合数必须是净值组数的整数倍")
+    if valid is not None:
+        valid = np.asarray(valid, dtype=bool)
+        if valid.ndim == 2:
+            valid = valid[None]
+
+    def per_run(values):
+        # 组数小于组合数时按组重复，第 i 个组合对应第 i % 组数 组
+        if values.shape[0] in (1, n_runs):
+            return np.broadcast_to(values, (n_runs, n_funds))
+        return np.tile(values, (n_runs // values.shape[0], 1))
+
+    dca_amounts = np.broadcast_to(np.asarray(dca_amounts, dtype=np.float64), (n_runs,))
+    thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), (n_runs,))
+    initial_amounts = np.broadcast_to(np.asarray(initial_amounts, dtype=np.float64), (n_runs,))
+    interval = max(int(interval), 1)
+
+    cash = np.full(n_runs, float(initial_capital))
+    shares = np.zeros((n_runs, n_funds))
+    net_worth = np.empty((n_runs, n_days))
+    buy_count = np.zeros(n_runs, dtype=np.int64)
+    sell_count = np.zeros(n_runs, dtype=np.int64)
+
+    for t in range(n_days):
+        price = per_run(nav[:, t, :])
+        priced = np.isfinite(price) & (price > 0)
+        tradable = priced if valid is None else priced & per_run(valid[:, t, :])
+        safe_price = np.where(priced, price, 1.0)
+
+        # 1. 定投买入
+        budget = np.zeros(n_runs)
+        if t == 0:
+            budget += initial_amounts
+        if t % interval == 0:
+            budget += dca_amounts
+        budget = np.minimum(budget, cash)
+        budget = np.where(budget >= MIN_BUY_AMOUNT, budget, 0.0)
+        buy_amounts = np.where(tradable, budget[:, None] * weights, 0.0)
+        bought = buy_amounts > 0
+        shares += np.where(bought, buy_amounts / safe_price, 0.0)
+        cash -= buy_amounts.sum(axis=1)
+        buy_count += bought.sum(axis=1)
+
+        # 2. 阈值再平衡
+        values = np.where(priced, shares * safe_price, 0.0)
+        holdings_value = values.sum(axis=1)
+        invested = holdings_value > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drift = np.abs(values / holdings_value[:, None] - weights).max(axis=1)
+        # 目标权重为0的列（参数网格中其他组合的基金）不参与该组合的交易，不影响是否再平衡
+        rebalance = invested & (drift > thresholds) & (tradable | (weights == 0)).all(axis=1)
+        if rebalance.any():
+            target_values = holdings_value[rebalance, None] * weights[rebalance]
+            diff = target_values - values[rebalance]
+            sells = diff < 0
+            buys = diff > 0
+            sell_amounts = np.where(sells, -diff, 0.0)
+            buy_amounts = np.where(buys, diff, 0.0)
+            # 先按卖出金额减少份额并增加现金，再用现金按买入金额增加份额
+            shares[rebalance] -= sell_amounts / safe_price[rebalance]
+            shares[rebalance] += buy_amounts / safe_price[rebalance]
+            cash[rebalance] += sell_amounts.sum(axis=1) - buy_amounts.sum(axis=1)
+            sell_count[rebalance] += sells.sum(axis=1)
+            buy_count[rebalance] += buys.sum(axis=1)
+
+        net_worth[:, t] = cash + np.where(priced, shares * safe_price, 0.0).sum(axis=1)
+
+    return {
+        'net_worth': net_worth,
+        'cash': cash,
+        'shares': shares,
+        'buy_count': buy_count,
+        'sell_count': sell_count,
+    }
+
+
+def make_rule_strategy(weights, dca_amount, threshold, interval=20, initial_amount=0.0):
+    """
+    构建与 simulate_rules 规则相同的逐日策略函数，可用于 backtest.run_backtest 逐步核对向量化结果
+
+    Args:
+        weights: {基金代码: 目标权重}
+    """
+    interval = max(int(interval), 1)
+    total = sum(weights.values())
+    weights = {code: weight / total for code, weight in weights.items()}
+
+    def strategy(ctx):
+        day = ctx.state.setdefault('day', 0)
+        ctx.state['day'] += 1
+
+        budget = (initial_amount if day == 0 else 0.0) + (dca_amount if day % interval == 0 else 0.0)
+        budget = min(budget, ctx.cash)
+        if budget >= MIN_BUY_AMOUNT:
+            for fund_code, weight in weights.items():
+                # 逐笔扣减现金的浮点误差可能使最后一笔略超过剩余现金
+                ctx.buy(fund_code, min(budget * weight, ctx.cash))
+
+        cols = [ctx.market.fund_index[code] for code in weights]
+        values = ctx.shares[cols] * ctx.nav[cols]
+        holdings_value = values.sum()
+        if holdings_value <= 0:
+            return
+        targets = np.array([weights[code] for code in weights])
+        tradable = all(ctx.market.fund_valid[ctx.row, col] and ctx.nav[col] > 0
+                       for col, target in zip(cols, targets) if target != 0)
+        if tradable and np.abs(values / holdings_value - targets).max() > threshold:
+            diffs = holdings_value * targets - values
+            for code, col, diff in zip(weights, cols, diffs):
+                if diff < 0:
+                    ctx.sell(code, shares=min(-diff / ctx.nav[col], ctx.shares[col]))
+            for code, col, diff in zip(weights, cols, diffs):
+                if diff > 0:
+                    ctx.buy(code, min(diff, ctx.cash))
+
+    return strategy
+
+
+def run_sweep(scene_data, weight_sets, dca_amounts, thresholds, initial_capital=100000, interval=20,
+              initial_amount=0.0, keep_series=False):
+    """
+    对 定投金额 × 再平衡阈值 × 基金权重 的参数网格做向量化回测
+
+    Args:
+        scene_data: DataLoader.load_all_data() 或 attach_scene_data() 的返回值
+        weight_sets: 基金权重字典列表，如 [{'000011': 0.6, '020002': 0.4}, ...]
+        dca_amounts: 定投金额列表
+        thresholds: 再平衡阈值列表，None 或 np.inf 表示不再平衡
+        initial_capital: 初始资金
+        interval: 定投间隔（交易日）
+        initial_amount: 首日一次性买入金额
+        keep_series: 是否返回每个组合的每日净值矩阵
+
+    Returns:
+        (results, net_worth)：results 为每个组合一行的 DataFrame，列名与
+        get_performance_summary 的总结字段一致（可用 row_to_summary 还原为总结字典）；
+        net_worth 为 (组合数, 交易日数) 的净值矩阵，keep_series=False 时为 None
+    """
+    market = scene_data['market_data']
+    start_row = 0
+    if scene_data.get('simulation_start_date'):
+        start_row = market.row_on_or_after(scene_data['simulation_start_date']) or 0
+
+    # 只取参数网格中出现的基金列
+    fund_codes = list(dict.fromkeys(code for weights in weight_sets for code in weights))
+    unknown = [code for code in fund_codes if code not in market.fund_index]
+    if unknown:
+        raise ValueError(f"场景中不存在基金: {', '.join(unknown)}")
+    cols = [market.fund_index[code] for code in fund_codes]
+
+    weight_matrix = np.zeros((len(weight_sets), len(fund_codes)))
+    for i, weights in enumerate(weight_sets):
+        total = sum(weights.values())
+        for code, weight in weights.items():
+            weight_matrix[i, fund_codes.index(code)] = weight / total
+
+    thresholds = [np.inf if threshold is None else threshold for threshold in thresholds]
+    combos = list(itertools.product(range(len(weight_sets)), dca_amounts, thresholds))
+    weight_idx = np.array([c[0] for c in combos], dtype=np.int64)
+
+    simulated = simulate_rules(
+        market.nav[start_row:, cols],
+        weight_matrix[weight_idx],
+        np.array([c[1] for c in combos], dtype=np.float64),
+        np.array([c[2] for c in combos], dtype=np.float64),
+        initial_capital=initial_capital,
+        interval=interval,
+        initial_amounts=initial_amount,
+        valid=market.fund_valid[start_row:, cols],
+    )
+
+    net_worth = simulated['net_worth']
+    n_days = net_worth.shape[1]
+    final_assets = net_worth[:, -1] if n_days else np.full(len(combos), float(initial_capital))
+    total_return = (final_assets - initial_capital) / initial_capital * 100
+    benchmark = market_return(market, 'sh_index')
+
+    results = pd.DataFrame({
+        'weights': [weight_sets[i] for i in weight_idx],
+        'dca_amount': [c[1] for c in combos],
+        'threshold': [c[2] for c in combos],
+        'initial_capital': initial_capital,
+        'final_assets': final_assets,
+        'total_return': total_return,
+        'market_return': benchmark,
+        'outperformance': total_return - benchmark,
+        'max_drawdown': max_drawdown(net_worth) if n_days else 0.0,
+        'buy_count': simulated['buy_count'],
+        'sell_count': simulated['sell_count'],
+        'simulation_days': n_days,
+    })
+
+    return results, (net_worth if keep_series else None)
+
+
+def row_to_summary(row):
+    """将 run_sweep 结果表中的一行转换为 get_performance_summary 的总结字典"""
+    return build_summary(
+        row['initial_capital'], float(row['final_assets']), float(row['max_drawdown']),
+        int(row['buy_count']), int(row['sell_count']), int(row['simulation_days']), row['market_return']
+    )
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 模块以 scenario_simulation 目录为根平铺导入
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,137 @@
+import io
+import math
+import datetime
+import contextlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import DataLoader
+from scenes import DEFAULT_SCENE, list_scenes
+
+SCENE_PATH = Path(__file__).resolve().parent.parent
+INDEX_CODES = ['sh_index', 'dj_index']
+
+
+def reference_timeline(funds_data, news_data, start_date):
+    """向量化之前逐日、逐基金筛选 DataFrame 的时间线构建（strict 对齐），作为对照实现"""
+    all_dates = set()
+    for fund_data in funds_data.values():
+        if 'date' in fund_data.columns:
+            all_dates.update(fund_data['date'].dt.date)
+    for news in news_data:
+        all_dates.add(news['date'])
+    sorted_dates = sorted(all_dates)
+    if start_date:
+        sorted_dates = [date for date in sorted_dates if date >= start_date]
+
+    fund_codes = [code for code in funds_data if code not in INDEX_CODES]
+
+    def has_data(code, date):
+        fund_data = funds_data[code]
+        return not fund_data[fund_data['date'].dt.date == date].empty
+
+    valid_trading_days = [
+        date for date in sorted_dates
+        if all(code in funds_data and has_data(code, date) for code in INDEX_CODES)
+        and all(has_data(code, date) for code in fund_codes if 'date' in funds_data[code].columns)
+    ]
+
+    timeline = []
+    for date in valid_trading_days:
+        events = {'date': date, 'news': [news['content'] for news in news_data if news['date'] == date], 'funds': {}}
+        for code, fund_data in funds_data.items():
+            if 'date' not in fund_data.columns:
+                continue
+            day_data = fund_data[fund_data['date'].dt.date == date]
+            if day_data.empty:
+                continue
+            if code in INDEX_CODES:
+                events['funds'][code] = {'close': float(day_data['收盘'].values[0]),
+                                         'change_pct': float(day_data['涨跌幅'].values[0])}
+            else:
+                events['funds'][code] = {'nav': float(day_data['DWJZ'].values[0]),
+                                         'change_pct': float(day_data['JZZZL'].values[0])}
+        timeline.append(events)
+    return timeline
+
+
+def assert_same_timeline(actual, expected):
+    assert [day['date'] for day in actual] == [day['date'] for day in expected]
+    for got, want in zip(actual, expected):
+        assert got['news'] == want['news'], got['date']
+        assert set(got['funds']) == set(want['funds']), got['date']
+        for code, values in want['funds'].items():
+            assert set(got['funds'][code]) == set(values), (got['date'], code)
+            for key, value in values.items():
+                other = got['funds'][code][key]
+                assert other == value or (math.isnan(other) and math.isnan(value)), (got['date'], code, key)
+
+
+def build_timeline(loader):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return list(loader.build_timeline())
+
+
+def fixture_loader():
+    """
+    手工构造的小场景：
+    - 基金 B 缺少 01-04 的净值（该日不是有效交易日）
+    - 道琼斯指数缺少 01-06
+    - 基金 A 在 01-05 的净值和涨跌幅为 NaN、有一个重复日期
+    - 新闻落在有效交易日、无效交易日和没有行情的日期上
+    """
+    days = pd.to_datetime(['2020-01-02', '2020-01-03', '2020-01-04', '2020-01-05', '2020-01-06', '2020-01-07'])
+
+    def fund(dates, navs, changes):
+        return pd.DataFrame({'date': pd.to_datetime(dates), 'DWJZ': navs, 'JZZZL': changes})
+
+    def index(dates, closes, changes):
+        return pd.DataFrame({'date': pd.to_datetime(dates), '收盘': closes, '涨跌幅': changes})
+
+    loader = DataLoader(SCENE_PATH, DEFAULT_SCENE)
+    loader.funds_data = {
+        'A': fund(list(days) + [days[3]], [1.0, 1.1, 1.2, np.nan, 1.3, 1.25, 9.9],
+                  [0.0, 10.0, 9.09, np.nan, 8.33, -3.85, 0.0]),
+        'B': fund(days.delete(2), [2.0, 2.1, 2.2, 2.3, 2.4], [0.0, 5.0, 4.76, 4.55, 4.35]),
+        'sh_index': index(days, [3000, 3010, 3020, 3030, 3040, 3050], [0.0, 0.33, 0.33, 0.33, 0.33, 0.33]),
+        'dj_index': index(days.delete(4), [28000, 28100, 28200, 28300, 28400], [0.0, 0.36, 0.36, 0.35, 0.35]),
+    }
+    loader.news_data = [
+        {'date': datetime.date(2020, 1, 3), 'content': '有效交易日的新闻'},
+        {'date': datetime.date(2020, 1, 3), 'content': '同一天的第二条新闻'},
+        {'date': datetime.date(2020, 1, 4), 'content': '基金缺数据当天的新闻'},
+        {'date': datetime.date(2020, 1, 8), 'content': '没有行情的日期的新闻'},
+    ]
+    loader.simulation_start_date = datetime.date(2020, 1, 3)
+    return loader
+
+
+def test_fixture_timeline_matches_row_by_row_reference():
+    loader = fixture_loader()
+    expected = reference_timeline(loader.funds_data, loader.news_data, loader.simulation_start_date)
+    actual = build_timeline(loader)
+
+    # 01-02 早于开始日期，01-04 基金B缺数据，01-06 道琼斯缺数据
+    assert [day['date'] for day in expected] == [datetime.date(2020, 1, 3), datetime.date(2020, 1, 5),
+                                                 datetime.date(2020, 1, 7)]
+    assert math.isnan(expected[1]['funds']['A']['nav'])
+    assert_same_timeline(actual, expected)
+
+
+@pytest.mark.skipif(not next(s for s in list_scenes() if s['scene_id'] == DEFAULT_SCENE)['available'],
+                    reason="默认场景数据不可用")
+def test_scene_timeline_matches_row_by_row_reference():
+    loader = DataLoader(SCENE_PATH, DEFAULT_SCENE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.simulation_start_date = loader.get_earliest_valid_date()
+        loader.load_fund_data()
+        loader.load_index_data()
+        loader.load_news_data()
+    expected = reference_timeline(loader.funds_data, loader.news_data, loader.simulation_start_date)
+    actual = build_timeline(loader)
+
+    assert len(expected) > 100
+    assert_same_timeline(actual, expected)
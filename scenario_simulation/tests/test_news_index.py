@@ -0,0 +1,44 @@
+import random
+import datetime
+
+import pytest
+
+from news_index import NewsIndex
+
+WORDS = ['美联储', '加息', '次贷', '危机', '银行', '股市', '下跌', '上涨', '政策', '救市', 'Fed', 'rate']
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    rng = random.Random(0)
+    news = [{'date': datetime.date(2008, 1, 1) + datetime.timedelta(days=i // 3),
+             'content': ''.join(rng.choices(WORDS, k=rng.randint(2, 8))) + ('雷曼兄弟' if i % 97 == 0 else '')}
+            for i in range(3000)]
+    rng.shuffle(news)
+    return news
+
+
+def brute_force(news, keywords, until=None):
+    """逐条子串匹配，按日期从近到远排列（同一天按原顺序倒序）"""
+    keywords = [keyword.lower() for keyword in keywords.split()]
+    items = sorted(news, key=lambda item: item['date'])
+    matches = [item for item in items
+               if (until is None or item['date'] <= until)
+               and all(keyword in item['content'].lower() for keyword in keywords)]
+    return matches[::-1]
+
+
+@pytest.mark.parametrize('keywords', [
+    '雷曼兄弟', '雷曼兄弟 银行 危机', '美联储 加息', '银行危机', '救市 政策 股市', 'fed RATE', '危', '不存在的词',
+])
+@pytest.mark.parametrize('until', [None, datetime.date(2008, 6, 30)])
+def test_search_matches_substring_scan(corpus, keywords, until):
+    index = NewsIndex(corpus)
+    expected = brute_force(corpus, keywords, until)
+    total, results = index.search(keywords, until=until, limit=None)
+    assert total == len(expected)
+    assert results == [{'date': item['date'], 'content': item['content']} for item in expected]
+
+    total, results = index.search(keywords, until=until, limit=5)
+    assert total == len(expected)
+    assert [item['content'] for item in results] == [item['content'] for item in expected[:5]]
@@ -0,0 +1,72 @@
+import math
+import datetime
+
+import numpy as np
+
+from market_data import MarketData
+from range_query import RangeQuery
+
+
+def random_market(n_days=300, n_funds=6, seed=3):
+    """随机行情：含非正净值（无效价格）的基金列和两个指数列"""
+    rng = np.random.default_rng(seed)
+    dates = [datetime.date(2020, 1, 1) + datetime.timedelta(days=i) for i in range(n_days)]
+    nav = np.cumprod(1 + rng.normal(0, 0.03, (n_days, n_funds)), axis=0)
+    nav[rng.random((n_days, n_funds)) < 0.02] = 0.0
+    close = np.cumprod(1 + rng.normal(0, 0.02, (n_days, 2)), axis=0) * 3000
+    return MarketData(dates, [f'F{i}' for i in range(n_funds)], nav, np.zeros_like(nav),
+                      ['sh_index', 'dj_index'], close, np.zeros_like(close))
+
+
+def brute_force_stats(values, start, end):
+    """逐日计算区间 [start, end] 的期间收益率、年化波动率和最大回撤"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.where(values > 0, np.log(values), np.nan)
+    total_return = math.expm1(logs[end] - logs[start]) * 100 if np.isfinite(logs[end] - logs[start]) else None
+
+    returns = np.diff(logs[start:end + 1])
+    returns = np.where(np.isfinite(returns), returns, 0.0)
+    volatility = np.std(returns, ddof=1) * math.sqrt(252) * 100 if len(returns) >= 2 else None
+
+    drop, peak = 0.0, -np.inf
+    for value in logs[start:end + 1]:
+        if np.isfinite(value):
+            peak = max(peak, value)
+            drop = max(drop, peak - value)
+    return total_return, volatility, -math.expm1(-drop) * 100
+
+
+def test_window_stats_match_brute_force():
+    market = random_market()
+    ranges = RangeQuery(market, max_columns=3)
+    rng = np.random.default_rng(0)
+    for code in market.fund_codes + market.index_codes:
+        col = ranges.column(code)
+        values = ranges.series(col)
+        for _ in range(40):
+            start, end = sorted(int(row) for row in rng.integers(0, len(market), 2))
+            stats = ranges.window_stats(col, start, end)
+            total_return, volatility, drawdown = brute_force_stats(values, start, end)
+            if total_return is None:
+                assert stats['total_return'] is None
+            else:
+                assert math.isclose(stats['total_return'], total_return, rel_tol=1e-9, abs_tol=1e-9)
+            if volatility is None:
+                assert stats['volatility'] is None
+            else:
+                assert math.isclose(stats['volatility'], volatility, rel_tol=1e-6, abs_tol=1e-9)
+            assert math.isclose(stats['max_drawdown'], drawdown, rel_tol=1e-9, abs_tol=1e-9)
+        assert len(ranges._tables) <= 3
+
+
+def test_tables_are_built_only_for_queried_columns():
+    market = random_market()
+    ranges = market.ranges
+    assert ranges._tables == {}
+
+    col = ranges.column('F2')
+    ranges.max_drawdown(col, 0, len(market) - 1)
+    ranges.period_changes(col, ranges.sample_rows(0, len(market) - 1, 'M'), 'M')
+    assert list(ranges._tables) == [col]
+    assert np.shares_memory(ranges.series(col), market.nav)
+    assert np.shares_memory(ranges.series(ranges.column('dj_index')), market.index_close)
@@ -0,0 +1,127 @@
+import io
+import json
+import contextlib
+from pathlib import Path
+
+import pytest
+
+from data_loader import DataLoader
+from investment_simulator import InvestmentSimulator
+from scenes import DEFAULT_SCENE, list_scenes
+from session_log import LoggedRecords, snapshot_path
+
+SCENE_PATH = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(
+    not next(s for s in list_scenes() if s['scene_id'] == DEFAULT_SCENE)['available'],
+    reason="默认场景数据不可用",
+)
+
+
+@pytest.fixture(scope='module')
+def scene_data():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DataLoader(SCENE_PATH, DEFAULT_SCENE).load_all_data()
+
+
+def simulator(tmp_path, scene_data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return InvestmentSimulator(tmp_path, 100000, data=scene_data)
+
+
+def session_state(sim):
+    return {
+        'cash': sim.cash,
+        'holdings': sim.holdings,
+        'cost_basis': sim.cost_basis,
+        'date': sim.current_date,
+        'net_worth_history': list(sim.net_worth_history),
+        'summary': sim.get_performance_summary()['summary'],
+        'actions': [{key: value for key, value in action.items() if key != 'timestamp'}
+                    for action in sim._all_actions()],
+    }
+
+
+def test_resume_replays_import_without_the_export_file(tmp_path, scene_data):
+    source = simulator(tmp_path, scene_data)
+    source.buy_fund('000011', 20000)
+    source.advance(5)
+    source.sell_fund('000011', percentage=0.5)
+    source.buy_fund('162201', 10000)
+    source.advance(3)
+    export_path = tmp_path / 'export.json'
+    assert source.export_actions(export_path)['success']
+
+    sim = simulator(tmp_path, scene_data)
+    log_path = tmp_path / 'session.jsonl'
+    sim.start_session_log(log_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert sim.import_history(export_path)['success']
+    sim.buy_fund('020002', 5000)
+    sim.next_day()
+    expected = session_state(sim)
+    sim.close_session_log()
+
+    # 导入文件被移走，快照也丢失时只能从日志中的导入事件重放
+    export_path.unlink()
+    snapshot_path(log_path).unlink()
+
+    resumed = simulator(tmp_path, scene_data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = resumed.resume_session(log_path)
+    assert result['success'], result['message']
+    assert session_state(resumed) == expected
+    resumed.close_session_log()
+
+    # 导入事件中只记录净值历史在历史文件中的区间
+    import_event = next(json.loads(line) for line in open(log_path, encoding='utf-8') if '"import"' in line)
+    assert 'net_worth_history' not in import_event and import_event['history']
+
+
+def test_snapshot_size_does_not_grow_with_history(tmp_path, scene_data):
+    sim = simulator(tmp_path, scene_data)
+    log_path = tmp_path / 'session.jsonl'
+    sim.start_session_log(log_path)
+    sim.buy_fund('000011', 20000)
+    sizes = []
+    for _ in range(3):
+        sim.advance(50)
+        sim.close_session_log()
+        sizes.append(snapshot_path(log_path).stat().st_size)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert sim.resume_session(log_path)['success']
+    assert max(sizes) - min(sizes) < 64
+    assert len(sim.net_worth_history) > 150
+    sim.close_session_log()
+
+
+def test_resume_reads_history_lazily(tmp_path, scene_data):
+    sim = simulator(tmp_path, scene_data)
+    log_path = tmp_path / 'session.jsonl'
+    sim.start_session_log(log_path, snapshot_every=3)
+    sim.buy_fund('000011', 20000)
+    sim.advance(20)
+    sim.sell_fund('000011', percentage=0.3)
+    sim.next_day()
+    expected = session_state(sim)
+    sim.close_session_log()
+
+    resumed = simulator(tmp_path, scene_data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert resumed.resume_session(log_path)['success']
+    logged, _ = resumed.state.history._segments[0]
+    assert isinstance(logged, LoggedRecords) and logged._items is None
+    assert resumed.get_current_state()['total_assets'] == expected['net_worth_history'][-1]['total_assets']
+    assert logged._items is None
+    assert session_state(resumed) == expected
+
+    # 恢复后继续操作并再次恢复：新追加的记录与之前的区间拼接
+    resumed.buy_fund('162201', 5000)
+    resumed.advance(10)
+    expected = session_state(resumed)
+    resumed.close_session_log()
+    again = simulator(tmp_path, scene_data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert again.resume_session(log_path)['success']
+    assert session_state(again) == expected
+    again.close_session_log()
@@ -0,0 +1,75 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from scenes import DEFAULT_SCENE, list_scenes
+from simulation_server import SimulationServer
+
+SCENE_PATH = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(
+    not next(s for s in list_scenes() if s['scene_id'] == DEFAULT_SCENE)['available'],
+    reason="默认场景数据不可用",
+)
+
+
+def run_requests(requests):
+    """创建一个会话并依次发送 (方法, 路径, JSON请求体) 请求，返回 [(状态码, 响应JSON)]"""
+    async def main():
+        async with TestClient(TestServer(SimulationServer(SCENE_PATH).create_app())) as client:
+            created = await (await client.post('/sessions', json={})).json()
+            session_url = f"/sessions/{created['session_id']}"
+            responses = []
+            for method, path, body in requests:
+                response = await client.request(method, session_url + path, json=body)
+                responses.append((response.status, await response.json()))
+            state = await (await client.get(session_url + '/state')).json()
+            return responses, state
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-inf', 'NaN', 'Infinity'])
+def test_non_finite_numbers_are_rejected(value):
+    responses, state = run_requests([
+        ('POST', '/buy', {'fund_code': '000011', 'amount': value}),
+        ('POST', '/sell', {'fund_code': '000011', 'shares': value}),
+        ('POST', '/sell', {'fund_code': '000011', 'percentage': value}),
+        ('POST', '/rebalance', {'weights': {'000011': 0.5, '162201': value}}),
+    ])
+    assert [status for status, _ in responses] == [400] * 4
+    assert all(not body['success'] for _, body in responses)
+    assert state['cash'] == 100000
+
+
+@pytest.mark.parametrize('path', [
+    '/history?fund_code=000011&days=0',
+    '/history?fund_code=000011&days=-5',
+    '/news?q=美联储&limit=0',
+    '/news?q=美联储&limit=-3',
+])
+def test_non_positive_windows_are_rejected(path):
+    (status, body), = run_requests([('GET', path, None)])[0]
+    assert status == 400
+    assert not body['success']
+
+
+def test_valid_requests_still_succeed():
+    responses, state = run_requests([
+        ('POST', '/buy', {'fund_code': '000011', 'amount': '1000'}),
+        ('GET', '/history?fund_code=000011&days=5', None),
+        ('GET', '/news?q=美联储&limit=1', None),
+        ('POST', '/advance', {'days': 2.0}),
+    ])
+    assert [status for status, _ in responses] == [200] * 4
+    assert all(body['success'] for _, body in responses)
+    assert state['cash'] == 99000
+
+
+@pytest.mark.parametrize('days', [float('inf'), float('nan'), 1e400, 2.7, 0, -1, 'abc'])
+def test_invalid_advance_days_are_rejected(days):
+    (status, body), = run_requests([('POST', '/advance', {'days': days})])[0]
+    assert status == 400
+    assert not body['success']
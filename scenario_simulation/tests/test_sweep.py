@@ -0,0 +1,122 @@
+import io
+import datetime
+import contextlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backtest import run_backtest
+from data_loader import DataLoader
+from investment_simulator import InvestmentSimulator
+from market_data import MarketData
+from scenes import DEFAULT_SCENE, list_scenes
+from sweep import MIN_BUY_AMOUNT, make_rule_strategy, run_sweep
+
+SCENE_PATH = Path(__file__).resolve().parent.parent
+
+WEIGHT_SETS = [{'F1': 0.5, 'F2': 0.5}, {'F1': 0.3, 'F3': 0.7}]
+DCA_AMOUNTS = [0.0, 2000.0]
+THRESHOLDS = [0.02, 0.1, None]
+INTERVAL = 5
+INITIAL_AMOUNT = 30000.0
+
+
+def staggered_scene(n_days=120, seed=7):
+    """
+    三只基金的小场景：F3 每隔几天停牌一次（净值向前填充、标记为无效），F1/F2 始终有效。
+    参数网格中只配置 F1/F2 的组合不应受 F3 停牌影响。
+    """
+    rng = np.random.default_rng(seed)
+    dates = [datetime.date(2020, 1, 1) + datetime.timedelta(days=i) for i in range(n_days)]
+    nav = np.cumprod(1 + rng.normal(0, 0.03, (n_days, 3)), axis=0)
+    valid = np.ones((n_days, 3), dtype=bool)
+    valid[3::4, 2] = False
+    for row in np.flatnonzero(~valid[:, 2]):
+        nav[row, 2] = nav[row - 1, 2]
+    change = np.vstack([np.zeros((1, 3)), (nav[1:] / nav[:-1] - 1) * 100])
+    close = np.cumprod(1 + rng.normal(0, 0.02, (n_days, 1)), axis=0) * 3000
+    market = MarketData(dates, ['F1', 'F2', 'F3'], nav, change, ['sh_index'], close, np.zeros((n_days, 1)),
+                        fund_valid=valid)
+    return {
+        'market_data': market,
+        'news_data': [],
+        'timeline': market.timeline,
+        'description': '',
+        'simulation_start_date': dates[0],
+    }
+
+
+def run_simulator(scene_data, weights, dca_amount, threshold, initial_capital=100000):
+    """用 InvestmentSimulator 的 buy_fund / sell_fund / next_day 逐日执行与 simulate_rules 相同的规则"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = InvestmentSimulator(SCENE_PATH, initial_capital, data=scene_data)
+    market = sim.market
+    total = sum(weights.values())
+    codes = list(weights)
+    targets = np.array([weights[code] / total for code in codes])
+    cols = [market.fund_index[code] for code in codes]
+    threshold = np.inf if threshold is None else threshold
+
+    net_worth = []
+    for day in range(len(market) - sim.current_date_index):
+        row = sim.current_date_index
+        budget = (INITIAL_AMOUNT if day == 0 else 0.0) + (dca_amount if day % INTERVAL == 0 else 0.0)
+        budget = min(budget, sim.cash)
+        if budget >= MIN_BUY_AMOUNT:
+            for code, target in zip(codes, targets):
+                sim.buy_fund(code, min(budget * target, sim.cash))
+
+        nav = market.nav[row, cols]
+        values = sim.state.shares[cols] * nav
+        holdings_value = values.sum()
+        tradable = all(market.fund_valid[row, col] for col, target in zip(cols, targets) if target)
+        if holdings_value > 0 and tradable and np.abs(values / holdings_value - targets).max() > threshold:
+            diffs = holdings_value * targets - values
+            for code, col, diff, price in zip(codes, cols, diffs, nav):
+                if diff < 0:
+                    sim.sell_fund(code, shares=min(-diff / price, sim.state.shares[col]))
+            for code, diff in zip(codes, diffs):
+                if diff > 0:
+                    sim.buy_fund(code, min(diff, sim.cash))
+
+        net_worth.append(sim.net_worth_history[-1]['total_assets'])
+        if sim.current_date_index >= len(market) - 1:
+            break
+        sim.next_day()
+
+    trades = [action['action_type'] for action in sim.user_actions]
+    return np.array(net_worth), trades.count('buy'), trades.count('sell')
+
+
+def assert_sweep_matches_step_by_step(scene_data, weight_sets):
+    results, net_worth = run_sweep(scene_data, weight_sets, DCA_AMOUNTS, THRESHOLDS, interval=INTERVAL,
+                                   initial_amount=INITIAL_AMOUNT, keep_series=True)
+    assert results['sell_count'].sum() > 0  # 网格中确实发生了再平衡
+
+    for i, row in results.iterrows():
+        threshold = None if np.isinf(row['threshold']) else row['threshold']
+
+        backtest = run_backtest(scene_data, make_rule_strategy(
+            row['weights'], row['dca_amount'], np.inf if threshold is None else threshold,
+            interval=INTERVAL, initial_amount=INITIAL_AMOUNT))
+        np.testing.assert_allclose(backtest['net_worth'], net_worth[i], rtol=1e-9)
+        trade_count = backtest['summary']['trade_count']
+        assert (trade_count['buy'], trade_count['sell']) == (row['buy_count'], row['sell_count'])
+
+        series, buy_count, sell_count = run_simulator(scene_data, row['weights'], row['dca_amount'], threshold)
+        np.testing.assert_allclose(series, net_worth[i], rtol=1e-9)
+        assert (buy_count, sell_count) == (row['buy_count'], row['sell_count'])
+
+
+def test_sweep_matches_step_by_step_with_suspended_funds():
+    assert_sweep_matches_step_by_step(staggered_scene(), WEIGHT_SETS)
+
+
+@pytest.mark.skipif(not next(s for s in list_scenes() if s['scene_id'] == DEFAULT_SCENE)['available'],
+                    reason="默认场景数据不可用")
+@pytest.mark.parametrize('alignment', ['strict', 'union'])
+def test_sweep_matches_step_by_step_on_scene(alignment):
+    with contextlib.redirect_stdout(io.StringIO()):
+        scene_data = DataLoader(SCENE_PATH, DEFAULT_SCENE, alignment).load_all_data()
+    assert_sweep_matches_step_by_step(scene_data, [{'000011': 0.6, '162201': 0.4}, {'020002': 0.5, '288102': 0.5}])